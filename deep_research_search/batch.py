@@ -0,0 +1,181 @@
+"""Batch research mode: runs the queries of a JSONL file in parallel and streams the results to a JSONL file."""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+import time
+import uuid
+
+from deep_research_search.deepsearch import async_deep_search
+from deep_research_search.generate_answer import ANSWER_ERROR_PREFIX
+from deep_research_search.search import close_fanout_executor
+from deep_research_search.session_state import SessionState
+from deep_research_search.token_usage import TokenUsage
+from deep_research_search.tracing import tracer
+from deep_research_search.streaming import AnswerSink
+
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+class StageTimings:
+    """Sums the duration of the spans of each stage, by trace (i.e. by session)."""
+
+    def __init__(self):
+        self.traces = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        with self._lock:
+            stages = self.traces.setdefault(span.trace_id, {})
+            stages[span.name] = stages.get(span.name, 0.0) + span.duration
+
+    def pop(self, trace_id: str) -> dict:
+        """Returns and forgets the durations of the stages of a trace."""
+        with self._lock:
+            return self.traces.pop(trace_id, {})
+
+def read_queries(input_path: str) -> list:
+    """
+    Reads the queries of a JSONL file.
+
+    Args:
+        input_path (str): The path of the file. Each line is a JSON object with a "query" field, and optionally
+                          an "id" (defaults to the line number) and a "token_budget".
+
+    Returns:
+        list: The query objects, with their "id".
+
+    Raises:
+        ValueError: If a line is not a valid query object.
+    """
+    queries = []
+    with open(input_path, "r", encoding="utf-8") as input_file:
+        for line_number, line in enumerate(input_file, start=1):
+            if not line.strip():
+                continue
+            query = json.loads(line)
+            if not isinstance(query, dict) or not isinstance(query.get("query"), str) or not query["query"].strip():
+                raise ValueError(f"Line {line_number} of {input_path} must be a JSON object with a non empty 'query' field.")
+            query.setdefault("id", line_number)
+            queries.append(query)
+    return queries
+
+def read_done_ids(output_path: str) -> set:
+    """
+    Returns the ids of the queries already answered in an output file (to restart an interrupted batch).
+
+    Args:
+        output_path (str): The path of the output JSONL file.
+
+    Returns:
+        set: The ids of the results without error.
+    """
+    done_ids = set()
+    if not os.path.exists(output_path):
+        return done_ids
+    with open(output_path, "r", encoding="utf-8") as output_file:
+        for line in output_file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError: # Line truncated by an interruption
+                continue
+            if result.get("error") is None:
+                done_ids.add(result.get("id"))
+    return done_ids
+
+async def run_batch(queries: list, output_path: str, workers: int, token_budget: int) -> int:
+    """
+    Runs the queries with at most `workers` sessions at the same time, appending each result to the output
+    file as soon as it is done.
+
+    Args:
+        queries (list): The query objects (see read_queries).
+        output_path (str): The path of the output JSONL file.
+        workers (int): The number of sessions running at the same time.
+        token_budget (int): The default token budget of a session.
+
+    Returns:
+        int: The number of failed queries.
+    """
+    # The blocking LLM and network calls of every session run in the default executor.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers * (global_config.max_concurrent_gaps + 2)))
+    semaphore = asyncio.Semaphore(workers)
+    stage_timings = StageTimings()
+    tracer.add_listener(stage_timings)
+    failures = 0
+
+    async def run_query(query, output_file):
+        nonlocal failures
+        queued_at = time.time()
+        async with semaphore:
+            state = SessionState(query["query"], query.get("token_budget", token_budget), trace_id=uuid.uuid4().hex)
+            token_usage = TokenUsage()
+            sink = AnswerSink() # The answer is written to the output file once complete, only its first token is timed
+            started_at = time.time()
+            answer, error = None, None
+            try:
+                answer = await async_deep_search(state.initial_query, token_budget=state.token_budget, token_usage=token_usage, state=state,
+                                                 sink=sink)
+                if answer is not None and answer.startswith(ANSWER_ERROR_PREFIX): # The answer generation reports its errors as the answer
+                    raise RuntimeError(answer[len(ANSWER_ERROR_PREFIX):])
+            except Exception as e:
+                logger.error(f"The query {query['id']} failed: {e}\n")
+                answer, error = None, str(e) # Retried when the batch is restarted
+                failures += 1
+            finished_at = time.time()
+
+        sources = list(dict.fromkeys(item.source for item in state.memory["knowledge"]))
+        result = {
+            "id": query["id"],
+            "query": query["query"],
+            "answer": answer,
+            "sources": sources,
+            "token_usage": token_usage.breakdown(),
+            "timings": {
+                "queued": started_at - queued_at,
+                "duration": finished_at - started_at,
+                "first_token": sink.first_token_at - started_at if sink.first_token_at is not None else None,
+                "stages": stage_timings.pop(state.trace_id),
+            },
+            "trace_id": state.trace_id,
+            "error": error,
+        }
+        output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output_file.flush()
+        logger.info(f"Query {query['id']} done in {finished_at - started_at:.1f} seconds\n")
+
+    try:
+        with open(output_path, "a", encoding="utf-8") as output_file:
+            await asyncio.gather(*[run_query(query, output_file) for query in queries])
+    finally:
+        tracer.remove_listener(stage_timings)
+        close_fanout_executor()
+    return failures
+
+def main():
+    """
+    Parses the command line and runs the batch.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Runs the DeepSearch queries of a JSONL file and writes the results to a JSONL file.")
+    parser.add_argument("input", help="JSONL file of queries: {\"query\": str, \"id\": optional, \"token_budget\": optional int}.")
+    parser.add_argument("output", help="JSONL file the results are appended to. The queries already answered in it are skipped.")
+    parser.add_argument("--workers", type=int, default=global_config.batch_workers, help="Number of queries researched at the same time.")
+    parser.add_argument("--token-budget", type=int, default=10000, help="Token budget of the queries without their own.")
+    args = parser.parse_args()
+
+    queries = read_queries(args.input)
+    done_ids = read_done_ids(args.output)
+    pending_queries = [query for query in queries if query["id"] not in done_ids]
+    logger.info(f"----- BATCH OF {len(pending_queries)} QUERIES ({len(queries) - len(pending_queries)} ALREADY DONE) -----\n")
+
+    start_time = time.time()
+    failures = asyncio.run(run_batch(pending_queries, args.output, max(1, args.workers), args.token_budget))
+    logger.info(f"----- BATCH DONE IN {time.time() - start_time:.1f} SECONDS ({failures} FAILED) -----\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Offline benchmark of the DeepSearch algorithm with a fake LLM and fake web search backends."""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from functools import wraps
+
+import deep_research_search.deepsearch as deepsearch
+import deep_research_search.search as search
+import deep_research_search.read as read
+import deep_research_search.reason as reason
+import deep_research_search.generate_answer as generate_answer
+from deep_research_search.fakes import FakeOllama, FakeSearchBackend, StubOpenAIServer, offline_backends
+from deep_research_search.llm_providers import OpenAICompatibleProvider
+from deep_research_search.token_usage import TokenUsage
+from deep_research_search.streaming import AnswerSink
+
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+class StageTimer:
+    """Accumulates the time spent in each stage of the algorithm, across all the sessions and threads."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, duration: float):
+        with self._lock:
+            total_time, calls = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total_time + duration, calls + 1)
+
+    def wrap(self, stage: str, function):
+        """Returns the function timed as the given stage."""
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start_time)
+        return timed_function
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {stage: {"total_time": total_time, "calls": calls, "mean_time": total_time / calls}
+                    for stage, (total_time, calls) in self.stages.items()}
+
+# Functions timed as a stage: (module, attribute name, stage name)
+TIMED_STAGES = [
+    (deepsearch, "find_gap_questions", "gap_detection"),
+    (reason, "decide_next_action", "reason"),
+    (reason, "decide_next_action_and_query", "reason"),
+    (search, "rewrite_query", "rewrite"),
+    (search, "rewrite_queries", "rewrite"),
+    (search, "engine_search", "web_search"),
+    (read, "process_results", "read"),
+    (generate_answer, "generate_answer", "answer"),
+]
+
+# Modules whose import time is measured by the startup benchmark
+STARTUP_MODULES = [
+    "deep_research_search.deepsearch",
+    "deep_research_search.main",
+    "deep_research_search.batch",
+    "deep_research_search.server",
+]
+
+def percentile(values: list, fraction: float) -> float:
+    """Returns the value at the given fraction (0 to 1) of the sorted values."""
+    sorted_values = sorted(values)
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+async def run_sessions(queries: list, concurrency: int) -> list:
+    """
+    Runs DeepSearch sessions with at most `concurrency` sessions at the same time.
+
+    Args:
+        queries (list): The queries of the sessions.
+        concurrency (int): The number of concurrent sessions.
+
+    Returns:
+        list: The latency (in seconds), the time to first token of the answer (in seconds) and the TokenUsage of each session.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_session(query):
+        async with semaphore:
+            token_usage = TokenUsage()
+            sink = AnswerSink() # The answers are not printed
+            start_time, start_timestamp = time.perf_counter(), time.time()
+            await deepsearch.async_deep_search(query, token_usage=token_usage, sink=sink)
+            first_token_at = sink.first_token_at or time.time() # No token if the answer generation failed
+            return time.perf_counter() - start_time, first_token_at - start_timestamp, token_usage
+
+    return await asyncio.gather(*[run_session(query) for query in queries])
+
+def run_startup_benchmark(modules: list, runs: int) -> dict:
+    """
+    Measures the time needed to import each module in a fresh Python process (what a CLI invocation or a
+    batch worker pays at launch).
+
+    Args:
+        modules (list): The names of the modules to import.
+        runs (int): The number of processes started for each module.
+
+    Returns:
+        dict: For each module (and for an empty interpreter), the median time (in milliseconds) of the import alone
+              and of the whole process, and the minimum time of the whole process.
+    """
+    statement = "import time; start_time = time.perf_counter(); {}; print((time.perf_counter() - start_time) * 1000)"
+    startup = {}
+    for module in [None] + modules:
+        import_statement = f"import {module}" if module else "pass"
+        durations = []
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", statement.format(import_statement)],
+                                    capture_output=True, text=True, check=True).stdout
+            process_time = (time.perf_counter() - start_time) * 1000
+            durations.append((float(output.strip().splitlines()[-1]), process_time))
+        startup[module or "interpreter"] = {
+            "import_ms": statistics.median(import_time for import_time, _ in durations),
+            "process_ms": statistics.median(process_time for _, process_time in durations),
+            "min_process_ms": min(process_time for _, process_time in durations),
+        }
+        logger.info(f"Startup of {module or 'the interpreter'}: {startup[module or 'interpreter']['process_ms']:.0f} ms\n")
+    return startup
+
+def run_benchmark(concurrency_levels: list, sessions: int, fake_ollama: FakeOllama, search_latency: float, provider=None) -> dict:
+    """
+    Runs the benchmark for each concurrency level.
+
+    Args:
+        concurrency_levels (list): The numbers of concurrent sessions to measure.
+        sessions (int): The number of sessions run at each concurrency level.
+        fake_ollama (FakeOllama): The fake LLM.
+        provider (LLMProvider, optional): The provider the requests are sent to, if it isn't the fake LLM itself
+                                          (e.g. an OpenAI-compatible provider querying a stub server using the fake LLM).
+        search_latency (float): Latency (in seconds) of the fake web searches.
+
+    Returns:
+        dict: The results of each concurrency level (latencies, throughput, LLM calls and time by stage).
+    """
+    runs = []
+    for concurrency in concurrency_levels:
+        timer = StageTimer()
+        fake_backends = {engine: FakeSearchBackend(engine, latency=search_latency) for engine in search.SEARCH_ENGINES}
+        originals = [(module, name, getattr(module, name)) for module, name, _ in TIMED_STAGES]
+        for module, name, stage in TIMED_STAGES:
+            setattr(module, name, timer.wrap(stage, getattr(module, name)))
+        llm_calls_before = fake_ollama.calls
+        log_level = logger.getEffectiveLevel()
+        logger.setLevel(logging.WARNING) # The logs of the sessions would slow down the measures
+        try:
+            with offline_backends(provider or fake_ollama, fake_backends):
+                start_time = time.perf_counter()
+                session_results = asyncio.run(run_sessions([f"Benchmark question {i}?" for i in range(sessions)], concurrency))
+                wall_time = time.perf_counter() - start_time
+        finally:
+            logger.setLevel(log_level)
+            for module, name, function in originals:
+                setattr(module, name, function)
+
+        latencies = [latency for latency, _, _ in session_results]
+        first_token_latencies = [first_token_latency for _, first_token_latency, _ in session_results]
+        llm_calls = [sum(stage["calls"] for stage in usage.breakdown()["stages"].values()) for _, _, usage in session_results]
+        runs.append({
+            "concurrency": concurrency,
+            "sessions": sessions,
+            "wall_time": wall_time,
+            "throughput": sessions / wall_time, # sessions per second
+            "latency": {
+                "mean": statistics.mean(latencies),
+                "p50": percentile(latencies, 0.5),
+                "p95": percentile(latencies, 0.95),
+                "max": max(latencies),
+            },
+            "time_to_first_token": {
+                "mean": statistics.mean(first_token_latencies),
+                "p50": percentile(first_token_latencies, 0.5),
+                "p95": percentile(first_token_latencies, 0.95),
+            },
+            "llm_calls_per_query": statistics.mean(llm_calls),
+            "llm_requests_sent": fake_ollama.calls - llm_calls_before,
+            "search_calls": sum(backend.calls for backend in fake_backends.values()),
+            "tokens_per_query": statistics.mean(usage.total for _, _, usage in session_results),
+            "stages": timer.summary(),
+        })
+        logger.info(f"Concurrency {concurrency}: {runs[-1]['throughput']:.2f} sessions/s, mean latency {runs[-1]['latency']['mean']:.2f}s, "
+                    f"mean time to first token {runs[-1]['time_to_first_token']['mean']:.2f}s\n")
+    return {"runs": runs}
+
+def main():
+    """
+    Parses the command line, runs the benchmark and saves the results as JSON.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Offline benchmark of DeepSearch with a fake LLM and fake web search backends.")
+    parser.add_argument("--concurrency", default="1,4", help="Comma separated numbers of concurrent sessions (default: 1,4).")
+    parser.add_argument("--sessions", type=int, default=8, help="Number of sessions run at each concurrency level.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fixed latency (in seconds) of each LLM request.")
+    parser.add_argument("--llm-prefill-rate", type=float, default=2000.0, help="Prompt evaluation speed (tokens per second).")
+    parser.add_argument("--llm-token-rate", type=float, default=50.0, help="Generation speed (tokens per second).")
+    parser.add_argument("--answer-tokens", type=int, default=100, help="Number of tokens of the generated answers.")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Latency (in seconds) of each web search.")
+    parser.add_argument("--http-llm", action="store_true",
+                        help="Send the LLM requests to a local stub OpenAI-compatible server with the pooled HTTP provider.")
+    parser.add_argument("--startup-runs", type=int, default=3, help="Processes started to measure the import time of each module (0 to skip).")
+    parser.add_argument("--output", default="bench_output.json", help="Path of the JSON results file.")
+    args = parser.parse_args()
+
+    # The fake search results can't be fetched.
+    global_config.fetch_pages = False
+
+    fake_ollama = FakeOllama(latency=args.llm_latency, prefill_tokens_per_second=args.llm_prefill_rate,
+                             tokens_per_second=args.llm_token_rate, answer_tokens=args.answer_tokens)
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    if args.http_llm:
+        with StubOpenAIServer(fake_ollama) as stub_server:
+            provider = OpenAICompatibleProvider(stub_server.base_url, max_in_flight=global_config.openai_max_in_flight)
+            results = run_benchmark(concurrency_levels, args.sessions, fake_ollama, args.search_latency, provider=provider)
+    else:
+        results = run_benchmark(concurrency_levels, args.sessions, fake_ollama, args.search_latency)
+    if args.startup_runs > 0:
+        results["startup"] = run_startup_benchmark(STARTUP_MODULES, args.startup_runs)
+    results["parameters"] = vars(args)
+    results["settings"] = {
+        "web_search_engine": global_config.web_search_engine,
+        "query_rewrite_mode": global_config.query_rewrite_mode,
+        "speculative_search": global_config.speculative_search,
+        "max_concurrent_gaps": global_config.max_concurrent_gaps,
+        "llm_max_in_flight": global_config.openai_max_in_flight if args.http_llm else global_config.llm_max_in_flight,
+    }
+    results["python_version"] = platform.python_version()
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    logger.info(f"Benchmark results saved in {args.output}\n")
+
+if __name__ == "__main__":
+    main()
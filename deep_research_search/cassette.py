@@ -0,0 +1,454 @@
+"""
+Record and replay of the I/O of DeepSearch sessions: LLM requests, web searches and page fetches.
+
+In record mode, every request sent to the LLM provider, the search backends and the page fetcher is captured with
+its response and its duration into a cassette (gzip compressed JSON). In replay mode, the responses are served back
+from the cassette without any network access, at the recorded speed or instantly, so a production session can be
+reproduced locally and the orchestration overhead profiled in isolation.
+
+The requests are matched by content (LLM cache key, engine and query, URL), not by order, so the concurrent gap
+pipelines can send them in another order. The outcome of the races between the pipelines (e.g. a query reusing the
+results of a similar query searched by another pipeline) depends on the timings, so only a replay with the recorded
+durations, even scaled down, is guaranteed to reproduce them. The LLM and search caches and the knowledge index are disabled in both
+modes, so every request reaches the cassette.
+"""
+import argparse
+from contextlib import contextmanager, nullcontext
+import cProfile
+import gzip
+import json
+import pstats
+import threading
+import time
+
+import deep_research_search.deepsearch as deepsearch
+import deep_research_search.search as search
+import deep_research_search.search_backends as search_backends
+from deep_research_search.fakes import offline_backends
+from deep_research_search.fetch import get_page_fetcher
+from deep_research_search.llm_cache import make_cache_key
+from deep_research_search.llm_providers import LLMProvider, get_llm_provider
+from deep_research_search.search_backends import SearchBackend, TokenBucket
+from deep_research_search.streaming import AnswerSink
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+CASSETTE_VERSION = 1
+# Settings changing the requests of a session, recorded in the cassette and applied during the replay
+SESSION_SETTINGS = (
+    "llm_model_name", "web_search_engine", "search_hedge_primary", "max_concurrent_gaps", "query_rewrite_mode",
+    "query_similarity_threshold", "novelty_threshold", "speculative_search", "reasoning_context_max_tokens",
+    "answer_context_max_tokens", "diary_max_entries", "fetch_pages", "passage_max_chars", "passages_per_result",
+    "knowledge_max_tokens",
+)
+RESPONSE_KEYS = ("response", "done", "prompt_eval_count", "eval_count")
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a request wasn't recorded in the cassette."""
+
+class Cassette:
+    """
+    Recorded interactions (request key, response and timings) of some DeepSearch sessions, with their queries.
+
+    When the same request was recorded several times (e.g. a retried LLM call), its responses are served in the
+    recorded order, and the last one is served again once they are all used.
+    """
+
+    def __init__(self, queries: list = None, settings: dict = None):
+        """
+        Creates an empty cassette.
+
+        Args:
+            queries (list, optional): The (query, token budget) pairs of the recorded sessions.
+            settings (dict, optional): The SESSION_SETTINGS of the recording. Defaults to the current configuration.
+        """
+        self.queries = queries if queries is not None else []
+        self.settings = settings if settings is not None else {name: getattr(global_config, name) for name in SESSION_SETTINGS}
+        self.interactions = [] # In the recorded order
+        self.misses = 0
+        self._queues = {}      # (kind, key) -> interactions not served yet
+        self._served = {}      # (kind, key) -> last served interaction
+        self._start_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.interactions)
+
+    def record(self, kind: str, key: str, started: float, **payload):
+        """
+        Adds an interaction to the cassette.
+
+        Args:
+            kind (str): The kind of request: "llm", "llm_stream", "search" or "fetch".
+            key (str): The key identifying the request.
+            started (float): The time.perf_counter() at which the request was sent.
+            **payload: The response and its timings (e.g. elapsed, the duration in seconds).
+
+        Returns:
+            None
+        """
+        interaction = {"kind": kind, "key": key, "started": round(started - self._start_time, 4), **payload}
+        with self._lock:
+            self.interactions.append(interaction)
+            self._queues.setdefault((kind, key), []).append(interaction)
+
+    def play(self, kind: str, key: str) -> dict:
+        """
+        Returns the recorded interaction of a request.
+
+        Args:
+            kind (str): The kind of request.
+            key (str): The key identifying the request.
+
+        Returns:
+            dict: The interaction, with the keys given to `record`.
+
+        Raises:
+            CassetteMiss: If the request wasn't recorded.
+        """
+        with self._lock:
+            queue = self._queues.get((kind, key))
+            if queue:
+                self._served[(kind, key)] = queue.pop(0)
+            elif (kind, key) not in self._served:
+                self.misses += 1
+                raise CassetteMiss(f"No {kind} interaction recorded in the cassette for the key: {key}")
+            return self._served[(kind, key)]
+
+    def stats(self) -> dict:
+        """
+        Returns the number of recorded interactions of each kind and the number of missed requests.
+
+        Returns:
+            dict: A dictionary with the keys "interactions" (by kind) and "misses".
+        """
+        with self._lock:
+            interactions = {}
+            for interaction in self.interactions:
+                interactions[interaction["kind"]] = interactions.get(interaction["kind"], 0) + 1
+            return {"interactions": interactions, "misses": self.misses}
+
+    def save(self, path: str):
+        """
+        Writes the cassette to a gzip compressed JSON file.
+
+        Args:
+            path (str): The path of the file (overwritten).
+
+        Returns:
+            None
+        """
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "queries": self.queries, "settings": self.settings, "interactions": self.interactions}
+        with gzip.open(path, "wt", encoding="utf-8") as cassette_file:
+            json.dump(data, cassette_file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        """
+        Reads a cassette written by `save`.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            Cassette: The cassette, ready to be replayed.
+
+        Raises:
+            ValueError: If the file was written by an incompatible version.
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as cassette_file:
+            data = json.load(cassette_file)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version: {data.get('version')}.")
+        cassette = cls([tuple(query) for query in data["queries"]], data["settings"])
+        for interaction in data["interactions"]:
+            cassette.interactions.append(interaction)
+            cassette._queues.setdefault((interaction["kind"], interaction["key"]), []).append(interaction)
+        return cassette
+
+def _wait(duration: float):
+    """Waits for a replayed duration (nothing to wait in instant replay, where sleep(0) would still switch threads)."""
+    if duration > 0:
+        time.sleep(duration)
+
+def llm_request_key(model: str, prompt: str, format: dict = None, options: dict = None) -> str:
+    """Returns the key of a LLM request (the key of the LLM cache)."""
+    return make_cache_key(model, prompt, format, options)
+
+def search_request_key(engine: str, query: str, num_results: int) -> str:
+    """Returns the key of a web search."""
+    return json.dumps([engine, query, num_results], ensure_ascii=False)
+
+class RecordingProvider(LLMProvider):
+    """LLM provider forwarding the requests to another provider and recording them into a cassette."""
+
+    def __init__(self, provider: LLMProvider, cassette: Cassette):
+        """
+        Args:
+            provider (LLMProvider): The provider the requests are sent to (its scheduler is shared).
+            cassette (Cassette): The cassette the requests are recorded into.
+        """
+        super().__init__(max_in_flight=provider.scheduler.max_in_flight)
+        self.provider = provider
+        self.cassette = cassette
+        self.name = provider.name
+        # The requests are bounded by the scheduler of the wrapped provider, shared with the calls made without recording
+        self.scheduler = provider.scheduler
+
+    def generate(self, model: str, prompt: str, stream: bool = False, format: dict = None, options: dict = None):
+        key = llm_request_key(model, prompt, format, options)
+        started = time.perf_counter()
+        response = self.provider.generate(model=model, prompt=prompt, stream=stream, format=format, options=options)
+        if stream:
+            return self._record_stream(key, started, response)
+        response = {name: response.get(name) for name in RESPONSE_KEYS}
+        self.cassette.record("llm", key, started, elapsed=round(time.perf_counter() - started, 4), response=response)
+        return response
+
+    def _record_stream(self, key: str, started: float, chunks):
+        """Yields the chunks of a streamed response and records them with the delay before each one."""
+        recorded_chunks = []
+        last_time = started
+        for chunk in chunks:
+            now = time.perf_counter()
+            chunk = {name: chunk.get(name) for name in RESPONSE_KEYS if chunk.get(name) is not None}
+            recorded_chunks.append([round(now - last_time, 4), chunk])
+            last_time = now
+            yield chunk
+        self.cassette.record("llm_stream", key, started, elapsed=round(last_time - started, 4), chunks=recorded_chunks)
+
+class ReplayProvider(LLMProvider):
+    """LLM provider serving the responses recorded in a cassette."""
+
+    def __init__(self, cassette: Cassette, time_scale: float = 0.0, max_in_flight: int = None):
+        """
+        Args:
+            cassette (Cassette): The cassette the responses are served from.
+            time_scale (float): Factor applied to the recorded durations: 1 replays at the recorded speed, 0 instantly.
+            max_in_flight (int, optional): Maximum number of requests in flight. Defaults to LLM_MAX_IN_FLIGHT.
+        """
+        super().__init__(max_in_flight=max_in_flight or global_config.llm_max_in_flight)
+        self.cassette = cassette
+        self.time_scale = time_scale
+
+    def generate(self, model: str, prompt: str, stream: bool = False, format: dict = None, options: dict = None):
+        key = llm_request_key(model, prompt, format, options)
+        if stream:
+            return self._stream(self.cassette.play("llm_stream", key))
+        interaction = self.cassette.play("llm", key)
+        _wait(interaction["elapsed"] * self.time_scale)
+        return dict(interaction["response"])
+
+    def _stream(self, interaction: dict):
+        for delay, chunk in interaction["chunks"]:
+            _wait(delay * self.time_scale)
+            yield dict(chunk)
+
+class RecordingSearchBackend(SearchBackend):
+    """
+    Search backend forwarding the searches to the backend of an engine and recording them into a cassette.
+
+    The searches go through the `search` method of the wrapped backend, with its own rate limiting and retries.
+    """
+
+    def __init__(self, engine: str, cassette: Cassette):
+        """
+        Args:
+            engine (str): The engine. Its backend is created on the first search.
+            cassette (Cassette): The cassette the searches are recorded into.
+        """
+        super().__init__(TokenBucket(rate=1e9, capacity=1000000), max_retries=0) # The wrapped backend rate limits and retries
+        self.name = engine
+        self.cassette = cassette
+        self._backend = None
+
+    def _get_backend(self) -> SearchBackend:
+        """Returns the wrapped backend of the engine, creating it on first use."""
+        if self._backend is None:
+            self._backend = search_backends._backend_factories[self.name]()
+        return self._backend
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        return self._get_backend()._search_once(query, num_results)
+
+    def is_retryable(self, exception: Exception) -> bool:
+        return self._get_backend().is_retryable(exception)
+
+    def search(self, query: str, num_results: int, deadline: float = None) -> list:
+        key = search_request_key(self.name, query, num_results)
+        started = time.perf_counter()
+        try:
+            results = self._get_backend().search(query, num_results, deadline=deadline)
+        except Exception as e:
+            self.cassette.record("search", key, started, elapsed=round(time.perf_counter() - started, 4), error=f"{type(e).__name__}: {e}")
+            raise
+        self.cassette.record("search", key, started, elapsed=round(time.perf_counter() - started, 4), results=[list(result) for result in results])
+        return results
+
+class ReplaySearchBackend(SearchBackend):
+    """Search backend serving the results recorded in a cassette."""
+
+    def __init__(self, engine: str, cassette: Cassette, time_scale: float = 0.0):
+        """
+        Args:
+            engine (str): The engine replaced by this backend.
+            cassette (Cassette): The cassette the results are served from.
+            time_scale (float): Factor applied to the recorded durations: 1 replays at the recorded speed, 0 instantly.
+        """
+        super().__init__(TokenBucket(rate=1e9, capacity=1000000), max_retries=0) # The recorded retries are already in the elapsed time
+        self.name = engine
+        self.cassette = cassette
+        self.time_scale = time_scale
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        interaction = self.cassette.play("search", search_request_key(self.name, query, num_results))
+        _wait(interaction["elapsed"] * self.time_scale)
+        if "error" in interaction:
+            raise RuntimeError(f"Recorded {self.name} search error: {interaction['error']}")
+        return [tuple(result) for result in interaction["results"]]
+
+    def is_retryable(self, exception: Exception) -> bool:
+        return False
+
+@contextmanager
+def _patched_fetcher(fetch_text):
+    """Replaces the fetch of a single page by the page fetcher of the sessions inside the block."""
+    fetcher = get_page_fetcher()
+    fetcher.fetch_text = fetch_text # fetch_pages calls it from its worker threads
+    try:
+        yield
+    finally:
+        del fetcher.fetch_text
+
+@contextmanager
+def recording(cassette: Cassette):
+    """
+    Records the LLM requests, web searches and page fetches of the sessions run inside the block.
+
+    Args:
+        cassette (Cassette): The cassette the interactions are recorded into.
+
+    Yields:
+        Cassette: The cassette.
+    """
+    fetcher = get_page_fetcher()
+
+    def fetch_text(url: str) -> str:
+        started = time.perf_counter()
+        text = type(fetcher).fetch_text(fetcher, url)
+        cassette.record("fetch", url, started, elapsed=round(time.perf_counter() - started, 4), text=text)
+        return text
+
+    provider = RecordingProvider(get_llm_provider(), cassette)
+    backends = {engine: RecordingSearchBackend(engine, cassette) for engine in search.SEARCH_ENGINES}
+    with offline_backends(provider, backends), _patched_fetcher(fetch_text):
+        yield cassette
+
+@contextmanager
+def replaying(cassette: Cassette, time_scale: float = 0.0):
+    """
+    Serves the LLM requests, web searches and page fetches of the sessions run inside the block from a cassette,
+    with the settings of the recording.
+
+    Args:
+        cassette (Cassette): The cassette the responses are served from.
+        time_scale (float): Factor applied to the recorded durations: 1 replays at the recorded speed, 0 instantly.
+
+    Yields:
+        Cassette: The cassette.
+    """
+    def fetch_text(url: str) -> str:
+        interaction = cassette.play("fetch", url)
+        _wait(interaction["elapsed"] * time_scale)
+        return interaction["text"]
+
+    saved_settings = {name: getattr(global_config, name) for name in cassette.settings}
+    for name, value in cassette.settings.items():
+        setattr(global_config, name, value)
+    provider = ReplayProvider(cassette, time_scale)
+    backends = {engine: ReplaySearchBackend(engine, cassette, time_scale) for engine in search.SEARCH_ENGINES}
+    try:
+        with offline_backends(provider, backends), _patched_fetcher(fetch_text):
+            yield cassette
+    finally:
+        for name, value in saved_settings.items():
+            setattr(global_config, name, value)
+
+@contextmanager
+def profiling(path: str):
+    """
+    Profiles the block with cProfile, in the calling thread and in the threads started inside the block (the worker
+    threads running the blocking calls of the sessions), then writes the merged statistics.
+
+    Args:
+        path (str): The path of the cProfile statistics file written.
+
+    Yields:
+        None
+    """
+    profilers = [cProfile.Profile()]
+
+    def start_thread_profiler(frame, event, arg):
+        profiler = cProfile.Profile()
+        profilers.append(profiler)
+        profiler.enable() # Replaces this function as the profile function of the thread
+
+    threading.setprofile(start_thread_profiler)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(None)
+        statistics = pstats.Stats(*profilers)
+        statistics.dump_stats(path)
+        statistics.sort_stats("cumulative").print_stats(20)
+
+def main():
+    """
+    Parses the command line and records or replays sessions.
+
+    Returns:
+        None
+
+    Role:
+        `record` runs the given queries against the live LLM server and search engines and saves their
+        interactions into a cassette. `replay` runs the queries of a cassette again offline, optionally under
+        cProfile, and logs the wall time and the number of requests served.
+    """
+    parser = argparse.ArgumentParser(description="Records DeepSearch sessions into a cassette or replays them offline.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    record_parser = subparsers.add_parser("record", help="Runs queries and records their LLM, search and fetch interactions.")
+    record_parser.add_argument("cassette", help="Path of the cassette file written (gzip compressed JSON).")
+    record_parser.add_argument("queries", nargs="+", help="The queries researched, one session each.")
+    record_parser.add_argument("--token-budget", type=int, default=10000, help="Token budget of each session.")
+    replay_parser = subparsers.add_parser("replay", help="Runs the queries of a cassette again, without network access.")
+    replay_parser.add_argument("cassette", help="Path of the cassette file.")
+    replay_parser.add_argument("--time-scale", type=float, default=0.0,
+                               help="Factor applied to the recorded durations: 1 replays at the recorded speed, 0 (default) instantly.")
+    replay_parser.add_argument("--profile", help="Path of the cProfile statistics file written (the slowest functions are logged).")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        cassette = Cassette([(query, args.token_budget) for query in args.queries])
+        with recording(cassette):
+            for query, token_budget in cassette.queries:
+                deepsearch.deep_search(query, token_budget=token_budget)
+        cassette.save(args.cassette)
+        logger.info(f"{len(cassette)} interactions recorded in {args.cassette}: {cassette.stats()['interactions']}\n")
+        return
+
+    cassette = Cassette.load(args.cassette)
+    start_time = time.perf_counter()
+    with replaying(cassette, args.time_scale), (profiling(args.profile) if args.profile else nullcontext()):
+        for query, token_budget in cassette.queries:
+            deepsearch.deep_search(query, token_budget=token_budget, sink=AnswerSink())
+    wall_time = time.perf_counter() - start_time
+    logger.info(f"{len(cassette.queries)} sessions replayed in {wall_time:.2f}s, {cassette.misses} requests missing from the cassette\n")
+    if cassette.misses:
+        logger.warning("The replayed sessions diverged from the recording, probably because of a race between their concurrent gap "
+                       "pipelines: replay them with a time scale (e.g. --time-scale 0.05) to keep the recorded order of the requests.\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Splitting of long page texts and search result contents into passages stored as separate knowledge items."""
+import re
+
+from deep_research_search.retrieval import BM25Index
+
+SENTENCE_END_PATTERN = re.compile(r"[.!?]\s")
+
+def split_passages(text: str, max_chars: int = 1000) -> list:
+    """
+    Splits a text into consecutive passages, cut at a paragraph break, else at the end of a sentence, else at a space.
+
+    Args:
+        text (str): The text to split.
+        max_chars (int): The maximum number of characters of a passage.
+
+    Returns:
+        list: The (start, end, passage) tuples, where passage is text[start:end] (without surrounding whitespaces).
+    """
+    passages = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            # Cut in the second half of the window, so the passages are not too short.
+            window_start = start + max_chars // 2
+            cut = text.rfind("\n", window_start, end)
+            if cut == -1:
+                sentence_ends = [match.end() - 1 for match in SENTENCE_END_PATTERN.finditer(text, window_start, end)]
+                cut = sentence_ends[-1] if sentence_ends else text.rfind(" ", window_start, end)
+            if cut != -1:
+                end = cut + 1
+        passage = text[start:end]
+        stripped_start = start + len(passage) - len(passage.lstrip())
+        stripped_end = end - (len(passage) - len(passage.rstrip()))
+        if stripped_start < stripped_end:
+            passages.append((stripped_start, stripped_end, text[stripped_start:stripped_end]))
+        start = end
+    return passages
+
+def select_passages(text: str, query: str, max_chars: int = 1000, max_passages: int = 3) -> list:
+    """
+    Splits a text into passages and keeps the ones the most relevant to a query.
+
+    Args:
+        text (str): The text to split.
+        query (str): The question the passages have to be relevant to.
+        max_chars (int): The maximum number of characters of a passage.
+        max_passages (int): The maximum number of passages kept.
+
+    Returns:
+        list: The kept (start, end, passage) tuples, in the order of the text. Passages with the same BM25 score
+              are kept in the order of the text (the beginning of a page is usually its summary).
+    """
+    passages = split_passages(text, max_chars)
+    if len(passages) <= max_passages:
+        return passages
+    index = BM25Index()
+    for position, (_, _, passage) in enumerate(passages):
+        index.add(position, passage)
+    scores = index.scores(query)
+    kept_positions = sorted(range(len(passages)), key=lambda position: (-scores.get(position, 0.0), position))[:max_passages]
+    return [passages[position] for position in sorted(kept_positions)]
@@ -8,6 +8,81 @@ class GlobalConfig(BaseSettings):
     log_level: str 
     web_search_engine: str
     exa_search_api_key: SecretStr
+    max_concurrent_gaps: int = 3 # Maximum number of gap questions searched at the same time
+    search_cache_enabled: bool = True
+    search_cache_path: str = ".cache/search_cache.sqlite3"
+    search_cache_max_entries: int = 5000
+    ddg_cache_ttl: int = 86400 # Time to live (in seconds) of the cached DuckDuckGo results
+    exa_cache_ttl: int = 604800 # Time to live (in seconds) of the cached ExaSearch results
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 1024 # Maximum number of LLM responses kept in memory
+    llm_cache_disk_path: str = "" # The LLM responses are also cached on disk if a path is given
+    llm_cache_disk_max_entries: int = 20000
+    knowledge_index_enabled: bool = True # Reuse the knowledge gathered by the previous sessions
+    knowledge_index_path: str = ".cache/knowledge_index.sqlite3"
+    knowledge_index_max_entries: int = 20000
+    knowledge_index_ttl: int = 2592000 # in seconds (30 days)
+    knowledge_index_seed_items: int = 5 # Maximum number of known items reused for each gap question
+    reasoning_context_max_tokens: int = 2000 # Maximum size of the knowledge included in the reasoning prompts
+    answer_context_max_tokens: int = 4000 # Maximum size of the knowledge included in the final answer prompt
+    fetch_pages: bool = True # Read the full pages of the search results instead of only their snippets
+    fetch_max_workers: int = 8
+    fetch_max_per_host: int = 2
+    fetch_timeout: float = 10.0 # in seconds
+    fetch_max_bytes: int = 1000000 # Maximum number of bytes downloaded for each page
+    passage_max_chars: int = 1000 # Maximum number of characters of a passage of a long page or search result
+    passages_per_result: int = 3 # Maximum number of passages of a page or search result stored as knowledge (the most relevant to the initial query)
+    knowledge_max_tokens: int = 20000 # Maximum size of the knowledge of a session, the least relevant items to the initial query are evicted beyond (0 = unbounded)
+    ddg_rate_limit: float = 1.0 # Average number of DuckDuckGo searches per second
+    ddg_rate_burst: int = 2
+    exa_rate_limit: float = 5.0 # Average number of ExaSearch searches per second
+    exa_rate_burst: int = 5
+    search_timeout: int = 10 # Timeout (in seconds) of each web search request
+    search_deadline: float = 30.0 # Maximum duration (in seconds) of a web search, retries included
+    search_max_retries: int = 4
+    search_backoff_base: float = 1.0 # Base delay (in seconds) of the exponential backoff between retries
+    search_backoff_max: float = 16.0
+    search_hedge_primary: str = "ddg" # Engine queried first when WEB_SEARCH_ENGINE="hedged"
+    search_hedge_delay: float = 2.0 # Delay (in seconds) before querying the other engines when WEB_SEARCH_ENGINE="hedged"
+    query_rewrite_mode: str = "separate" # "separate", "fused" (with the reasoning call) or "batch" (all the gap questions at once)
+    query_similarity_threshold: float = 0.8 # Minimum similarity (0 to 1) for a query to reuse the results of an already searched one
+    novelty_threshold: float = 0.0 # Minimum share (0 to 1) of new terms brought by a step for the search to go on, 0 investigates every gap question in one step
+    speculative_search: bool = False # Start the query rewrite and the web search of a gap question during its reasoning call
+    llm_max_in_flight: int = 4 # Maximum number of requests sent to the Ollama server at the same time (all sessions)
+    llm_timeout: float = 300.0 # Timeout (in seconds) of the LLM requests
+    ollama_host: str = "" # URL of the Ollama server (defaults to OLLAMA_HOST or the local server)
+    openai_base_url: str = "http://127.0.0.1:8080/v1" # URL of the OpenAI-compatible API when LLM_PROVIDER="openai"
+    openai_api_key: SecretStr = SecretStr("")
+    openai_max_in_flight: int = 16 # Maximum number of requests sent to the OpenAI-compatible server at the same time (all sessions)
+    server_host: str = "127.0.0.1"
+    server_port: int = 8000
+    server_max_workers: int = 64 # Worker threads running the blocking LLM and network calls of the server sessions
+    server_max_sessions: int = 1000 # Maximum number of sessions kept by the server (the oldest finished ones are removed)
+    server_max_body_bytes: int = 65536 # Maximum size of a request body, larger requests are rejected with a 413 status
+    batch_workers: int = 4 # Default number of queries researched at the same time by the batch mode
+    tracing_enabled: bool = True
+    trace_path: str = "" # The spans are appended to this JSON lines file if a path is given
+    diary_max_entries: int = 8 # Number of recent diary entries included verbatim in the prompts, the older ones are summarized
+    checkpoint_dir: str = "" # The state of each session is checkpointed in this directory if a path is given
 
-global_config = GlobalConfig()
+class LazyGlobalConfig:
+    """
+    Proxy of the GlobalConfig instance, which parses the environment on first attribute access instead of
+    at import time. The attributes are read from (and written to) the loaded configuration.
+    """
 
+    def __init__(self):
+        object.__setattr__(self, "_config", None)
+
+    def _load(self) -> GlobalConfig:
+        if self._config is None:
+            object.__setattr__(self, "_config", GlobalConfig())
+        return self._config
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+global_config = LazyGlobalConfig()
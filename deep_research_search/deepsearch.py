@@ -1,131 +1,475 @@
 """Main DeepSearch algorithm loop coordination with memory and budget management."""
+import asyncio
+import os
+import queue
+import threading
+
 import deep_research_search.search as search
-import deep_research_search.read as read 
+import deep_research_search.read as read
 import deep_research_search.reason as reason
 import deep_research_search.generate_answer as generate_answer
+from deep_research_search.fetch import get_page_fetcher
 from deep_research_search.find_gap_questions import find_gap_questions
 from deep_research_search.utils import add_to_diary
+from deep_research_search.token_usage import TokenBudgetExceeded, TokenUsage, current_token_usage
+from deep_research_search.session_state import SessionState
+from deep_research_search.knowledge_index import get_knowledge_index
+from deep_research_search.novelty import NoveltyTracker
+from deep_research_search.tracing import tracer
+from deep_research_search.streaming import AnswerSink, BroadcastSink, CallbackSink, StdoutSink
 
 from deep_research_search.logger import logger
 from deep_research_search.config import global_config
 
 
-def deep_search(initial_query: str, token_budget: int=10000, max_bad_attempts: int=3):
+async def run_gap_pipeline(current_question: str, memory: dict, semaphore: asyncio.Semaphore, max_bad_attempts: int,
+                           rewritten_query: str = None):
     """
-    Executes the DeepSearch algorithm loop.
+    Runs the reason and search steps for a single gap question.
+
+    Args:
+        current_question (str): The gap question to investigate.
+        memory (dict): The shared in-memory state. It is only read here, the read step is done by the caller.
+        semaphore (asyncio.Semaphore): Semaphore limiting the number of pipelines running at the same time.
+        max_bad_attempts (int): Maximum allowed failed reasoning attempts for this question.
+        rewritten_query (str, optional): The web query of the question if it has already been rewritten (batch rewrite mode).
+
+    Returns:
+        dict: The outcome of the pipeline with the keys "question", "action", "bad_attempts", "results" and "pages".
+              The action is "budget_exceeded" if a LLM call was refused because of the token budget.
+
+    Role:
+        The blocking LLM and network calls (including the fetch of the result pages) are run in worker threads
+        so that several gap questions can be investigated concurrently. The memory is not modified here so that the results can be merged
+        in a deterministic order by the caller. In the "fused" query rewrite mode, the reasoning call also returns the web query.
+        With SPECULATIVE_SEARCH (not used in the "fused" mode, which needs the reasoning call to get the query), the query
+        rewrite and the web search start at the same time as the reasoning call, as the action is most often "continue_search".
+        The speculative results are discarded if the action is something else (they are still cached).
+    """
+    fused = global_config.query_rewrite_mode == "fused"
+    decide = reason.decide_next_action_and_query if fused else reason.decide_next_action
+
+    async def decide_next_action(retry: bool):
+        # Returns the next action and the web query given by the fused reasoning call (None otherwise).
+        with tracer.span("reason", retry=retry) as span:
+            decision = await asyncio.to_thread(decide, memory, question=current_question, retry=retry)
+            span.set(action=decision[0] if fused else decision)
+        return decision if fused else (decision, None)
+
+    async def search_web(search_history: list, query: str, speculative: bool = False):
+        # Returns the results of the web search of the question.
+        with tracer.span("web_search", engine=global_config.web_search_engine, speculative=speculative) as span:
+            results = await asyncio.to_thread(search.search_web, current_question, search_history, 3, rewritten_query=query)
+            span.add(results=len(results))
+        return results
+
+    async with semaphore:
+        bad_attempts = 0
+        results = []
+        pages = {}
+        speculative_search = None
+        if global_config.speculative_search and not fused:
+            # The speculative search uses a copy of the search history, which is only updated if its results are used.
+            speculative_history = memory['processed_queries'].copy()
+            speculative_search = asyncio.create_task(search_web(speculative_history, rewritten_query, speculative=True))
+        try:
+            # Decide the next action based on the current memory state.
+            logger.debug(f"Reasoning to decide the next action for the following question: {current_question}\n")
+            next_action, fused_query = await decide_next_action(retry=False)
+            logger.debug(f"Here is the chosen action: {next_action}\n")
+
+            while next_action not in ["generate_answer", "continue_search"] and bad_attempts < max_bad_attempts: # Unrecognized action: count as a failed attempt.
+                logger.debug(f"The next action chosen by the LLM for the \"{current_question}\" is not valid.\n")
+                bad_attempts += 1
+                logger.debug(f"Reasoning to decide the next action for the following question: {current_question}\n")
+                next_action, fused_query = await decide_next_action(retry=True)
+                logger.debug(f"Here is the chosen action: {next_action}\n")
+
+            if next_action == "continue_search": # The actual gap question need more additional informations to be answered so we use internet search.
+                logger.debug(f"Searching additional informations for the following question: {current_question}\n")
+                if speculative_search is not None:
+                    try:
+                        results = await speculative_search
+                    except TokenBudgetExceeded:
+                        raise
+                    except Exception as e: # Like a failed web search: the question gets no results
+                        logger.error(f"Error during the speculative search of the question '{current_question}': {e}\n")
+                    else:
+                        record = speculative_history.get(current_question)
+                        if record is not None:
+                            memory['processed_queries'].record(record.query, record.rewritten_query, record.results)
+                else:
+                    results = await search_web(memory['processed_queries'], fused_query if fused_query and len(fused_query) >= 5 else rewritten_query)
+                if global_config.fetch_pages:
+                    urls = [result[1] for result in results if result[1] not in memory["visited_urls"]]
+                    with tracer.span("fetch", urls=len(urls)) as span:
+                        pages = await asyncio.to_thread(get_page_fetcher().fetch_pages, urls)
+                        span.add(results=len(pages))
+        except TokenBudgetExceeded as e:
+            logger.debug(f"{e}\n")
+            next_action = "budget_exceeded"
+        finally:
+            if speculative_search is not None and not speculative_search.done():
+                # Stops waiting for the unused speculative search. Its worker thread still finishes and fills the caches.
+                logger.debug(f"Discarding the speculative search of the question: {current_question}\n")
+                speculative_search.cancel()
+            elif speculative_search is not None and not speculative_search.cancelled():
+                # The error of an unused speculative search that already failed is retrieved so that asyncio doesn't report it.
+                speculative_search.exception()
+
+        return {"question": current_question, "action": next_action, "bad_attempts": bad_attempts, "results": results, "pages": pages}
+
+
+def seed_knowledge(memory: dict, questions: list) -> int:
+    """
+    Adds the items of the persistent knowledge index relevant to the questions to the memory.
+
+    Args:
+        memory (dict): The in-memory state of the session.
+        questions (list): The questions to find known items for.
+
+    Returns:
+        int: The number of items added to the knowledge.
+    """
+    added_items = 0
+    knowledge_index = get_knowledge_index()
+    for question in questions:
+        for url, text in knowledge_index.search(question, limit=global_config.knowledge_index_seed_items):
+            added_items += read.add_knowledge_item(memory, text, source=url)
+    return added_items
+
+
+async def async_deep_search(initial_query: str, token_budget: int=10000, max_bad_attempts: int=3, max_concurrency: int=None,
+                            token_usage: TokenUsage=None, trace_id: str=None, checkpoint_path: str=None, state: SessionState=None,
+                            sink: AnswerSink=None):
+    """
+    Executes the DeepSearch algorithm loop, investigating the gap questions concurrently.
 
     Args:
         initial_query (str): The initial query or question provided by the user.
         token_budget (int): Maximum allowed tokens for the DeepSearch execution.
         max_bad_attempts (int): Maximum allowed failed attempts before forcing beast mode.
+        max_concurrency (int, optional): Maximum number of gap questions investigated at the same time.
+                                         Defaults to the MAX_CONCURRENT_GAPS setting.
+        token_usage (TokenUsage, optional): Tracker of the tokens consumed by the session, by stage.
+                                            A new one is created if None; pass one to read the usage breakdown afterwards.
+        trace_id (str, optional): The id of the trace of the session (a random one is generated if None).
+        checkpoint_path (str, optional): File where the state of the session is checkpointed. Defaults to
+                                         "<CHECKPOINT_DIR>/<trace id>.json.gz" if CHECKPOINT_DIR is set, no checkpoint otherwise.
+        state (SessionState, optional): The state of an interrupted session to resume (see resume_deep_search).
+                                        Its query, token budget and trace id replace the arguments.
+        sink (AnswerSink, optional): The destination of the tokens of the final answer as they are generated.
+                                     Defaults to the standard output. It isn't closed by this function.
 
     Returns:
-        None
+        str: The final answer (also streamed to the sink).
 
     Role:
         This function manages the main loop of the DeepSearch algorithm. It maintains an in-memory state,
-        including a knowledge base, a diary of past actions, and a queue of gap questions. It alternates between
-        the search, read, and reason steps. The reasoning module returns one of two actions: "generate_answer" 
+        including a knowledge base, a diary of past actions, and a queue of gap questions. Each gap question
+        goes through its own reason and search pipeline, the pipelines of a step running concurrently. With a NOVELTY_THRESHOLD,
+        each step investigates the next wave of gap questions (ordered by expected information gain, the ones the knowledge
+        already covers being dropped) and the search stops once a step brings too few new terms to the knowledge. Before each step, the knowledge
+        gathered by the previous sessions about the gap questions is taken from the persistent knowledge index. Their results
+        are then read into the memory in the order of the gap questions, so the final state doesn't depend on
+        which pipeline finished first. The reasoning module returns one of two actions: "generate_answer"
         or "continue_search". When the token budget or the maximum number of failed attempts is reached, the system
-        forces answer generation in "BEAST MODE".
+        forces answer generation in "BEAST MODE". The token budget is checked against the real number of tokens
+        reported by Ollama. The state is checkpointed after the gap detection, after each gap pipeline and before
+        and after the answer generation, so a resumed session doesn't redo the LLM calls and web searches already made.
     """
     # Initialize in-memory state.
-    memory = {
-        "knowledge": [],       # List of gathered knowledge items.
-        "diaryContext": [],    # List of diary entries tracking actions and evaluations.
-        "actionsHistory": [],   # Optionally, history of actions taken.
-        "visited_urls": set(),     # Set of URLs that have been fully crawled/processed.
-        "processed_queries": [],  # List of queries that have been processed
-        "initial_query": initial_query
-    }
-    gaps = [initial_query]  # Queue of gap questions that need further investigation.
-    gap_questions_count = 0 # Count the number of gap questions generated.
-    token_usage = 0
-    bad_attempts = 0
-    step = 0
-    total_step = 0
-
-    # Identify gap questions from the updated memory.
-    logger.debug(f"Find gap questions for the following question: {initial_query}\n")
-    new_gaps = find_gap_questions(memory=memory, question_to_answer=initial_query) 
-    new_added_gaps_count = 0
-    if new_gaps:
-        for new_gap in new_gaps:
-            if gap_questions_count < 3: # 3 gap questions maximum
-                gaps.append(new_gap)
-                gap_questions_count += 1
-                new_added_gaps_count += 1
-            else:
-                break
-    add_to_diary(memory["diaryContext"], step, "gap_detection", initial_query,
-                        f"Identified {new_added_gaps_count} new gap questions.")
-            
-    token_usage += 50  # Simulate token usage for the read step.
+    if state is None:
+        state = SessionState(initial_query, token_budget, trace_id)
+    memory = state.memory
+    gaps = state.gaps  # Queue of gap questions that need further investigation.
+    initial_query, token_budget = state.initial_query, state.token_budget
+    if token_usage is None:
+        token_usage = TokenUsage(token_budget)
+    else:
+        token_usage.token_budget = token_budget
+    token_usage.restore(state.token_stages) # Tokens consumed before the checkpoint
+    current_token_usage.set(token_usage) # Every LLM call of this session (including the worker threads) is accounted here.
+    state.trace_id = tracer.start_trace(state.trace_id) # Every span of this session belongs to this trace
+    logger.debug(f"Trace id of the session: {state.trace_id}\n")
+    if checkpoint_path is None and global_config.checkpoint_dir:
+        checkpoint_path = os.path.join(global_config.checkpoint_dir, f"{state.trace_id}.json.gz")
+
+    def checkpoint():
+        # Saves the progress of the session with the tokens consumed so far.
+        if checkpoint_path:
+            state.token_stages = token_usage.breakdown()["stages"]
+            state.save(checkpoint_path)
+
+    if state.final_answer is not None: # The session was already over when it was checkpointed
+        (sink or StdoutSink()).write(state.final_answer)
+        return state.final_answer
+
+    if max_concurrency is None:
+        max_concurrency = global_config.max_concurrent_gaps
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    if not state.gaps_detected:
+        # Identify gap questions from the updated memory.
+        logger.debug(f"Find gap questions for the following question: {initial_query}\n")
+        with tracer.span("gap_detection") as span:
+            new_gaps = await asyncio.to_thread(find_gap_questions, memory=memory, question_to_answer=initial_query)
+            span.add(results=len(new_gaps or []))
+        gap_questions_count = 0 # Count the number of gap questions generated.
+        if new_gaps:
+            for new_gap in new_gaps:
+                if gap_questions_count < 3: # 3 gap questions maximum
+                    gaps.append(new_gap)
+                    gap_questions_count += 1
+                else:
+                    break
+        add_to_diary(memory["diaryContext"], state.step, "gap_detection", initial_query,
+                            f"Identified {gap_questions_count} new gap questions.", gap_questions=gap_questions_count)
+        state.gaps_detected = True
+        checkpoint()
 
     # Main DeepSearch loop.
-    while token_usage < token_budget and bad_attempts <= max_bad_attempts:
-        step += 1
-        total_step += 1
-
-        # Select the current gap question and search the required knowledge to answer it.
-        for current_question in gaps:
-            next_action = "continue_search"
-
-            if token_usage >= token_budget * 0.9 or bad_attempts >= max_bad_attempts: # Check if we are close to the budget or have too many failures.
-                next_action = "generate_answer_immediately"
-                logger.info(f"Generation of the answer with the beast mode ({token_usage} tokens generated & {bad_attempts} failed attempts).\n")
-                add_to_diary(memory["diaryContext"], step, "beast_mode", initial_query,
-                            "Budget threshold reached.")
-                final_answer = generate_answer.generate_answer(memory=memory, mode='beast_mode') # Generate immediately the final answer with the actual state (that's what's called beast_mode)
-                return None
+    knowledge_index = get_knowledge_index()
+    novelty = NoveltyTracker(memory["knowledge"], global_config.novelty_threshold)
+    while state.answer_mode is None and token_usage.total < token_budget and state.bad_attempts <= max_bad_attempts:
+        if state.outcomes is None: # Otherwise the step interrupted before the checkpoint is resumed
+            state.step += 1
+            if knowledge_index is not None and state.step == 1:
+                # Already known material may be enough to answer some gap questions without searching.
+                questions = [gap for gap in gaps if gap not in memory['processed_queries']]
+                with tracer.span("knowledge_index", questions=len(questions)) as span:
+                    reused_items = await asyncio.to_thread(seed_knowledge, memory, questions)
+                    span.add(results=reused_items)
+                if reused_items:
+                    add_to_diary(memory["diaryContext"], state.step, "knowledge_index", initial_query,
+                                 f"Reused {reused_items} knowledge items gathered by previous sessions.", knowledge_items=reused_items)
+            if novelty.threshold > 0:
+                # The gap questions the most likely to bring new information are investigated first, the others are dropped.
+                gaps[:], dropped_gaps = novelty.prioritize(gaps)
+                for dropped_gap in dropped_gaps:
+                    add_to_diary(memory["diaryContext"], state.step, "drop", dropped_gap,
+                                 "Dropped: the knowledge already covers this question.")
+                # One wave of gap questions per step, so the novelty of each wave decides whether to go on.
+                state.outcomes = [None] * min(len(gaps), max(1, max_concurrency))
             else:
-                # Decide the next action based on the current memory state.
-                logger.debug(f"Reasoning to decide the next action for the following question: {current_question}\n")
-                next_action = reason.decide_next_action(memory)
-                logger.debug(f"Here is the chosen action: {next_action}\n")
+                state.outcomes = [None] * len(gaps)
+            if not state.outcomes: # Every gap question was dropped
+                state.outcomes = None
+                state.answer_mode = "normal_generation"
+                break
+        step = state.step
 
-            while next_action not in ["generate_answer", "continue_search"]: # Unrecognized action: count as a failed attempt.
-                logger.debug(f"The next action chosen by the LLM for the \"{current_question}\" is not valid.\n")
-                if bad_attempts == max_bad_attempts: # Too much bad attempts so we have to aswer immediately
-                    next_action = "generate_answer_immediately"
-                    logger.info(f"Generation of the answer with the beast mode after {max_bad_attempts} failed attempts.\n")
-                    add_to_diary(memory["diaryContext"], step, "beast_mode", initial_query,
-                                "Failure threshold reached.")
-                    final_answer = generate_answer.generate_answer(memory=memory, mode='beast_mode') # Generate immediately the final answer with the actual state (that's what's called beast_mode)
-                    return None
-                else:
-                    bad_attempts += 1
-                    logger.debug(f"Reasoning to decide the next action for the following question: {current_question}\n")
-                    add_to_diary(memory["diaryContext"], step, "error", current_question,
-                                "Unknown action encountered.")
-                    next_action = reason.decide_next_action(memory)
-                    logger.debug(f"Here is the chosen action: {next_action}\n")
-
-            if next_action == "generate_answer": # The actual gap question doesn't need any additional informations to be answered so we can focus onto the next one.
-                pass
-
-            elif next_action == "continue_search": # The actual gap question need more additional informations to be answered so we use internet search.
-                # Perform the search action.
-                logger.debug(f"Searching additional informations for the following question: {current_question}\n")
+        if token_usage.total >= token_budget * 0.9 or state.bad_attempts >= max_bad_attempts: # Check if we are close to the budget or have too many failures.
+            logger.info(f"Generation of the answer with the beast mode ({token_usage.total} tokens generated & {state.bad_attempts} failed attempts).\n")
+            add_to_diary(memory["diaryContext"], step, "beast_mode", initial_query,
+                        "Budget threshold reached.")
+            state.answer_mode = "beast_mode"
+            break
 
-                if global_config.web_search_engine == "ddg": # Use DuckDuckGo engine for web search
-                    results = search.ddgs_search_web(current_question, search_history=memory['processed_queries'], num_results=3)
-                elif global_config.web_search_engine == "exa":
-                    results = search.exa_search_web(current_question, search_history=memory['processed_queries'], num_results=3)
-                else:
-                    logger.error(f"WEB_SEARCH_ENGINE value is not valid: {global_config.web_search_engine}")
-                token_usage += 100  # Simulate token usage for the search step.
+        # Only the gap questions without outcome have to be investigated (all of them unless the step is resumed).
+        pending_indexes = [index for index, outcome in enumerate(state.outcomes) if outcome is None]
+
+        # Rewrite every gap question into a web query with a single LLM call (ExaSearch alone uses the questions as is).
+        rewritten_queries = {}
+        if global_config.query_rewrite_mode == "batch" and global_config.web_search_engine != "exa":
+            try:
+                rewritten_queries = await asyncio.to_thread(search.rewrite_queries, [gaps[index] for index in pending_indexes
+                                                                                     if gaps[index] not in memory['processed_queries']])
+            except Exception as e: # The questions will be rewritten one by one by the search step.
+                logger.debug(f"Error during the batch rewrite of the gap questions: {e}\n")
+
+        async def investigate(index):
+            # Runs the pipeline of a gap question and checkpoints its outcome as soon as it is known.
+            state.outcomes[index] = await run_gap_pipeline(gaps[index], memory, semaphore, max_bad_attempts - state.bad_attempts,
+                                                           rewritten_query=rewritten_queries.get(gaps[index]))
+            checkpoint()
+
+        # Investigate every gap question concurrently, each one with the same view of the memory.
+        # A failed pipeline doesn't abort the others: its question is dropped and the other outcomes are merged.
+        pipeline_results = await asyncio.gather(*[investigate(index) for index in pending_indexes], return_exceptions=True)
+        for index, result in zip(pending_indexes, pipeline_results):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result # Cancellation of the session
+            if isinstance(result, Exception):
+                logger.error(f"Error while investigating the gap question '{gaps[index]}': {result}\n")
+                add_to_diary(memory["diaryContext"], step, "error", gaps[index], f"Investigation failed: {result}")
+        investigated_gaps = len(state.outcomes)
+        outcomes = [outcome for outcome in state.outcomes if outcome is not None] # Without the failed pipelines
+
+        # Merge the outcomes into the memory in the order of the gap questions.
+        for outcome in outcomes:
+            current_question = outcome["question"]
+            for _ in range(outcome["bad_attempts"]):
+                add_to_diary(memory["diaryContext"], step, "error", current_question,
+                            "Unknown action encountered.")
+            state.bad_attempts += outcome["bad_attempts"]
+
+            if outcome["action"] == "continue_search":
+                results = outcome["results"]
                 add_to_diary(memory["diaryContext"], step, "search", current_question,
-                            f"Retrieved {len(results)} results.")
+                            f"Retrieved {len(results)} results.", results=len(results))
 
                 # Process search results to update the knowledge memory.
-                memory = read.process_results(results, memory)
+                with tracer.span("read", search_results=len(results)) as span:
+                    knowledge_added = memory["knowledge"].added
+                    memory = read.process_results(results, memory, pages=outcome["pages"])
+                    new_items = memory["knowledge"].added_since(knowledge_added) # Without the items already evicted
+                    added_items = len(new_items)
+                    new_terms = novelty.observe(len(results), new_items)
+                    span.add(results=added_items)
+                    span.set(new_terms=new_terms)
+                if knowledge_index is not None and added_items:
+                    await asyncio.to_thread(knowledge_index.add_items, [(item.source, item.text) for item in new_items])
                 add_to_diary(memory["diaryContext"], step, "read", current_question,
-                            "Processed search results and updated memory.")
-            else:
-                pass
-                
-        logger.info(f"Generation of the answer after having used {token_usage} tokens and failed {bad_attempts} times during the search and reasonning processus.\n")
-        final_answer = generate_answer.generate_answer(memory=memory, mode='normal_generation')
+                            f"Processed search results ({len(outcome['pages'])} pages read) and updated memory.",
+                            pages=len(outcome["pages"]), knowledge_items=added_items, new_terms=new_terms)
+        del gaps[:investigated_gaps] # The investigated gap questions leave the queue
+        state.outcomes = None
+        round_novelty = novelty.end_round()
+        if round_novelty is not None:
+            logger.debug(f"Novelty of the step {step}: {round_novelty:.2f}\n")
+
+        if any(outcome["action"] == "budget_exceeded" for outcome in outcomes): # A prompt didn't fit in the remaining budget
+            logger.info(f"Generation of the answer with the beast mode ({token_usage.total} tokens generated & {state.bad_attempts} failed attempts).\n")
+            add_to_diary(memory["diaryContext"], step, "beast_mode", initial_query,
+                        "Budget threshold reached.")
+            state.answer_mode = "beast_mode"
+        elif any(outcome["action"] not in ["generate_answer", "continue_search"] for outcome in outcomes): # Too much bad attempts so we have to aswer immediately
+            logger.info(f"Generation of the answer with the beast mode after {max_bad_attempts} failed attempts.\n")
+            add_to_diary(memory["diaryContext"], step, "beast_mode", initial_query,
+                        "Failure threshold reached.")
+            state.answer_mode = "beast_mode"
+        elif gaps and round_novelty is not None and novelty.saturated(): # The last step brought almost nothing new: the remaining gap questions would not either
+            logger.info(f"Generation of the answer after the step {step} (novelty {round_novelty:.2f}), {len(gaps)} gap questions left uninvestigated.\n")
+            add_to_diary(memory["diaryContext"], step, "early_stop", initial_query,
+                         f"Knowledge saturated (novelty {round_novelty:.2f}), {len(gaps)} gap questions dropped.", gap_questions=len(gaps))
+            gaps.clear()
+            state.answer_mode = "normal_generation"
+        elif not gaps:
+            logger.info(f"Generation of the answer after having used {token_usage.total} tokens and failed {state.bad_attempts} times during the search and reasonning processus.\n")
+            state.answer_mode = "normal_generation"
+
+    if state.answer_mode is None: # The budget was already spent before the first step.
+        add_to_diary(memory["diaryContext"], state.step, "beast_mode", initial_query,
+                    "Budget threshold reached.")
+        state.answer_mode = "beast_mode"
+    checkpoint()
+
+    # In beast mode, the final answer is generated immediately with the actual state.
+    with tracer.span("answer", mode=state.answer_mode):
+        state.final_answer = await asyncio.to_thread(generate_answer.generate_answer, memory=memory, mode=state.answer_mode, sink=sink)
+    logger.debug(f"Token usage of the session: {token_usage.breakdown()}\n")
+    checkpoint()
+    return state.final_answer
+
+
+def deep_search(initial_query: str, token_budget: int=10000, max_bad_attempts: int=3, max_concurrency: int=None,
+                token_usage: TokenUsage=None, trace_id: str=None, checkpoint_path: str=None, sink: AnswerSink=None):
+    """
+    Executes the DeepSearch algorithm loop.
+
+    Args:
+        initial_query (str): The initial query or question provided by the user.
+        token_budget (int): Maximum allowed tokens for the DeepSearch execution.
+        max_bad_attempts (int): Maximum allowed failed attempts before forcing beast mode.
+        max_concurrency (int, optional): Maximum number of gap questions investigated at the same time.
+        token_usage (TokenUsage, optional): Tracker of the tokens consumed by the session, by stage.
+        trace_id (str, optional): The id of the trace of the session.
+        checkpoint_path (str, optional): File where the state of the session is checkpointed.
+        sink (AnswerSink, optional): The destination of the tokens of the final answer. Defaults to the standard output.
+
+    Returns:
+        str: The final answer (also streamed to the sink).
+
+    Role:
+        Synchronous wrapper around async_deep_search, used by the CLI.
+    """
+    return asyncio.run(async_deep_search(initial_query, token_budget=token_budget, max_bad_attempts=max_bad_attempts, max_concurrency=max_concurrency,
+                                         token_usage=token_usage, trace_id=trace_id, checkpoint_path=checkpoint_path, sink=sink))
+
+
+async def stream_deep_search(initial_query: str, **kwargs):
+    """
+    Runs a DeepSearch session and yields the tokens of the final answer as they are generated.
+
+    Args:
+        initial_query (str): The initial query or question provided by the user.
+        **kwargs: The other parameters of async_deep_search (except sink).
 
-        return None
+    Yields:
+        str: The tokens of the final answer.
+
+    Raises:
+        Exception: The error of the session, once the tokens generated before it are yielded.
+
+    Role:
+        Asynchronous iterator API of the session: nothing is written to the standard output, and the session
+        is cancelled if the consumer stops iterating. Cancelling the task doesn't stop the worker threads, so the
+        sink is cancelled too: the answer generation stops at its next token. The reasoning and search calls
+        already running in worker threads still finish, but their results are discarded.
+    """
+    sink = BroadcastSink()
+    task = asyncio.create_task(async_deep_search(initial_query, sink=sink, **kwargs))
+    task.add_done_callback(lambda _: sink.close())
+    try:
+        async for token in sink.subscribe():
+            yield token
+        await task
+    finally:
+        if not task.done():
+            sink.cancel()
+            task.cancel()
+
+
+def iter_deep_search(initial_query: str, **kwargs):
+    """
+    Runs a DeepSearch session in a background thread and yields the tokens of the final answer as they are generated.
+
+    Args:
+        initial_query (str): The initial query or question provided by the user.
+        **kwargs: The other parameters of deep_search (except sink).
+
+    Yields:
+        str: The tokens of the final answer.
+
+    Raises:
+        Exception: The error of the session, once the tokens generated before it are yielded.
+    """
+    tokens = queue.Queue()
+    end_of_answer = object()
+    errors = []
+
+    def run_session():
+        try:
+            deep_search(initial_query, sink=CallbackSink(tokens.put), **kwargs)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            tokens.put(end_of_answer)
+
+    session_thread = threading.Thread(target=run_session, daemon=True)
+    session_thread.start()
+    while (token := tokens.get()) is not end_of_answer:
+        yield token
+    session_thread.join()
+    if errors:
+        raise errors[0]
+
+
+def resume_deep_search(checkpoint_path: str, max_bad_attempts: int=3, max_concurrency: int=None, token_usage: TokenUsage=None):
+    """
+    Resumes an interrupted DeepSearch session from its last checkpoint.
+
+    Args:
+        checkpoint_path (str): The checkpoint file of the session. It keeps being updated by the resumed session.
+        max_bad_attempts (int): Maximum allowed failed attempts before forcing beast mode.
+        max_concurrency (int, optional): Maximum number of gap questions investigated at the same time.
+        token_usage (TokenUsage, optional): Tracker of the tokens consumed by the session (including before the checkpoint).
+
+    Returns:
+        str: The final answer (also streamed to the standard output).
+    """
+    state = SessionState.load(checkpoint_path)
+    logger.info(f"Resuming the session \"{state.initial_query}\" at step {state.step} from {checkpoint_path}\n")
+    return asyncio.run(async_deep_search(state.initial_query, max_bad_attempts=max_bad_attempts, max_concurrency=max_concurrency,
+                                         token_usage=token_usage, checkpoint_path=checkpoint_path, state=state))
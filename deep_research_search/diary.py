@@ -0,0 +1,134 @@
+"""Bounded diary of the actions taken during a DeepSearch session."""
+
+class DiaryEntry:
+    """An action taken at a step, with its details and its numeric outcomes (e.g. number of results)."""
+    __slots__ = ("step", "action", "question", "result", "counts")
+
+    def __init__(self, step: int, action: str, question: str, result: str, counts: dict = None):
+        self.step = step
+        self.action = action
+        self.question = question
+        self.result = result
+        self.counts = counts or {}
+
+    def render(self) -> str:
+        return (
+            f"At step {self.step}, you took **{self.action}** action for question: \"{self.question}\"\n"
+            f"Details: {self.result}\n"
+        )
+
+class Diary:
+    """
+    Diary of a session whose rendered size doesn't grow with the length of the session.
+
+    Only the most recent entries are kept verbatim. The older ones are compacted into counters by action
+    (number of entries and sum of their numeric outcomes), rendered as a single summary line.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        """
+        Creates an empty diary.
+
+        Args:
+            max_entries (int): Number of recent entries kept verbatim.
+        """
+        self.max_entries = max(1, max_entries)
+        self.entries = []
+        self.compacted = {} # action -> {"entries": number of compacted entries, <count name>: sum of the counts}
+        self.compacted_steps = None # (first step, last step) of the compacted entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries) or bool(self.compacted)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def add(self, step: int, action: str, question: str, result: str, **counts):
+        """
+        Adds an entry, compacting the oldest entries beyond the bound.
+
+        Args:
+            step (int): The current step number.
+            action (str): The action taken at this step.
+            question (str): The question associated with the action.
+            result (str): Details of what was done and the obtained results.
+            **counts: Numeric outcomes of the action (e.g. results=3), summed when the entry is compacted.
+
+        Returns:
+            None
+        """
+        self.entries.append(DiaryEntry(step, action, question, result, counts))
+        while len(self.entries) > self.max_entries:
+            self._compact(self.entries.pop(0))
+
+    def _compact(self, entry: DiaryEntry):
+        """Adds an entry to the counters of its action."""
+        counters = self.compacted.setdefault(entry.action, {"entries": 0})
+        counters["entries"] += 1
+        for name, value in entry.counts.items():
+            counters[name] = counters.get(name, 0) + value
+        first_step, last_step = self.compacted_steps or (entry.step, entry.step)
+        self.compacted_steps = (min(first_step, entry.step), max(last_step, entry.step))
+
+    def summary(self) -> str:
+        """
+        Returns the summary of the compacted entries.
+
+        Returns:
+            str: e.g. "Summary of the steps 0 to 2: search done 6 times (results: 14); read done 6 times (knowledge_items: 12)."
+                 An empty string if no entry was compacted.
+        """
+        if not self.compacted:
+            return ""
+        actions = []
+        for action, counters in self.compacted.items():
+            counts = ", ".join(f"{name}: {value}" for name, value in counters.items() if name != "entries")
+            times = "time" if counters["entries"] == 1 else "times"
+            actions.append(f"{action} done {counters['entries']} {times}" + (f" ({counts})" if counts else ""))
+        first_step, last_step = self.compacted_steps
+        steps = f"step {first_step}" if first_step == last_step else f"steps {first_step} to {last_step}"
+        return f"Summary of the {steps}: {'; '.join(actions)}.\n"
+
+    def render(self) -> str:
+        """
+        Returns the text of the diary included in the prompts.
+
+        Returns:
+            str: The summary of the compacted entries followed by the recent entries.
+        """
+        summary = self.summary()
+        return "\n".join(([summary] if summary else []) + [entry.render() for entry in self.entries])
+
+    def to_dict(self) -> dict:
+        """
+        Returns the diary as JSON-serializable data.
+
+        Returns:
+            dict: The recent entries and the counters of the compacted ones.
+        """
+        return {
+            "max_entries": self.max_entries,
+            "entries": [[entry.step, entry.action, entry.question, entry.result, entry.counts] for entry in self.entries],
+            "compacted": self.compacted,
+            "compacted_steps": list(self.compacted_steps) if self.compacted_steps else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Diary":
+        """
+        Rebuilds a diary from the data returned by to_dict.
+
+        Args:
+            data (dict): The serialized diary.
+
+        Returns:
+            Diary: The diary.
+        """
+        diary = cls(data["max_entries"])
+        diary.entries = [DiaryEntry(*entry) for entry in data["entries"]]
+        diary.compacted = data["compacted"]
+        diary.compacted_steps = tuple(data["compacted_steps"]) if data["compacted_steps"] else None
+        return diary
@@ -0,0 +1,220 @@
+"""Fake LLM, web search backends and stub OpenAI-compatible server used to run DeepSearch offline (benchmarks, profiling)."""
+from contextlib import contextmanager
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+import time
+
+import deep_research_search.llm_cache as llm_cache
+import deep_research_search.llm_providers as llm_providers
+import deep_research_search.knowledge_index as knowledge_index
+import deep_research_search.search_cache as search_cache
+import deep_research_search.search_backends as search_backends
+from deep_research_search.search_backends import SearchBackend, TokenBucket
+from deep_research_search.llm_providers import LLMProvider
+from deep_research_search.token_usage import estimate_tokens
+from deep_research_search.config import global_config
+
+class FakeOllama(LLMProvider):
+    """
+    Fake LLM provider: `generate` answers every structured prompt with a valid JSON after a simulated latency
+    (fixed latency + prefill time + generation time).
+    """
+
+    def __init__(self, latency: float = 0.05, prefill_tokens_per_second: float = 2000.0, tokens_per_second: float = 50.0,
+                 completion_tokens: int = 20, answer_tokens: int = 200, action: str = "continue_search", max_in_flight: int = None):
+        """
+        Args:
+            latency (float): Fixed latency (in seconds) of each request.
+            prefill_tokens_per_second (float): Speed of the prompt evaluation.
+            tokens_per_second (float): Speed of the generation.
+            completion_tokens (int): Number of generated tokens of the structured responses.
+            answer_tokens (int): Number of generated tokens of the streamed answers.
+            action (str): The action returned by the reasoning calls.
+            max_in_flight (int, optional): Maximum number of requests in flight. Defaults to LLM_MAX_IN_FLIGHT.
+        """
+        super().__init__(max_in_flight=max_in_flight or global_config.llm_max_in_flight)
+        self.latency = latency
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.answer_tokens = answer_tokens
+        self.action = action
+        self.calls = 0
+
+    def _structured_response(self, prompt: str, schema: dict) -> dict:
+        """Builds a JSON response matching the properties of the output format."""
+        properties = schema.get("properties", {})
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        response = {}
+        if "action" in properties:
+            response["action"] = self.action
+        if "gap_questions" in properties:
+            response["gap_questions"] = [f"Gap question {i} of {digest}?" for i in range(3)]
+        if "query" in properties:
+            response["query"] = f"web query {digest}"
+        if "queries" in properties:
+            questions = re.findall(r"^\d+\. (.*)$", prompt, re.MULTILINE)
+            response["queries"] = [f"web query {hashlib.sha1(question.encode('utf-8')).hexdigest()[:8]}" for question in questions]
+        return response
+
+    def generate(self, model: str = None, prompt: str = "", stream: bool = False, format: dict = None, options: dict = None, **kwargs):
+        """Simulates ollama.generate (same parameters and response keys)."""
+        self.calls += 1
+        prompt_tokens = estimate_tokens(prompt)
+        time.sleep(self.latency + prompt_tokens / self.prefill_tokens_per_second)
+
+        if stream:
+            return self._stream(prompt_tokens)
+
+        time.sleep(self.completion_tokens / self.tokens_per_second)
+        response = json.dumps(self._structured_response(prompt, format or {})) if format else "Fake response."
+        return {"response": response, "done": True, "prompt_eval_count": prompt_tokens, "eval_count": self.completion_tokens}
+
+    def _stream(self, prompt_tokens: int):
+        for i in range(self.answer_tokens):
+            time.sleep(1 / self.tokens_per_second)
+            yield {"response": f"token{i} ", "done": False}
+        yield {"response": "", "done": True, "prompt_eval_count": prompt_tokens, "eval_count": self.answer_tokens}
+
+class FakeSearchBackend(SearchBackend):
+    """Web search backend returning deterministic results after a simulated latency."""
+
+    def __init__(self, name: str, latency: float = 0.3, snippet_words: int = 40):
+        """
+        Args:
+            name (str): The engine replaced by this backend ("ddg" or "exa").
+            latency (float): Latency (in seconds) of each search.
+            snippet_words (int): Number of words of each snippet.
+        """
+        super().__init__(TokenBucket(rate=1e9, capacity=1000000), max_retries=0) # No rate limit
+        self.name = name
+        self.latency = latency
+        self.snippet_words = snippet_words
+        self.calls = 0
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        self.calls += 1
+        time.sleep(self.latency)
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]
+        return [
+            (f"Result {i} for {query}", f"https://{self.name}.example.com/{digest}/{i}",
+             " ".join(f"{query} fact{i} word{j}" for j in range(self.snippet_words // 4)))
+            for i in range(num_results)
+        ]
+
+    def is_retryable(self, exception: Exception) -> bool:
+        return False
+
+@contextmanager
+def offline_backends(fake_ollama: FakeOllama, fake_backends: dict, disable_caches: bool = True):
+    """
+    Replaces the LLM and the web search backends by fakes inside the block.
+
+    Args:
+        fake_ollama (FakeOllama): The fake LLM, replacing the LLM_PROVIDER provider.
+        fake_backends (dict): The fake search backend of each engine.
+        disable_caches (bool): If True, the LLM and search caches and the knowledge index are disabled inside the block.
+
+    Yields:
+        None
+    """
+    # Each cache is disabled by marking it as already created, as None (without opening its database)
+    cache_slots = [(llm_cache, "_llm_cache"), (search_cache, "_search_cache"), (knowledge_index, "_knowledge_index")]
+    saved_caches = [(getattr(module, name), getattr(module, f"{name}_created")) for module, name in cache_slots]
+    saved_providers = dict(llm_providers._providers)
+    saved_backends = dict(search_backends._backends)
+    llm_providers._providers[global_config.llm_provider] = fake_ollama
+    search_backends._backends.update(fake_backends)
+    if disable_caches:
+        for module, name in cache_slots:
+            setattr(module, name, None)
+            setattr(module, f"{name}_created", True)
+    try:
+        yield
+    finally:
+        for (module, name), (cache, created) in zip(cache_slots, saved_caches):
+            setattr(module, name, cache)
+            setattr(module, f"{name}_created", created)
+        llm_providers._providers.clear()
+        llm_providers._providers.update(saved_providers)
+        search_backends._backends.clear()
+        search_backends._backends.update(saved_backends)
+
+class StubOpenAIServer:
+    """
+    Local HTTP server implementing the chat completions endpoint of the OpenAI-compatible API (JSON and server-sent
+    events responses) with a FakeOllama, to run the OpenAI-compatible provider without an inference server.
+    """
+
+    def __init__(self, fake_ollama: FakeOllama, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            fake_ollama (FakeOllama): The fake LLM generating the responses.
+            host (str): The host to bind.
+            port (int): The port to bind (a free port if 0).
+        """
+        self.fake_ollama = fake_ollama
+        self.requests = 0
+        self.connections = 0 # Number of TCP connections accepted (lower than the requests if they are kept alive)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive connections
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                prompt = body["messages"][-1]["content"]
+                schema = (body.get("response_format") or {}).get("json_schema", {}).get("schema")
+                response = stub.fake_ollama.generate(model=body.get("model"), prompt=prompt, stream=body.get("stream", False), format=schema)
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in response:
+                        event = {"choices": [{"index": 0, "delta": {"content": chunk["response"]}}]} if not chunk["done"] else \
+                            {"choices": [], "usage": {"prompt_tokens": chunk["prompt_eval_count"], "completion_tokens": chunk["eval_count"]}}
+                        self._write_chunk(f"data: {json.dumps(event)}\n\n")
+                    self._write_chunk("data: [DONE]\n\n")
+                    self._write_chunk("")
+                else:
+                    content = json.dumps({
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": response["response"]}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": response["prompt_eval_count"], "completion_tokens": response["eval_count"]},
+                    }).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+
+            def _write_chunk(self, text: str):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}/v1"
+
+    def __enter__(self) -> "StubOpenAIServer":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
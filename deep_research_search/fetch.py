@@ -0,0 +1,192 @@
+"""Concurrent web page fetching and text extraction for the Read step."""
+from concurrent.futures import ThreadPoolExecutor
+import codecs
+from html.parser import HTMLParser
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "header", "footer", "pre", "blockquote"}
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+def collapse_whitespace(text: str) -> str:
+    """
+    Collapses the whitespaces of each line of a text and removes the empty lines.
+
+    Args:
+        text (str): The text to clean.
+
+    Returns:
+        str: The cleaned text.
+    """
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+class PlainTextExtractor:
+    """
+    Extractor of the plain text pages, with the same interface as TextExtractor.
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def feed(self, data: str):
+        self._parts.append(data)
+
+    def close(self):
+        pass
+
+    def get_text(self) -> str:
+        return collapse_whitespace("".join(self._parts))
+
+class TextExtractor(HTMLParser):
+    """
+    Incremental HTML to text converter: the HTML can be fed chunk by chunk while it is downloaded.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts = []
+        self._skipped_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipped_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self._skipped_depth > 0:
+            self._skipped_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipped_depth:
+            self._parts.append(data)
+
+    def get_text(self) -> str:
+        """
+        Returns the text extracted so far, with the whitespaces collapsed.
+
+        Returns:
+            str: The extracted text, one line per block of the page.
+        """
+        return collapse_whitespace("".join(self._parts))
+
+class PageFetcher:
+    """
+    Fetches web pages concurrently with a pooled HTTP session.
+
+    The number of simultaneous requests is limited globally (worker threads) and per host, every request
+    has a timeout and at most `max_bytes` bytes of each page are downloaded.
+    """
+
+    def __init__(self, max_workers: int = 8, max_per_host: int = 2, timeout: float = 10.0, max_bytes: int = 1000000):
+        """
+        Creates the fetcher and its HTTP session.
+
+        Args:
+            max_workers (int): Maximum number of pages fetched at the same time.
+            max_per_host (int): Maximum number of pages fetched at the same time from the same host.
+            timeout (float): Connect and read timeout (in seconds) of each request.
+            max_bytes (int): Maximum number of bytes downloaded for each page.
+        """
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0 (compatible; DeepResearchSearch/0.1)"
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page_fetcher")
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url: str) -> threading.Semaphore:
+        """Returns the semaphore limiting the concurrent requests to the host of an URL."""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.Semaphore(self.max_per_host)
+            return self._host_semaphores[host]
+
+    def fetch_text(self, url: str) -> str:
+        """
+        Downloads a page and extracts its text while it is streamed.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            str: The text of the page, or None if the page couldn't be fetched or isn't a text page.
+        """
+        with self._host_semaphore(url):
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    content_type = response.headers.get("Content-Type", "text/html").lower()
+                    if not content_type.startswith(TEXT_CONTENT_TYPES):
+                        logger.debug(f"Skipping {url}: unsupported content type {content_type}\n")
+                        return None
+
+                    # Without an explicit charset, requests assumes ISO-8859-1 but most pages are in UTF-8.
+                    encoding = response.encoding if "charset" in content_type else "utf-8"
+                    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                    extractor = PlainTextExtractor() if content_type.startswith("text/plain") else TextExtractor()
+                    downloaded_bytes = 0
+                    for chunk in response.iter_content(chunk_size=16384):
+                        chunk = chunk[:self.max_bytes - downloaded_bytes]
+                        downloaded_bytes += len(chunk)
+                        extractor.feed(decoder.decode(chunk))
+                        if downloaded_bytes >= self.max_bytes:
+                            break
+                    extractor.feed(decoder.decode(b"", final=True))
+                    extractor.close()
+            except (requests.RequestException, LookupError) as e:
+                logger.debug(f"Error fetching {url}: {e}\n")
+                return None
+
+        return extractor.get_text()
+
+    def fetch_pages(self, urls: list) -> dict:
+        """
+        Fetches several pages concurrently.
+
+        Args:
+            urls (list): The URLs of the pages.
+
+        Returns:
+            dict: The text of each successfully fetched page, keyed by URL.
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        texts = self._executor.map(self.fetch_text, unique_urls)
+        return {url: text for url, text in zip(unique_urls, texts) if text}
+
+_page_fetcher = None
+_page_fetcher_lock = threading.Lock()
+
+def get_page_fetcher() -> PageFetcher:
+    """
+    Returns the long-lived page fetcher, creating it (and its thread pool) on first use.
+
+    Returns:
+        PageFetcher: The fetcher.
+    """
+    global _page_fetcher
+    with _page_fetcher_lock:
+        if _page_fetcher is None:
+            _page_fetcher = PageFetcher(
+                max_workers=global_config.fetch_max_workers,
+                max_per_host=global_config.fetch_max_per_host,
+                timeout=global_config.fetch_timeout,
+                max_bytes=global_config.fetch_max_bytes,
+            )
+        return _page_fetcher
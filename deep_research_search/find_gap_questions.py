@@ -12,7 +12,7 @@ def find_gap_questions(memory, question_to_answer):
 
     Args:
         memory (dict): The current in-memory knowledge state containing at least:
-                       - "knowledge": a list of gathered knowledge items.
+                       - "knowledge": a KnowledgeStore of gathered knowledge items.
         question_to_answer (str): The actual question to use to find the gap knowledge that will be used to answer it.
 
     Returns:
@@ -25,7 +25,7 @@ def find_gap_questions(memory, question_to_answer):
         any missing information and formulate follow-up (gap) questions.
     """
     # Aggregate all collected knowledge text.
-    #aggregated_text = " ".join([item["text"] for item in memory.get("knowledge", [])])
+    #aggregated_text = " ".join([item.text for item in memory.get("knowledge", [])])
     
     # Build the prompt for the LLM.
     #prompt = GENERATING_GAP_QUESTIONS_PROMPT.format(question_to_answer=question_to_answer, aggregated_text= aggregated_text)
@@ -33,7 +33,7 @@ def find_gap_questions(memory, question_to_answer):
     
     # Query the LLM using OLlama.
     try:
-        response = query_ollama(prompt=prompt, output_format=GapQuestionsGenerationOutputFormat)
+        response = query_ollama(prompt=prompt, output_format=GapQuestionsGenerationOutputFormat, stage="gap_detection")
         # The response is expected to be a JSON array of strings.
         if isinstance(response, str):
             gap_questions = list(json.loads(response).get("gap_questions", []))
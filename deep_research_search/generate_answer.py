@@ -4,8 +4,14 @@ import json
 
 from deep_research_search.utils import query_ollama
 from deep_research_search.prompts import GENERATING_FINAL_ANSWER_PROMPT, BEAST_MODE_PROMPT
+from deep_research_search.token_usage import current_token_usage, estimate_tokens
+from deep_research_search.streaming import AnswerSink
+from deep_research_search.config import global_config
 
-def generate_answer(memory, mode):
+MIN_KNOWLEDGE_TOKENS = 1000 # Knowledge always kept in the final answer prompt, even if the budget is spent
+ANSWER_ERROR_PREFIX = "Error generating answer: " # Start of the answer returned when the generation failed
+
+def generate_answer(memory, mode, sink: AnswerSink = None):
     """
     Generates a final answer from the accumulated knowledge if possible.
 
@@ -13,19 +19,33 @@ def generate_answer(memory, mode):
         memory (dict): The memory containing all information gathered that is relevant to answer the query.
                        Expected keys include "knowledge", "diaryContext", and "processed_queries".
         mode (str): The answer generation mode. It can be either 'normal_generation' or 'beast_mode'.
+        sink (AnswerSink, optional): The destination of the tokens of the answer as they are generated.
+                                     Defaults to the standard output.
 
     Returns:
-        str: The final answer to the original query, formulated in natural language.
+        str: The final answer to the original query, formulated in natural language, or ANSWER_ERROR_PREFIX
+             followed by the error if the generation failed.
 
     Role:
         This function composes the answer for the user by synthesizing the information stored in memory.
         It uses a language model (via a local OLlama LLM) to construct a coherent and comprehensive response.
         In "beast_mode", it uses an aggressive prompt to force maximum information retrieval.
+        Only the knowledge the most relevant to the initial query that fits in ANSWER_CONTEXT_MAX_TOKENS
+        (and in the remaining token budget of the session) is included in the prompt.
     """
     # Extract the initial query, aggregated knowledge, and diary context from memory.
     initial_query = memory["initial_query"]
-    knowledge_text = "\n".join([item["text"] for item in memory.get("knowledge", [])])
-    diary_context = "\n".join(memory.get("diaryContext", []))
+    knowledge = memory.get("knowledge")
+    diary = memory.get("diaryContext")
+    diary_context = diary.render() if diary else ""
+
+    max_knowledge_tokens = global_config.answer_context_max_tokens
+    token_usage = current_token_usage.get()
+    if token_usage is not None and token_usage.remaining() is not None:
+        # The answer is always generated, so the knowledge is trimmed instead of refusing the call.
+        other_tokens = estimate_tokens(BEAST_MODE_PROMPT) + estimate_tokens(initial_query) + estimate_tokens(diary_context)
+        max_knowledge_tokens = min(max_knowledge_tokens, max(MIN_KNOWLEDGE_TOKENS, token_usage.remaining() - other_tokens))
+    knowledge_text = "\n".join([item.text for item in knowledge.select(initial_query, max_knowledge_tokens)]) if knowledge else ""
     
     # Compose the prompt based on the selected mode.
     if mode == "beast_mode":
@@ -38,10 +58,10 @@ def generate_answer(memory, mode):
 
     try:
         # Query the local OLlama server using the composed prompt.
-        response = query_ollama(prompt, stream=True)
+        response = query_ollama(prompt, stream=True, use_cache=False, stage="answer", enforce_budget=False, sink=sink)
         # Assume that the response returned is a string with the final answer.
         answer = response
     except Exception as e:
-        answer = "Error generating answer: " + str(e)
+        answer = ANSWER_ERROR_PREFIX + str(e)
     
     return answer
@@ -0,0 +1,234 @@
+"""Knowledge store of a DeepSearch session, with exact and near-duplicate detection."""
+from collections import Counter
+import hashlib
+import heapq
+
+from deep_research_search.retrieval import BM25Index, query_relevance, tokenize
+from deep_research_search.token_usage import estimate_tokens
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8 # The fingerprint is split in 8 bands of 8 bits to find the near-duplicate candidates
+NEAR_DUPLICATE_DISTANCE = 4 # Maximum number of different bits between two near-duplicate fingerprints
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes a text before hashing it (case and whitespaces are ignored).
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    return " ".join(text.lower().split())
+
+def simhash(text: str, shingle_size: int = 1) -> int:
+    """
+    Computes the SimHash fingerprint of a text from its word shingles.
+
+    Args:
+        text (str): The text to fingerprint.
+        shingle_size (int): The number of words of each shingle. Single words are the most robust for short snippets.
+
+    Returns:
+        int: A 64 bits fingerprint. Texts sharing most of their shingles have fingerprints with few different bits.
+    """
+    words = tokenize(text)
+    if len(words) < shingle_size:
+        shingles = words
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in Counter(shingles).items(): # Each distinct shingle is hashed once, weighted by its count
+        shingle_hash = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if shingle_hash >> bit & 1 else -count
+
+    fingerprint = 0
+    for bit in range(SIMHASH_BITS):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+class KnowledgeItem:
+    """
+    A piece of knowledge with its source and its fingerprint. A passage of a longer content also has its
+    character offsets in the content of the source (start and end are None for a whole content).
+    """
+    __slots__ = ("source", "text", "fingerprint", "start", "end", "serial", "relevance", "text_hash")
+
+    def __init__(self, source: str, text: str, fingerprint: int, start: int = None, end: int = None, serial: int = 0,
+                 text_hash: bytes = None):
+        self.source = source
+        self.text = text
+        self.fingerprint = fingerprint
+        self.text_hash = text_hash # SHA-1 of the normalized text, for the exact duplicate detection
+        self.start = start
+        self.end = end
+        self.serial = serial # Number of items added to the store before this one
+        self.relevance = 0.0 # Score for the relevance query of the store (query_relevance), computed when the item is added
+
+class KnowledgeStore:
+    """
+    Ordered collection of the knowledge items gathered during a session.
+
+    Duplicates are detected with a hash index of the normalized texts, and near-duplicates
+    (e.g. the same snippet from a mirrored page) with a banded index of the SimHash fingerprints.
+    The items are also indexed with BM25 to select the most relevant ones for a prompt.
+
+    When the estimated number of tokens of the items exceeds `max_tokens`, the items the least relevant to
+    `relevance_query` (the initial question of the session) are evicted. Each item is scored once, when it is added,
+    with a score that doesn't depend on the other items (query_relevance), and kept in a min-heap of the scores,
+    so an eviction doesn't rescore the store and the order of the additions doesn't bias it. An evicted item leaves
+    the duplicate indexes too, so its content can be added again later.
+    """
+
+    def __init__(self, near_duplicate_distance: int = NEAR_DUPLICATE_DISTANCE, max_tokens: int = 0, relevance_query: str = ""):
+        """
+        Creates an empty store.
+
+        Args:
+            near_duplicate_distance (int): Maximum number of different fingerprint bits for two texts to be near-duplicates.
+                                           It must stay lower than the number of bands.
+            max_tokens (int): Maximum estimated number of tokens of the stored items. 0 disables the eviction.
+            relevance_query (str): The question the evicted items are the least relevant to.
+        """
+        self.near_duplicate_distance = near_duplicate_distance
+        self.max_tokens = max_tokens
+        self.relevance_query = relevance_query
+        self._items = {}   # serial -> item, in insertion order
+        self._eviction_heap = [] # (relevance, serial, item) of the stored items when the eviction is enabled
+        self.tokens = 0    # Estimated number of tokens of the stored items
+        self.added = 0     # Number of items added since the creation of the store, evicted ones included
+        self.evicted = 0
+        self._text_hashes = set()
+        self._bands = [{} for _ in range(SIMHASH_BANDS)]
+        self.index = BM25Index()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __bool__(self):
+        return bool(self._items)
+
+    @property
+    def items(self) -> list:
+        """The stored items, in their insertion order."""
+        return list(self._items.values())
+
+    def _band_keys(self, fingerprint: int):
+        """Yields the (band index, band value) pairs of a fingerprint."""
+        band_bits = SIMHASH_BITS // SIMHASH_BANDS
+        mask = (1 << band_bits) - 1
+        for band in range(SIMHASH_BANDS):
+            yield band, fingerprint >> (band * band_bits) & mask
+
+    def find_near_duplicate(self, fingerprint: int):
+        """
+        Finds a stored item whose fingerprint is close to the given one.
+
+        Args:
+            fingerprint (int): The SimHash fingerprint to look for.
+
+        Returns:
+            KnowledgeItem: A near-duplicate item, or None if there is none.
+        """
+        # With fewer different bits than bands, a near-duplicate shares at least one full band.
+        for band, value in self._band_keys(fingerprint):
+            for item in self._bands[band].get(value, ()):
+                if bin(item.fingerprint ^ fingerprint).count("1") <= self.near_duplicate_distance:
+                    return item
+        return None
+
+    def add(self, text: str, source: str, start: int = None, end: int = None) -> bool:
+        """
+        Adds a new piece of knowledge if neither it nor a near-duplicate is already stored, then evicts the least
+        relevant items if the store is over its token cap (the new item itself may be evicted).
+
+        Args:
+            text (str): The knowledge content (e.g., a snippet or excerpt) to add.
+            source (str): The source identifier (e.g., URL) of the knowledge.
+            start (int, optional): The offset of the first character of a passage in the content of the source.
+            end (int, optional): The offset following the last character of a passage in the content of the source.
+
+        Returns:
+            bool: True if the knowledge item was added and kept, False if it was a duplicate or if it was evicted
+                  right away (the least relevant item of a full store).
+        """
+        text_hash = hashlib.sha1(normalize_text(text).encode("utf-8")).digest()
+        if text_hash in self._text_hashes:
+            return False
+
+        fingerprint = simhash(text)
+        if self.find_near_duplicate(fingerprint) is not None:
+            return False
+
+        item = KnowledgeItem(source, text, fingerprint, start, end, serial=self.added, text_hash=text_hash)
+        self._items[item.serial] = item
+        self.added += 1
+        self.tokens += estimate_tokens(text)
+        self._text_hashes.add(text_hash)
+        for band, value in self._band_keys(fingerprint):
+            self._bands[band].setdefault(value, []).append(item)
+        self.index.add(item, text)
+        if self.max_tokens:
+            item.relevance = query_relevance(self.relevance_query, text)
+            heapq.heappush(self._eviction_heap, (item.relevance, item.serial, item)) # The serials are unique, items are never compared
+            if self.tokens > self.max_tokens:
+                self._evict()
+        return item.serial in self._items
+
+    def _evict(self):
+        """Removes the items the least relevant to the relevance query (the oldest first) until the store fits in its token cap."""
+        while self.tokens > self.max_tokens and self._eviction_heap:
+            _, _, item = heapq.heappop(self._eviction_heap)
+            del self._items[item.serial]
+            self.tokens -= estimate_tokens(item.text)
+            self._text_hashes.discard(item.text_hash)
+            for band, value in self._band_keys(item.fingerprint):
+                self._bands[band][value].remove(item)
+                if not self._bands[band][value]:
+                    del self._bands[band][value]
+            self.index.remove(item, item.text)
+            self.evicted += 1
+
+    def added_since(self, added: int) -> list:
+        """
+        Returns the stored items added after a given number of additions (the value of `added` at some point).
+
+        Args:
+            added (int): The number of items added before the ones returned.
+
+        Returns:
+            list: The KnowledgeItem still stored, in their insertion order.
+        """
+        return [item for item in self._items.values() if item.serial >= added]
+
+    def select(self, query: str, max_tokens: int) -> list:
+        """
+        Selects the items the most relevant to a query that fit in a number of tokens.
+
+        Args:
+            query (str): The question the items have to be relevant to.
+            max_tokens (int): The maximum estimated number of tokens of the selected texts.
+
+        Returns:
+            list: The selected KnowledgeItem, from the most to the least relevant.
+                  Items with the same score are kept in their insertion order.
+        """
+        scores = self.index.scores(query)
+        ranked_items = sorted(enumerate(self._items.values()), key=lambda indexed_item: (-scores.get(indexed_item[1], 0.0), indexed_item[0]))
+
+        selected_items = []
+        used_tokens = 0
+        for _, item in ranked_items:
+            item_tokens = estimate_tokens(item.text) + 1 # +1 for the separator
+            if used_tokens + item_tokens > max_tokens:
+                continue # A shorter item may still fit
+            selected_items.append(item)
+            used_tokens += item_tokens
+        return selected_items
@@ -0,0 +1,193 @@
+"""Persistent knowledge index shared by the sessions, stored in a SQLite database with a full text index."""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from deep_research_search.knowledge import normalize_text
+from deep_research_search.retrieval import STOPWORDS, tokenize
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+MIN_TERMS_OVERLAP = 0.6 # Minimum fraction of the query terms an item must contain to be returned
+MAX_QUERY_TERMS = 32
+CLEANUP_INTERVAL = 100 # Number of stored items between two removals of the expired and least recently used items
+
+class KnowledgeIndex:
+    """
+    On-disk index of the knowledge items (snippets and page texts) gathered by the previous sessions,
+    keyed by content hash and searchable with the BM25 ranking of the SQLite FTS5 extension.
+
+    The items older than `ttl` seconds are removed, and when the index holds more than `max_entries`
+    items, the least recently used ones are evicted. Both cleanups run every `CLEANUP_INTERVAL` stored items,
+    so the index may briefly hold up to `CLEANUP_INTERVAL` extra items. The full text index reads the texts
+    from the items table (external content), so each text is stored once.
+    """
+
+    def __init__(self, path: str, max_entries: int = 20000, ttl: int = 2592000):
+        """
+        Opens (and creates if needed) the index database.
+
+        Args:
+            path (str): The path of the SQLite database file.
+            max_entries (int): Maximum number of items kept on disk.
+            ttl (int): Time to live of the items in seconds.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._inserts_since_cleanup = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The index is used by the sessions running in worker threads.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS knowledge_items ("
+            "id INTEGER PRIMARY KEY, content_hash TEXT NOT NULL UNIQUE, url TEXT NOT NULL, text TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL, uses INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_last_used ON knowledge_items (last_used)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_url ON knowledge_items (url)")
+        fts_schema = self._connection.execute("SELECT sql FROM sqlite_master WHERE name = 'knowledge_fts'").fetchone()
+        if fts_schema is not None and "content=" not in fts_schema[0]:
+            # Index created by a previous version with its own copy of the texts: rebuilt from the items table.
+            self._connection.execute("DROP TABLE knowledge_fts")
+            fts_schema = None
+        if fts_schema is None:
+            self._connection.execute(
+                "CREATE VIRTUAL TABLE knowledge_fts USING fts5(text, content='knowledge_items', content_rowid='id')"
+            )
+            self._connection.execute("INSERT INTO knowledge_fts (knowledge_fts) VALUES ('rebuild')")
+        with self._lock:
+            self._cleanup(time.time()) # Items left over by the previous runs
+
+    def add_items(self, items: list):
+        """
+        Stores knowledge items (the already known contents are only marked as used), and every `CLEANUP_INTERVAL`
+        stored items evicts the expired and least recently used items.
+
+        Args:
+            items (list): The (url, text) pairs to store.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        with self._lock:
+            for url, text in items:
+                content_hash = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+                cursor = self._connection.execute(
+                    "INSERT OR IGNORE INTO knowledge_items (content_hash, url, text, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (content_hash, url, text, now, now),
+                )
+                if cursor.rowcount:
+                    self._connection.execute("INSERT INTO knowledge_fts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text))
+                    self._inserts_since_cleanup += 1
+                else:
+                    self._connection.execute("UPDATE knowledge_items SET last_used = ? WHERE content_hash = ?", (now, content_hash))
+            if self._inserts_since_cleanup >= CLEANUP_INTERVAL:
+                self._cleanup(now)
+            self._connection.commit()
+
+    def _cleanup(self, now: float):
+        """Removes the expired items, then the least recently used ones beyond `max_entries`. Must be called with the lock held."""
+        self._inserts_since_cleanup = 0
+        self._delete("SELECT id, text FROM knowledge_items WHERE created_at < ?", (now - self.ttl,))
+        entries = self._connection.execute("SELECT COUNT(*) FROM knowledge_items").fetchone()[0]
+        if entries > self.max_entries:
+            # Only the excess is deleted, walking the last use index from the oldest item.
+            self._delete("SELECT id, text FROM knowledge_items ORDER BY last_used LIMIT ?", (entries - self.max_entries,))
+        self._connection.commit()
+
+    def _delete(self, select_items: str, parameters: tuple):
+        """Deletes the items (and their full text entries) selected by a query of their id and text. Must be called with the lock held."""
+        rows = self._connection.execute(select_items, parameters).fetchall()
+        if rows:
+            # The full text entries of an external content table are deleted with the text they were indexed with.
+            self._connection.executemany("INSERT INTO knowledge_fts (knowledge_fts, rowid, text) VALUES ('delete', ?, ?)", rows)
+            self._connection.executemany("DELETE FROM knowledge_items WHERE id = ?", [(row[0],) for row in rows])
+
+    def search(self, query: str, limit: int = 5) -> list:
+        """
+        Finds the stored items the most relevant to a query.
+
+        Args:
+            query (str): The question the items have to be relevant to.
+            limit (int): The maximum number of items returned.
+
+        Returns:
+            list: The (url, text) pairs, from the most to the least relevant. Only the items containing at least
+                  MIN_TERMS_OVERLAP of the query terms are returned.
+        """
+        terms = list(dict.fromkeys(term for term in tokenize(query) if len(term) > 1 and term not in STOPWORDS))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        match_expression = " OR ".join(f'"{term}"' for term in terms)
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT knowledge_items.id, url, knowledge_items.text FROM knowledge_fts "
+                "JOIN knowledge_items ON knowledge_items.id = knowledge_fts.rowid "
+                "WHERE knowledge_fts MATCH ? AND created_at >= ? ORDER BY bm25(knowledge_fts) LIMIT ?",
+                (match_expression, now - self.ttl, limit * 4),
+            ).fetchall()
+            selected_rows = []
+            for row in rows:
+                if len(set(terms) & set(tokenize(row[2]))) >= MIN_TERMS_OVERLAP * len(terms):
+                    selected_rows.append(row)
+                if len(selected_rows) == limit:
+                    break
+            self._connection.executemany("UPDATE knowledge_items SET last_used = ?, uses = uses + 1 WHERE id = ?",
+                                         [(now, row[0]) for row in selected_rows])
+            self._connection.commit()
+        logger.debug(f"{len(selected_rows)} known items found in the knowledge index for: {query}\n")
+        return [(url, text) for _, url, text in selected_rows]
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the index.
+
+        Returns:
+            dict: A dictionary with the keys "entries" and "uses" (number of times items were reused).
+        """
+        with self._lock:
+            entries, uses = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(uses), 0) FROM knowledge_items").fetchone()
+        return {"entries": entries, "uses": uses}
+
+    def clear(self):
+        """
+        Removes every stored item.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._connection.execute("INSERT INTO knowledge_fts (knowledge_fts) VALUES ('delete-all')")
+            self._connection.execute("DELETE FROM knowledge_items")
+            self._connection.commit()
+
+_knowledge_index = None
+_knowledge_index_created = False
+_knowledge_index_lock = threading.Lock()
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """
+    Returns the long-lived knowledge index, opening it on first use.
+
+    Returns:
+        KnowledgeIndex: The index, or None if KNOWLEDGE_INDEX_ENABLED is false.
+    """
+    global _knowledge_index, _knowledge_index_created
+    with _knowledge_index_lock:
+        if not _knowledge_index_created:
+            _knowledge_index = KnowledgeIndex(
+                path=global_config.knowledge_index_path,
+                max_entries=global_config.knowledge_index_max_entries,
+                ttl=global_config.knowledge_index_ttl,
+            ) if global_config.knowledge_index_enabled else None
+            _knowledge_index_created = True
+        return _knowledge_index
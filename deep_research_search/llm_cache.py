@@ -0,0 +1,185 @@
+"""Content-addressed cache of the LLM responses."""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from deep_research_search.config import global_config
+
+EVICTION_INTERVAL = 100 # Number of responses stored on disk between two evictions of the least recently used ones
+
+def make_cache_key(model_name: str, prompt: str, output_format_schema: dict = None, options: dict = None) -> str:
+    """
+    Builds the cache key of an LLM request.
+
+    Args:
+        model_name (str): The name of the model.
+        prompt (str): The prompt sent to the model.
+        output_format_schema (dict, optional): The JSON schema required for the output.
+        options (dict, optional): The generation options (temperature, seed...).
+
+    Returns:
+        str: A SHA-256 hex digest identifying the request.
+    """
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps([model_name, prompt_hash, output_format_schema, options], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    Two tiers cache of the LLM responses: an in-memory LRU and an optional SQLite database on disk.
+
+    The disk tier is trimmed to `disk_max_entries` every `EVICTION_INTERVAL` stored responses, so it may
+    briefly hold up to `EVICTION_INTERVAL` extra entries.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_path: str = "", disk_max_entries: int = 20000):
+        """
+        Creates the cache.
+
+        Args:
+            max_entries (int): Maximum number of responses kept in memory.
+            disk_path (str, optional): Path of the SQLite database of the disk tier. The disk tier is disabled if empty.
+            disk_max_entries (int): Maximum number of responses kept on disk.
+        """
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sets_since_eviction = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(disk_path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_last_access ON llm_responses (last_access)")
+            self._evict_from_disk()
+
+    def get(self, key: str):
+        """
+        Returns the cached response of a request.
+
+        Args:
+            key (str): The cache key built with make_cache_key.
+
+        Returns:
+            str: The cached response, or None on a cache miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+
+            if self._connection is not None:
+                row = self._connection.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._connection.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._connection.commit()
+                    self.disk_hits += 1
+                    self._store_in_memory(key, row[0])
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, response: str):
+        """
+        Stores a response in both tiers of the cache.
+
+        Args:
+            key (str): The cache key built with make_cache_key.
+            response (str): The response of the LLM.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._store_in_memory(key, response)
+            if self._connection is not None:
+                self._connection.execute("INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?)", (key, response, time.time()))
+                self._sets_since_eviction += 1
+                if self._sets_since_eviction >= EVICTION_INTERVAL:
+                    self._evict_from_disk()
+                self._connection.commit()
+
+    def _evict_from_disk(self):
+        """Removes the least recently used responses beyond `disk_max_entries` from the disk tier."""
+        self._sets_since_eviction = 0
+        entries = self._connection.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        if entries > self.disk_max_entries:
+            # Only the excess is deleted, walking the last access index from the oldest response.
+            self._connection.execute(
+                "DELETE FROM llm_responses WHERE key IN (SELECT key FROM llm_responses ORDER BY last_access LIMIT ?)",
+                (entries - self.disk_max_entries,),
+            )
+        self._connection.commit()
+
+    def _store_in_memory(self, key: str, response: str):
+        """Stores a response in the in-memory LRU and evicts the least recently used one if full."""
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        Returns the hit and miss counters of the cache.
+
+        Returns:
+            dict: A dictionary with the keys "memory_hits", "disk_hits", "misses" and "hit_rate".
+        """
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        """
+        Removes every cached response from both tiers.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM llm_responses")
+                self._connection.commit()
+
+_llm_cache = None
+_llm_cache_created = False
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache:
+    """
+    Returns the long-lived LLM cache, creating it (and opening its disk tier) on first use.
+
+    Returns:
+        LLMCache: The cache, or None if LLM_CACHE_ENABLED is false.
+    """
+    global _llm_cache, _llm_cache_created
+    with _llm_cache_lock:
+        if not _llm_cache_created:
+            _llm_cache = LLMCache(
+                max_entries=global_config.llm_cache_max_entries,
+                disk_path=global_config.llm_cache_disk_path,
+                disk_max_entries=global_config.llm_cache_disk_max_entries,
+            ) if global_config.llm_cache_enabled else None
+            _llm_cache_created = True
+        return _llm_cache
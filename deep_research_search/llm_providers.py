@@ -0,0 +1,204 @@
+"""
+LLM providers (inference servers) behind query_ollama: the Ollama server and the servers speaking the
+OpenAI-compatible API (llama.cpp server, vLLM...).
+
+Every provider returns the responses in the format of ollama.generate (the "response", "done",
+"prompt_eval_count" and "eval_count" keys), so the callers don't depend on the provider in use. The providers
+are created by the factories of a registry, and their client libraries are only imported on first use.
+"""
+from abc import ABC, abstractmethod
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deep_research_search.llm_scheduler import LLMScheduler
+from deep_research_search.config import global_config
+
+# Ollama generation options sent under another name by the OpenAI-compatible API
+OPENAI_OPTION_NAMES = {"num_predict": "max_tokens", "repeat_penalty": "repetition_penalty"}
+OPENAI_OPTIONS = {"temperature", "top_p", "top_k", "seed", "stop", "max_tokens", "presence_penalty", "frequency_penalty",
+                  "repetition_penalty", "min_p"}
+
+class LLMProvider(ABC):
+    """
+    Base class of the LLM providers.
+
+    Subclasses implement `generate`, with the parameters and the response format of ollama.generate. Each provider
+    has its own scheduler bounding the number of requests sent to its server at the same time.
+    """
+    name = None
+
+    def __init__(self, max_in_flight: int = 4):
+        """
+        Args:
+            max_in_flight (int): Maximum number of requests sent to the server at the same time (all sessions).
+        """
+        self.scheduler = LLMScheduler(max_in_flight=max_in_flight)
+
+    @abstractmethod
+    def generate(self, model: str, prompt: str, stream: bool = False, format: dict = None, options: dict = None):
+        """
+        Generates the response of the model to a prompt.
+
+        Args:
+            model (str): The name of the model.
+            prompt (str): The prompt.
+            stream (bool, optional): If True, the response is returned chunk by chunk.
+            format (dict, optional): The JSON schema the response must follow.
+            options (dict, optional): The generation options (Ollama names: temperature, seed, num_predict...).
+
+        Returns:
+            dict | Iterator[dict]: The response, or its chunks if streaming (the token counts are in the last chunk).
+        """
+
+class OllamaProvider(LLMProvider):
+    """Ollama server, queried with a long-lived client of the ollama library."""
+    name = "ollama"
+
+    def __init__(self, host: str = None, timeout: float = 300.0, **kwargs):
+        """
+        Args:
+            host (str, optional): The URL of the Ollama server. Defaults to the OLLAMA_HOST environment variable or the local server.
+            timeout (float): Timeout (in seconds) of each request.
+            **kwargs: The parameters of LLMProvider.
+        """
+        super().__init__(**kwargs)
+        import ollama
+        self.client = ollama.Client(host=host or None, timeout=timeout)
+
+    def generate(self, model: str, prompt: str, stream: bool = False, format: dict = None, options: dict = None):
+        return self.client.generate(model=model, prompt=prompt, stream=stream, format=format, options=options)
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Server speaking the OpenAI-compatible chat completions API (llama.cpp server, vLLM...), queried through a pool
+    of keep-alive connections. The structured outputs are requested with a JSON schema response format.
+    """
+    name = "openai"
+
+    def __init__(self, base_url: str, api_key: str = "", timeout: float = 300.0, connect_timeout: float = 10.0, **kwargs):
+        """
+        Args:
+            base_url (str): The URL of the API, e.g. "http://127.0.0.1:8080/v1".
+            api_key (str, optional): The API key sent as a bearer token (none if empty).
+            timeout (float): Timeout (in seconds) waiting for the server to send data.
+            connect_timeout (float): Timeout (in seconds) of the connection to the server.
+            **kwargs: The parameters of LLMProvider.
+        """
+        super().__init__(**kwargs)
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.timeout = (connect_timeout, timeout)
+        self.session = requests.Session()
+        # One keep-alive connection per request in flight.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.scheduler.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _request_body(self, model: str, prompt: str, stream: bool, format: dict, options: dict) -> dict:
+        """Builds the body of a chat completion request."""
+        body = {"model": model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+        if stream:
+            body["stream_options"] = {"include_usage": True} # The token counts are sent in the last chunk
+        if format is not None:
+            body["response_format"] = {"type": "json_schema", "json_schema": {"name": format.get("title", "output"), "schema": format}}
+        for name, value in (options or {}).items():
+            name = OPENAI_OPTION_NAMES.get(name, name)
+            if name in OPENAI_OPTIONS:
+                body[name] = value
+        return body
+
+    def generate(self, model: str, prompt: str, stream: bool = False, format: dict = None, options: dict = None):
+        body = self._request_body(model, prompt, stream, format, options)
+        response = self.session.post(self.url, json=body, stream=stream, timeout=self.timeout)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        if stream:
+            return self._stream(response)
+        with response:
+            completion = response.json()
+        usage = completion.get("usage") or {}
+        return {
+            "response": completion["choices"][0]["message"].get("content") or "",
+            "done": True,
+            "prompt_eval_count": usage.get("prompt_tokens"),
+            "eval_count": usage.get("completion_tokens"),
+        }
+
+    def _stream(self, response: requests.Response):
+        """Converts the server-sent events of a streamed completion into chunks in the Ollama format."""
+        usage = {}
+        done = False
+        with response: # Releases the connection to the pool, even if the consumer stops early
+            # The stream is read to its end: a connection closed before the last chunk couldn't be kept alive.
+            for line in response.iter_lines(decode_unicode=True):
+                if done or not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    done = True
+                    continue
+                event = json.loads(data)
+                usage = event.get("usage") or usage
+                for choice in event.get("choices") or []:
+                    token = (choice.get("delta") or {}).get("content")
+                    if token:
+                        yield {"response": token, "done": False}
+        yield {"response": "", "done": True, "prompt_eval_count": usage.get("prompt_tokens"), "eval_count": usage.get("completion_tokens")}
+
+def _create_ollama_provider() -> LLMProvider:
+    return OllamaProvider(host=global_config.ollama_host, timeout=global_config.llm_timeout, max_in_flight=global_config.llm_max_in_flight)
+
+def _create_openai_provider() -> LLMProvider:
+    return OpenAICompatibleProvider(global_config.openai_base_url, api_key=global_config.openai_api_key.get_secret_value(),
+                                    timeout=global_config.llm_timeout, max_in_flight=global_config.openai_max_in_flight)
+
+_provider_factories = {
+    "ollama": _create_ollama_provider,
+    "openai": _create_openai_provider,
+}
+_providers = {}
+_providers_lock = threading.Lock()
+
+def register_llm_provider(name: str, factory):
+    """
+    Registers a LLM provider. The provider is created by the factory on first use.
+
+    Args:
+        name (str): The name of the provider (the value of LLM_PROVIDER selecting it).
+        factory (callable): Function without parameters returning the LLMProvider.
+
+    Returns:
+        None
+    """
+    with _providers_lock:
+        _provider_factories[name] = factory
+        _providers.pop(name, None)
+
+def get_llm_provider(name: str = None) -> LLMProvider:
+    """
+    Returns the long-lived LLM provider, creating it on first use.
+
+    Args:
+        name (str, optional): The name of the provider. Defaults to LLM_PROVIDER.
+
+    Returns:
+        LLMProvider: The provider.
+
+    Raises:
+        ValueError: If the provider is not registered.
+    """
+    name = name or global_config.llm_provider
+    with _providers_lock:
+        if name not in _providers:
+            if name not in _provider_factories:
+                raise ValueError(f"{name} isn't a valid LLM provider. Please use one of: {', '.join(_provider_factories)}.")
+            _providers[name] = _provider_factories[name]()
+        return _providers[name]
@@ -0,0 +1,100 @@
+"""Scheduler of the LLM calls shared by all the DeepSearch sessions of the process (one per LLM provider)."""
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "background": PRIORITY_BACKGROUND}
+
+# (session id, priority) of the session making the LLM calls. The context is copied to the worker threads.
+current_llm_session: ContextVar = ContextVar("current_llm_session", default=("default", PRIORITY_INTERACTIVE))
+
+class LLMScheduler:
+    """
+    Bounds the number of LLM requests in flight and decides which waiting request is sent next.
+
+    Interactive sessions always go before background ones. Inside a priority level, the sessions are served
+    in round robin (fair queuing), so a session with many pending calls can't starve the others.
+    """
+
+    def __init__(self, max_in_flight: int = 2):
+        """
+        Args:
+            max_in_flight (int): Maximum number of requests sent to the LLM server at the same time.
+        """
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.granted = 0
+        self.total_wait_time = 0.0
+        # One round robin of sessions per priority level: session id -> waiting events (in arrival order)
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES.values()}
+        self._lock = threading.Lock()
+
+    def _dispatch(self):
+        """Wakes up the next waiting requests while there are free slots. Must be called with the lock held."""
+        while self.in_flight < self.max_in_flight:
+            for priority in sorted(self._queues):
+                sessions = self._queues[priority]
+                if sessions:
+                    session_id, waiters = next(iter(sessions.items()))
+                    event = waiters.popleft()
+                    # Move the session at the end of the round robin (or remove it if it has no more waiting requests).
+                    del sessions[session_id]
+                    if waiters:
+                        sessions[session_id] = waiters
+                    self.in_flight += 1
+                    event.set()
+                    break
+            else:
+                return
+
+    @contextmanager
+    def slot(self, session_id: str = None, priority: int = None):
+        """
+        Waits for a free slot to send a request to the LLM, and releases it at the end of the block.
+
+        Args:
+            session_id (str, optional): The session making the request. Defaults to the current session.
+            priority (int, optional): PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND. Defaults to the current session priority.
+
+        Yields:
+            None
+        """
+        current_session_id, current_priority = current_llm_session.get()
+        session_id = current_session_id if session_id is None else session_id
+        priority = current_priority if priority is None else priority
+
+        event = threading.Event()
+        start_time = time.monotonic()
+        with self._lock:
+            self._queues[priority].setdefault(session_id, deque()).append(event)
+            self._dispatch()
+        event.wait()
+        with self._lock:
+            self.granted += 1
+            self.total_wait_time += time.monotonic() - start_time
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._dispatch()
+
+    def stats(self) -> dict:
+        """
+        Returns the state of the scheduler.
+
+        Returns:
+            dict: The number of requests in flight, waiting (by priority), granted and their average wait time (in seconds).
+        """
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "queued": {name: sum(len(waiters) for waiters in self._queues[priority].values()) for name, priority in PRIORITIES.items()},
+                "granted": self.granted,
+                "average_wait_time": self.total_wait_time / self.granted if self.granted else 0.0,
+            }
@@ -3,20 +3,34 @@ import sys
 
 from deep_research_search.config import global_config
 
+class ConfiguredLogger(logging.Logger):
+    """Logger whose level is read from LOG_LEVEL on first use, so that importing it doesn't load the configuration."""
+
+    _level_configured = False
+
+    def getEffectiveLevel(self) -> int:
+        if not self._level_configured:
+            self.setLevel(getattr(logging, global_config.log_level.upper(), logging.INFO))
+        return super().getEffectiveLevel()
+
+    def setLevel(self, level):
+        self._level_configured = True
+        super().setLevel(level)
+
 # Logger configuration
+previous_logger_class = logging.getLoggerClass()
+logging.setLoggerClass(ConfiguredLogger)
 logger = logging.getLogger("app_logger")
-logger.setLevel(getattr(logging, global_config.log_level.upper(), logging.INFO))
+logging.setLoggerClass(previous_logger_class)
 
 # Logs format
 log_format = logging.Formatter(
     "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
-# Handler in the console (print the logs in the console)
+# Handler in the console (print the logs in the console), the level of the logger filters the records
 console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(getattr(logging, global_config.log_level.upper(), logging.INFO))
 console_handler.setFormatter(log_format)
 
 # Add the handler to the logger
 logger.addHandler(console_handler)
-
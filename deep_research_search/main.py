@@ -1,7 +1,8 @@
 """Main module for the DeepSearch engine CLI interface."""
+import argparse
 import time
 
-from deep_research_search.deepsearch import deep_search 
+from deep_research_search.deepsearch import deep_search, resume_deep_search
 from deep_research_search.logger import logger
 
 def main():
@@ -17,9 +18,17 @@ def main():
     Role:
         This function serves as the entry point for the CLI. It retrieves the user's query,
         calls the DeepSearch algorithm (in the deepsearch module), and outputs the final answer.
+        With --resume, the interrupted session of a checkpoint file is finished first.
     """
+    parser = argparse.ArgumentParser(description="DeepSearch engine CLI.")
+    parser.add_argument("--resume", help="Checkpoint file of an interrupted session to resume (see CHECKPOINT_DIR).")
+    args = parser.parse_args()
+
     logger.info("----- START OF THE SEARCH ENGINE -----\n")
 
+    if args.resume:
+        resume_deep_search(args.resume)
+
     user_query = None
 
     while user_query != "STOP":
@@ -0,0 +1,107 @@
+"""Information gain of the search rounds, used to order the gap questions and to stop searching once the knowledge saturates."""
+from deep_research_search.knowledge import KnowledgeStore
+from deep_research_search.retrieval import STOPWORDS, tokenize
+
+def content_terms(text: str) -> set:
+    """Returns the distinct terms of a text telling what it is about (stopwords and single characters removed)."""
+    return {term for term in tokenize(text) if len(term) > 1 and term not in STOPWORDS}
+
+class NoveltyTracker:
+    """
+    Measures how much new information each round of gap questions brings to the knowledge of a session.
+
+    The novelty of a round is the fraction of the distinct terms of the items it added to the knowledge that were
+    unknown before (the results rejected as duplicates or near-duplicates add nothing). A term is known if it is in
+    the BM25 index of the knowledge store (which includes the items reused from the knowledge index and the ones
+    restored from a checkpoint) or if the tracker observed it before, so the terms of the evicted items stay known.
+    """
+
+    def __init__(self, knowledge: KnowledgeStore, threshold: float = 0.0):
+        """
+        Args:
+            knowledge (KnowledgeStore): The knowledge of the session.
+            threshold (float): Minimum novelty (0 to 1) of a round, and minimum expected gain of a gap question,
+                               for the search to go on. 0 disables the early stopping.
+        """
+        self.knowledge = knowledge
+        self.threshold = threshold
+        self.rounds = [] # Novelty of each measured round
+        self.observed_terms = set() # Terms of every item observed, including the ones evicted since
+        self._new_terms = 0
+        self._terms = set()
+        self._results = 0
+
+    def expected_gain(self, question: str) -> float:
+        """
+        Estimates the information a gap question may bring from the share of its terms absent from the knowledge.
+
+        Args:
+            question (str): The gap question.
+
+        Returns:
+            float: The fraction (0 to 1) of the terms of the question that are unknown (1 for a question without terms).
+        """
+        terms = content_terms(question)
+        if not terms:
+            return 1.0
+        return sum(not self._is_known(term) for term in terms) / len(terms)
+
+    def _is_known(self, term: str, added: set = frozenset()) -> bool:
+        """Tells whether a term was observed before or is in a stored item other than the `added` ones."""
+        return term in self.observed_terms or any(item not in added for item in self.knowledge.index.postings.get(term, ()))
+
+    def prioritize(self, questions: list) -> tuple:
+        """
+        Orders the gap questions from the highest to the lowest expected gain and drops the low-yield ones.
+
+        Args:
+            questions (list): The gap questions, in their original order (kept between equal gains).
+
+        Returns:
+            tuple: The kept questions (ordered) and the dropped ones (expected gain below the threshold).
+        """
+        gains = {question: self.expected_gain(question) for question in questions}
+        ordered_questions = sorted(questions, key=lambda question: -gains[question])
+        kept = [question for question in ordered_questions if gains[question] >= self.threshold]
+        dropped = [question for question in ordered_questions if gains[question] < self.threshold]
+        return kept, dropped
+
+    def observe(self, results: int, added_items: list) -> int:
+        """
+        Adds the read step of a gap question to the current round.
+
+        Args:
+            results (int): The number of search results read.
+            added_items (list): The KnowledgeItem added to the knowledge by the read step (already indexed).
+
+        Returns:
+            int: The number of terms brought by the read step (only found in the added items).
+        """
+        added = set(added_items)
+        terms = set()
+        for item in added_items:
+            terms |= content_terms(item.text)
+        new_terms = sum(not self._is_known(term, added) for term in terms)
+        self.observed_terms |= terms
+        self._results += results
+        self._new_terms += new_terms
+        self._terms |= terms
+        return new_terms
+
+    def end_round(self) -> float:
+        """
+        Ends the current round and measures its novelty.
+
+        Returns:
+            float: The novelty (0 to 1) of the round, or None if no search result was read (nothing to measure).
+        """
+        novelty = None
+        if self._results:
+            novelty = min(1.0, self._new_terms / len(self._terms)) if self._terms else 0.0
+            self.rounds.append(novelty)
+        self._new_terms, self._terms, self._results = 0, set(), 0
+        return novelty
+
+    def saturated(self) -> bool:
+        """Returns True if the last measured round brought less new information than the threshold."""
+        return self.threshold > 0 and bool(self.rounds) and self.rounds[-1] < self.threshold
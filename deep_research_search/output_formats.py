@@ -8,4 +8,11 @@ class GapQuestionsGenerationOutputFormat(BaseModel):
     gap_questions: List[str]
 
 class RewriteQueryGenerationOutputFormat(BaseModel):
-    query: str
\ No newline at end of file
+    query: str
+
+class ReasoningWithQueryOutputFormat(BaseModel):
+    action: str
+    query: str
+
+class BatchRewriteQueryGenerationOutputFormat(BaseModel):
+    queries: List[str]
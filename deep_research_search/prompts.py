@@ -66,4 +66,39 @@ Rewrite the following question into a concise web query optimized for a web sear
 Remove the stop words and the words that don't bring any information.
 The query should avoid unnecessary verbosity while ensuring it directly addresses the question for the most relevant search results. 
 The original question is: {question}
-"""
\ No newline at end of file
+"""
+
+REASONING_WITH_QUERY_PROMPT = """        
+You are an advanced AI research agent specialized in multistep reasoning.
+Your goal is to find out what is the best action to do next (continue_search to gather more informations to later answer to the user query 
+or generate_answer to answer now to the user query if you think that you've gathered enough knowledge).
+                   
+The final goal of your work is to provide an answer to the following user query  : {question_to_answer}.
+The question you are currently investigating is: {current_question}
+                   
+<knowledge>
+{knowledge_content}        
+</knowledge>
+
+<actions_taken>
+{diary_content}                
+</actions_taken>
+                   
+Instruction: Evaluate the above sections carefully and then choose the nex action to do. 
+If the <knowledge> section contains little or no relevant information, you MUST choose the action 'continue_search'.
+Only choose 'generate_answer' if there is sufficient and comprehensive knowledge present to provide a complete and precise answer to the user. 
+If you choose 'continue_search', also rewrite the question you are currently investigating into a concise web query optimized for a web search API,
+using clear, precise keywords and removing the stop words and the words that don't bring any information.
+Respond in valid JSON format that contains the "action" and "query" keys. The value of "action" can either be "continue_search" or "generate_answer" 
+dependings on the action you chose to do. The value of "query" is the web query (an empty string if you chose 'generate_answer').
+"""
+
+BATCH_REWRITE_QUERY_PROMPT = """
+Rewrite each of the following questions into a concise web query optimized for a web search API, using clear, precise keywords. 
+Remove the stop words and the words that don't bring any information.
+Each query should avoid unnecessary verbosity while ensuring it directly addresses its question for the most relevant search results. 
+The original questions are:
+{questions}
+
+Respond with a JSON that include a "queries" key. The value of this key need to be a list of strings with exactly one query per question, in the same order as the questions.
+"""
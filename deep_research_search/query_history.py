@@ -0,0 +1,152 @@
+"""History of the web searches of a session, with a local similarity index to detect rephrased queries."""
+from collections import Counter
+import math
+import threading
+
+from deep_research_search.knowledge import normalize_text
+
+NGRAM_SIZE = 3
+
+def char_ngrams(text: str, size: int = NGRAM_SIZE) -> Counter:
+    """
+    Counts the character n-grams of a normalized text (with word boundaries marked by spaces).
+
+    Args:
+        text (str): The text.
+        size (int): The number of characters of the n-grams.
+
+    Returns:
+        Counter: The number of occurrences of each n-gram.
+    """
+    text = f" {normalize_text(text)} "
+    return Counter(text[i:i + size] for i in range(max(1, len(text) - size + 1)))
+
+class SearchRecord:
+    """A searched query with its rewritten form and its results."""
+    __slots__ = ("query", "rewritten_query", "results")
+
+    def __init__(self, query: str, rewritten_query: str = None, results: list = None):
+        self.query = query
+        self.rewritten_query = rewritten_query
+        self.results = results
+
+class QueryHistory:
+    """
+    Queries already searched during a session.
+
+    Exact duplicates are found with a dictionary. Rephrased queries are found by comparing the character
+    trigram TF-IDF vectors of the original and rewritten forms of the searched queries (cosine similarity),
+    the candidates being the forms sharing at least one trigram with the query.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.8):
+        """
+        Creates an empty history.
+
+        Args:
+            similarity_threshold (float): Minimum cosine similarity for two queries to be considered the same search.
+                                          Above 1, only the exact duplicates are detected.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.records = {} # original query -> SearchRecord
+        self._forms = [] # (n-gram counts, record) of every original and rewritten form
+        self._postings = {} # n-gram -> indexes of the forms containing it
+        self._lock = threading.Lock()
+
+    def __contains__(self, query: str) -> bool:
+        return query in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(list(self.records))
+
+    def get(self, query: str) -> SearchRecord:
+        """Returns the record of a searched query (None if it wasn't searched)."""
+        return self.records.get(query)
+
+    def append(self, query: str):
+        """Records a searched query without its results."""
+        self.record(query)
+
+    def record(self, query: str, rewritten_query: str = None, results: list = None):
+        """
+        Records a searched query.
+
+        Args:
+            query (str): The original query.
+            rewritten_query (str, optional): The query sent to the search engine, if it was rewritten.
+            results (list, optional): The results of the search, reused for the similar queries.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if query in self.records:
+                return
+            record = SearchRecord(query, rewritten_query, results)
+            self.records[query] = record
+            for form in {query, rewritten_query} - {None, ""}:
+                ngrams = char_ngrams(form)
+                for ngram in ngrams:
+                    self._postings.setdefault(ngram, []).append(len(self._forms))
+                self._forms.append((ngrams, record))
+
+    def _vector(self, ngrams: Counter) -> dict:
+        """Returns the normalized TF-IDF vector of n-gram counts. Must be called with the lock held."""
+        forms_count = len(self._forms)
+        vector = {ngram: count * (math.log((forms_count + 1) / (len(self._postings.get(ngram, ())) + 1)) + 1)
+                  for ngram, count in ngrams.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {ngram: weight / norm for ngram, weight in vector.items()}
+
+    def find_similar(self, query: str) -> SearchRecord:
+        """
+        Finds a searched query similar to the given one.
+
+        Args:
+            query (str): The query (original or rewritten form).
+
+        Returns:
+            SearchRecord: The record of the most similar searched query above the threshold, or None.
+        """
+        with self._lock:
+            query_vector = self._vector(char_ngrams(query))
+            candidates = {index for ngram in query_vector for index in self._postings.get(ngram, ())}
+            best_similarity, best_record = 0.0, None
+            for index in sorted(candidates):
+                ngrams, record = self._forms[index]
+                form_vector = self._vector(ngrams)
+                similarity = sum(weight * form_vector.get(ngram, 0.0) for ngram, weight in query_vector.items())
+                if similarity > best_similarity:
+                    best_similarity, best_record = similarity, record
+        return best_record if best_similarity >= self.similarity_threshold else None
+
+    def copy(self) -> "QueryHistory":
+        """Returns an independent copy of the history."""
+        history = QueryHistory(self.similarity_threshold)
+        for record in list(self.records.values()):
+            history.record(record.query, record.rewritten_query, record.results)
+        return history
+
+    def to_list(self) -> list:
+        """Returns the records as JSON-serializable data."""
+        return [[record.query, record.rewritten_query, record.results] for record in list(self.records.values())]
+
+    @classmethod
+    def from_list(cls, records: list, similarity_threshold: float = 0.8) -> "QueryHistory":
+        """
+        Rebuilds a history from the data returned by to_list.
+
+        Args:
+            records (list): The serialized records.
+            similarity_threshold (float): Minimum cosine similarity for two queries to be considered the same search.
+
+        Returns:
+            QueryHistory: The history.
+        """
+        history = cls(similarity_threshold)
+        for query, rewritten_query, results in records:
+            history.record(query, rewritten_query, [tuple(result) for result in results] if results is not None else None)
+        return history
@@ -2,26 +2,27 @@
 import re
 import json
 
-def add_knowledge_item(memory, text, source):
+from deep_research_search.chunking import select_passages
+from deep_research_search.knowledge import KnowledgeStore
+from deep_research_search.config import global_config
+
+def add_knowledge_item(memory, text, source, start=None, end=None):
     """
     Adds a new piece of knowledge to the memory if it is not already present.
 
     Args:
-        memory (dict): The in-memory knowledge base, with key "knowledge".
+        memory (dict): The in-memory knowledge base, with key "knowledge" (a KnowledgeStore).
         text (str): The knowledge content (e.g., a snippet or excerpt) to add.
         source (str): The source identifier (e.g., URL) of the knowledge.
+        start (int, optional): The offset of a passage in the content of the source.
+        end (int, optional): The offset of the end of a passage in the content of the source.
 
     Returns:
-        bool: True if the knowledge item was added, False if it was a duplicate.
+        bool: True if the knowledge item was added, False if it was a duplicate or a near-duplicate, or if it was evicted right away.
     """
-    # Check for duplicates based on text equality.
-    for item in memory.get("knowledge", []):
-        if item["text"].strip() == text.strip():
-            return False
-    memory.setdefault("knowledge", []).append({"source": source, "text": text})
-    return True
-
-def process_results(results, memory):
+    return memory.setdefault("knowledge", KnowledgeStore()).add(text, source, start, end)
+
+def process_results(results, memory, pages=None):
     """
     Processes the search results and updates the in-memory knowledge base.
 
@@ -29,6 +30,7 @@ def process_results(results, memory):
         results (list): A list of search result entries. Each entry is expected to be a tuple 
                         (title, url, snippet) containing the title, URL, and a brief snippet.
         memory (dict): The current in-memory knowledge state.
+        pages (dict, optional): The text of the fetched pages of the results, keyed by URL.
 
     Returns:
         dict: The updated memory after incorporating new knowledge from the search results.
@@ -36,7 +38,10 @@ def process_results(results, memory):
     Role:
         This function extracts relevant snippets from search results, filters out entries 
         that are too short or redundant, and adds them to the memory as new knowledge items.
-        It avoids adding results from URLs that have already been visited.
+        When the page of a result has been fetched, its text is used instead of the snippet
+        and its URL is recorded as visited. It avoids adding results from URLs that have already been visited.
+        Long contents (page texts, full texts returned as snippets by ExaSearch) are split into passages,
+        and only the ones the most relevant to the initial query are added, with their offsets in the content.
     """
     added_results_to_memory = 0
 
@@ -45,6 +50,10 @@ def process_results(results, memory):
         if not isinstance(result, (list, tuple)) or len(result) < 3:
             continue
         title, url, snippet = result[0], result[1], result[2]
+        # Prefer the text of the fetched page over the snippet.
+        page_text = (pages or {}).get(url)
+        if page_text:
+            snippet = page_text
         # Skip if snippet is missing or too short.
         if not snippet or len(snippet) < 30:
             continue
@@ -53,6 +62,11 @@ def process_results(results, memory):
             continue
         # Add the snippet to memory as a knowledge item only if the url hasn't been visited yet and if we didn't add more than 3 items during this iteration
         if added_results_to_memory < 3 and url not in memory["visited_urls"]: 
-            add_knowledge_item(memory, snippet, source=url)
+            for start, end, passage in select_passages(snippet, memory.get("initial_query", ""), global_config.passage_max_chars,
+                                                      global_config.passages_per_result):
+                if len(passage) >= 30:
+                    add_knowledge_item(memory, passage, source=url, start=start, end=end)
             added_results_to_memory += 1
+            if page_text:
+                memory.setdefault("visited_urls", set()).add(url)
     return memory
@@ -1,73 +1,134 @@
 """Decision-making module for the next action in DeepSearch."""
 import json
-from typing import Dict
+from typing import Dict, Tuple
 import requests
 
 from deep_research_search.utils import query_ollama
-from deep_research_search.output_formats import ReasoningOutputFormat
-from deep_research_search.prompts import REASONING_PROMPT
+from deep_research_search.logger import logger
+from deep_research_search.token_usage import TokenBudgetExceeded, current_token_usage, estimate_tokens
+from deep_research_search.config import global_config
+from deep_research_search.output_formats import ReasoningOutputFormat, ReasoningWithQueryOutputFormat
+from deep_research_search.prompts import REASONING_PROMPT, REASONING_WITH_QUERY_PROMPT
 
-def get_prompt(memory: Dict) -> str:
+def get_prompt(memory: Dict, question: str = None, with_query: bool = False) -> str:
     """
     Constructs a prompt for the decision-making LLM to choose the next action.
 
     Args:
         memory (dict): A dictionary representing the current state of memory. It should include:
-                       - "knowledge": a list of knowledge items (each with a "text" field),
-                       - "diaryContext": a list of previous action entries.
+                       - "knowledge": a KnowledgeStore of knowledge items (each with a "text" attribute),
+                       - "diaryContext": a Diary of the previous actions (only the recent ones are verbatim).
+        question (str, optional): The gap question being investigated, used with the initial query to
+                                  select the most relevant knowledge.
+        with_query (bool, optional): If True, the prompt also asks for the web query of the question (fused mode).
 
     Returns:
         str: The constructed prompt instructing the LLM to decide the next action.
              It emphasizes that if the <knowledge> section contains little or no relevant content,
              the correct action is to "continue_search" rather than "generate_answer".
+             Only the most relevant knowledge that fits in REASONING_CONTEXT_MAX_TOKENS (and in the
+             remaining token budget of the session) is included.
     """
     
-    # Knowledge section.
-    knowledge = memory.get("knowledge", [])
-    if knowledge:
-        knowledge_texts = [item.get("text", "").strip() for item in knowledge if item.get("text", "").strip()]
-        knowledge_content = "\n".join(knowledge_texts) if knowledge_texts else "No relevant knowledge gathered so far."
-    else:
-        knowledge_content = "No relevant knowledge gathered so far."
-    
     # Diary context section.
-    diary = memory.get("diaryContext", [])
+    diary = memory.get("diaryContext")
     if diary:
-        diary_content = "\n".join(diary)
+        diary_content = diary.render()
     else: 
         diary_content = "No actions taken so far."
+
+    # Knowledge section.
+    knowledge = memory.get("knowledge")
+    max_knowledge_tokens = global_config.reasoning_context_max_tokens
+    token_usage = current_token_usage.get()
+    if token_usage is not None and token_usage.remaining() is not None:
+        # Keep only the knowledge that fits in the budget left by the rest of the prompt.
+        other_tokens = estimate_tokens(REASONING_PROMPT) + estimate_tokens(memory['initial_query']) + estimate_tokens(diary_content)
+        max_knowledge_tokens = min(max_knowledge_tokens, token_usage.remaining() - other_tokens)
+    relevance_query = memory['initial_query'] if question is None else f"{memory['initial_query']} {question}"
+    knowledge_texts = [item.text.strip() for item in knowledge.select(relevance_query, max_knowledge_tokens) if item.text.strip()] if knowledge else []
+    knowledge_content = "\n".join(knowledge_texts) if knowledge_texts else "No relevant knowledge gathered so far."
     
-    prompt = REASONING_PROMPT.format(question_to_answer=memory['initial_query'], knowledge_content=knowledge_content, diary_content=diary_content)
+    if with_query:
+        prompt = REASONING_WITH_QUERY_PROMPT.format(question_to_answer=memory['initial_query'], current_question=question or memory['initial_query'],
+                                                    knowledge_content=knowledge_content, diary_content=diary_content)
+    else:
+        prompt = REASONING_PROMPT.format(question_to_answer=memory['initial_query'], knowledge_content=knowledge_content, diary_content=diary_content)
     
     return prompt
 
 
-def decide_next_action(memory: Dict) -> str:
+def decide_next_action(memory: Dict, retry: bool = False, question: str = None) -> str:
     """
     Decides what the DeepSearch algorithm should do next based on current knowledge.
 
     Args:
         memory (dict): The current memory containing all information gathered so far.
+        retry (bool, optional): If True, the previous decision was not valid so the LLM cache is bypassed.
+        question (str, optional): The gap question being investigated.
 
     Returns:
         str: A string describing the next action. The string can be either "generate_answer" or "continue_search"
 
+    Raises:
+        TokenBudgetExceeded: If the reasoning prompt doesn't fit in the remaining token budget.
+
     Role:
         This function uses the current state of knowledge to determine the next step in the search process.
         It creates a prompt using the memory, sends it to the local OLlama LLM, and parses the result to
         decide on the next action.
     """
-    prompt = get_prompt(memory)
+    prompt = get_prompt(memory, question=question)
 
     try:
-        response = query_ollama(prompt=prompt, output_format=ReasoningOutputFormat)
+        response = query_ollama(prompt=prompt, output_format=ReasoningOutputFormat, refresh_cache=retry, stage="reason")
         # The response is expected to be a JSON array of strings.
         if isinstance(response, str):
             decision = json.loads(response).get("action", "continue_search")
         else:
             decision = "continue_search"
+    except TokenBudgetExceeded:
+        raise
     except Exception as e:
-        print(f"Error querying decision to do: {e}")
+        logger.error(f"Error querying decision to do: {e}\n")
         decision = "continue_search"
     
-    return decision
\ No newline at end of file
+    return decision
+
+
+def decide_next_action_and_query(memory: Dict, question: str, retry: bool = False) -> Tuple[str, str]:
+    """
+    Decides the next action and rewrites the gap question into a web query with a single LLM call.
+
+    Args:
+        memory (dict): The current memory containing all information gathered so far.
+        question (str): The gap question being investigated.
+        retry (bool, optional): If True, the previous decision was not valid so the LLM cache is bypassed.
+
+    Returns:
+        tuple: The next action ("generate_answer" or "continue_search") and the web query to use if the action
+               is "continue_search" (an empty string if the LLM didn't give a query).
+
+    Raises:
+        TokenBudgetExceeded: If the reasoning prompt doesn't fit in the remaining token budget.
+
+    Role:
+        Fused mode of decide_next_action: the reasoning and the query rewrite of the search step are done in
+        the same structured call, which saves one LLM round trip per gap question.
+    """
+    prompt = get_prompt(memory, question=question, with_query=True)
+
+    try:
+        response = query_ollama(prompt=prompt, output_format=ReasoningWithQueryOutputFormat, refresh_cache=retry, stage="reason")
+        if isinstance(response, str):
+            decision = json.loads(response)
+            action, query = decision.get("action", "continue_search"), decision.get("query", "")
+        else:
+            action, query = "continue_search", ""
+    except TokenBudgetExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error querying decision to do: {e}\n")
+        action, query = "continue_search", ""
+
+    return action, query if isinstance(query, str) else ""
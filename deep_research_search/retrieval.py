@@ -0,0 +1,135 @@
+"""Local lexical retrieval (BM25) over the knowledge items."""
+from collections import Counter
+import math
+import re
+
+WORD_PATTERN = re.compile(r"\w+")
+# Words of the questions that don't tell what they are about
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does", "for", "from", "has", "have", "how", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "their", "there", "this", "to", "was", "were", "what", "when",
+    "where", "which", "who", "whom", "whose", "why", "will", "with",
+))
+
+def tokenize(text: str) -> list:
+    """
+    Splits a text into lowercase word terms.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        list: The terms of the text.
+    """
+    return WORD_PATTERN.findall(text.lower())
+
+def query_relevance(query: str, text: str, k1: float = 1.5, b: float = 0.75, reference_length: int = 100) -> float:
+    """
+    Scores the relevance of a text to a query without any other text: the term frequency saturation and the length
+    normalization of BM25 (against a fixed reference length), without the inverse document frequency. Unlike the
+    BM25 scores, which change with the indexed documents, the scores of texts scored at different times can be compared.
+
+    Args:
+        query (str): The query text. Its stopwords are ignored.
+        text (str): The text to score.
+        k1 (float): Term frequency saturation parameter.
+        b (float): Document length normalization parameter.
+        reference_length (int): The number of terms of a text whose length isn't penalized nor favored.
+
+    Returns:
+        float: The score of the text (0 if it shares no term with the query).
+    """
+    terms = tokenize(text)
+    frequencies = Counter(terms)
+    length_norm = 1 - b + b * len(terms) / reference_length
+    score = 0.0
+    for term in dict.fromkeys(tokenize(query)): # In query order, so the float sums are the same in every process
+        frequency = frequencies.get(term)
+        if frequency and term not in STOPWORDS:
+            score += frequency * (k1 + 1) / (frequency + k1 * length_norm)
+    return score
+
+class BM25Index:
+    """
+    BM25 index updated incrementally: documents can be added at any time and are immediately searchable.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Creates an empty index.
+
+        Args:
+            k1 (float): Term frequency saturation parameter.
+            b (float): Document length normalization parameter.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings = {}      # term -> {document id: term frequency}
+        self.doc_lengths = {}   # document id -> number of terms
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text: str):
+        """
+        Indexes a document.
+
+        Args:
+            doc_id: The hashable identifier of the document.
+            text (str): The text of the document.
+
+        Returns:
+            None
+        """
+        terms = tokenize(text)
+        for term, frequency in Counter(terms).items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, doc_id, text: str):
+        """
+        Removes an indexed document.
+
+        Args:
+            doc_id: The identifier of the document.
+            text (str): The text the document was indexed with (its terms are not stored).
+
+        Returns:
+            None
+        """
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def scores(self, query: str) -> dict:
+        """
+        Computes the BM25 score of the documents sharing at least one term with the query.
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            dict: The score of each matching document id.
+        """
+        documents_count = len(self.doc_lengths)
+        if documents_count == 0:
+            return {}
+        average_length = self.total_length / documents_count
+
+        scores = {}
+        # Distinct terms in query order: summing in a set order would change the ties (float rounding) between processes.
+        for term in dict.fromkeys(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (documents_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return scores
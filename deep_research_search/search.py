@@ -1,94 +1,385 @@
 """Web search management module for DeepSearch."""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextvars
 import json
-
-from duckduckgo_search import DDGS
-from exa_py import Exa
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
 from deep_research_search.logger import logger
 from deep_research_search.utils import query_ollama
-from deep_research_search.output_formats import RewriteQueryGenerationOutputFormat
-from deep_research_search.prompts import REWRITE_QUERY_PROMPT
+from deep_research_search.output_formats import RewriteQueryGenerationOutputFormat, BatchRewriteQueryGenerationOutputFormat
+from deep_research_search.prompts import REWRITE_QUERY_PROMPT, BATCH_REWRITE_QUERY_PROMPT
 from deep_research_search.config import global_config
+from deep_research_search.search_cache import get_search_cache
+from deep_research_search.search_backends import get_search_backend
+from deep_research_search.tracing import tracer
+
+SEARCH_ENGINES = ["ddg", "exa"]
+TRACKING_PARAMETERS_PREFIXES = ("utm_", "fbclid", "gclid", "mc_", "ref_src")
+
+# Threads used to query several engines at the same time, created by the first multi-engine search
+_fanout_executor = None
+_fanout_executor_lock = threading.Lock()
+
+def get_fanout_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool querying several engines at the same time, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor: The thread pool.
+    """
+    global _fanout_executor
+    with _fanout_executor_lock:
+        if _fanout_executor is None:
+            _fanout_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search_fanout")
+        return _fanout_executor
 
-def ddgs_search_web(query, search_history, num_results):
+def close_fanout_executor():
+    """
+    Stops the threads of the multi-engine searches once their searches are done (a later search creates new ones).
+
+    Returns:
+        None
+    """
+    global _fanout_executor
+    with _fanout_executor_lock:
+        executor, _fanout_executor = _fanout_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def rewrite_query(query):
+    """
+    Rewrites a question into a concise web query with the LLM.
+
+    Args:
+        query (str): The question to rewrite.
+
+    Returns:
+        str: The rewritten query.
+    """
+    prompt = REWRITE_QUERY_PROMPT.format(question=query)
+    with tracer.span("rewrite", questions=1):
+        rewritten_query = json.loads(query_ollama(prompt=prompt, output_format=RewriteQueryGenerationOutputFormat, stage="rewrite")).get("query", "")
+        if not isinstance(rewritten_query, str) or len(rewritten_query) < 5:
+            rewritten_query = json.loads(query_ollama(prompt=prompt, output_format=RewriteQueryGenerationOutputFormat, refresh_cache=True, stage="rewrite")).get("query", "")
+        else:
+             pass
+    logger.debug(f"Here is te rewritten query used for web search: {rewritten_query}\n")
+    return rewritten_query
+
+def rewrite_queries(questions):
+    """
+    Rewrites several questions into concise web queries with a single LLM call.
+
+    Args:
+        questions (list): The questions to rewrite.
+
+    Returns:
+        dict: The rewritten query of each question. The questions whose rewrite is missing or too short are left
+              out, they are rewritten one by one by the search step.
+    """
+    if not questions:
+        return {}
+    prompt = BATCH_REWRITE_QUERY_PROMPT.format(questions="\n".join(f"{i + 1}. {question}" for i, question in enumerate(questions)))
+    with tracer.span("rewrite", questions=len(questions)):
+        queries = json.loads(query_ollama(prompt=prompt, output_format=BatchRewriteQueryGenerationOutputFormat, stage="rewrite")).get("queries", [])
+    if len(queries) != len(questions):
+        logger.debug(f"The batch rewrite returned {len(queries)} queries for {len(questions)} questions, it is ignored.\n")
+        return {}
+    rewritten_queries = {question: query for question, query in zip(questions, queries) if isinstance(query, str) and len(query) >= 5}
+    logger.debug(f"Here are the rewritten queries used for web search: {rewritten_queries}\n")
+    return rewritten_queries
+
+def engine_search(engine, engine_query, num_results):
+    """
+    Searches the web with one engine, reusing the cached results of a previous identical search if they are still fresh.
+
+    Args:
+        engine (str): The web search engine ("ddg" or "exa").
+        engine_query (str): The query sent to the engine.
+        num_results (int): The number of results of the web search.
+
+    Returns:
+        list: A list of search result entries. Each entry is a tuple (title, url, snippet).
+
+    Raises:
+        Exception: The error of the engine if the search failed after the retries.
+    """
+    search_cache = get_search_cache()
+    with tracer.span("engine_search", engine=engine) as span:
+        results = search_cache.get(engine, engine_query, num_results) if search_cache else None
+        if results is not None:
+            span.add(search_cache_hits=1, results=len(results))
+            return results
+
+        # The backend is rate limited and retries on rate limit and transient errors
+        results = get_search_backend(engine).search(engine_query, num_results)
+        if search_cache:
+            search_cache.set(engine, engine_query, num_results, results)
+        span.add(results=len(results))
+        return results
+
+def find_previous_results(query, search_history):
+    """
+    Looks for the results of a previous search of a query similar to the given one (e.g. a rephrased gap question).
+
+    Args:
+        query (str): The query (original or rewritten form).
+        search_history (QueryHistory): The queries already searched.
+
+    Returns:
+        list: A copy of the results of the similar query, or None if there is none.
+    """
+    record = search_history.find_similar(query)
+    if record is None or record.results is None:
+        return None
+    logger.debug(f"Query '{query}' is similar to the already searched '{record.query}'. Reusing its results.\n")
+    return list(record.results)
+
+def ddgs_search_web(query, search_history, num_results, rewritten_query=None):
     """
     Perform a web search for the given query (if not searched before) using DuckDuckGo.
     
     Args:
         query (str): The search query string.
-        search_history (list): List of queries that have been searched already (to avoid duplicates).
+        search_history (QueryHistory): The queries that have been searched already (to avoid duplicates).
         num_results (int): The number of results of the web search.
+        rewritten_query (str, optional): The web query of the question if it has already been rewritten
+                                         (fused or batch rewrite mode).
     
     Returns:
         list: A list of search result entries. Each entry is a tuple (title, url, snippet).
-              Returns an empty list if the query was already searched.
+              Returns an empty list if the query was already searched, and the results of the similar query
+              if a similar one was searched.
     """
     # Check if query has already been searched to avoid duplicate searches
     if query in search_history:
         logger.debug(f"Query '{query}' already searched. Skipping duplicate search.\n")
         return []
-    
-    # Query rewrite to maximize the effectivenes of the web search
-    prompt = REWRITE_QUERY_PROMPT.format(question=query)
-    rewritten_query = json.loads(query_ollama(prompt=prompt, output_format=RewriteQueryGenerationOutputFormat)).get("query", "")
-    if not isinstance(rewritten_query, str) or len(rewritten_query) < 5:
-        rewritten_query = json.loads(query_ollama(prompt=prompt, output_format=RewriteQueryGenerationOutputFormat)).get("query", "")
-    else:
-         pass
-    logger.debug(f"Here is te rewritten query used for web search: {rewritten_query}\n")
-    
-    results = []
-    
-    # Search with DuckDuckGo search and get up to 10 results 
-    with DDGS() as ddgs:
-        for result in ddgs.text(keywords=rewritten_query, max_results=num_results):
-                # Each result is a dictionary with keys like 'title', 'href', 'body'
-                title = result.get("title") or ""
-                url = result.get("href") or result.get("url") or ""
-                snippet = result.get("body") or result.get("snippet") or ""
-                results.append((title, url, snippet))
+
+    # A rephrasing of a searched query reuses its results, before and after the query rewrite
+    results = find_previous_results(query, search_history)
+    if results is None:
+        # Query rewrite to maximize the effectivenes of the web search
+        if not rewritten_query:
+            rewritten_query = rewrite_query(query)
+        results = find_previous_results(rewritten_query, search_history)
+
+    if results is None:
+        # Search with DuckDuckGo search
+        try:
+            results = engine_search("ddg", rewritten_query, num_results)
+        except Exception as e:
+            logger.error(f"DuckDuckGo search failed for the query '{rewritten_query}': {e}\n")
+            return []
     
     # Add the original query to search history to prevent future duplicates
-    search_history.append(query)
+    search_history.record(query, rewritten_query, results)
     return results
 
-def exa_search_web(query, search_history, num_results):
+def exa_search_web(query, search_history, num_results, rewritten_query=None):
     """
     Perform a web search for the given query (if not searched before) using Exa Search.
     
     Args:
         query (str): The search query string.
-        search_history (list): List of queries that have been searched already (to avoid duplicates).
+        search_history (QueryHistory): The queries that have been searched already (to avoid duplicates).
         num_results (int): The number of results of the web search.
+        rewritten_query (str, optional): Unused, ExaSearch is queried with the original question.
     
     Returns:
         list: A list of search result entries. Each entry is a tuple (title, url, snippet).
-              Returns an empty list if the query was already searched.
+              Returns an empty list if the query was already searched, and the results of the similar query
+              if a similar one was searched.
     """
     # Check if query has already been searched to avoid duplicate searches
     if query in search_history:
         logger.debug(f"Query '{query}' already searched. Skipping duplicate search.\n")
         return []
     
-    # Query rewrite to maximize the effectivenes of the web search
-    prompt = REWRITE_QUERY_PROMPT.format(question=query)
-    rewritten_query = json.loads(query_ollama(prompt=prompt, output_format=RewriteQueryGenerationOutputFormat)).get("query", "")
-    if not isinstance(rewritten_query, str) or len(rewritten_query) < 5:
-        rewritten_query = json.loads(query_ollama(prompt=prompt, output_format=RewriteQueryGenerationOutputFormat)).get("query", "")
-    else:
-         pass
-    logger.debug(f"Here is te rewritten query used for web search: {rewritten_query}\n")
-    
-    results = []
-
-    # Search with ExaSearch and get up to 10 results 
-    exa = Exa(api_key = global_config.exa_search_api_key.get_secret_value()) 
-    for result in exa.search_and_contents(query, num_results = num_results, text = True).results:
-        title = result.title or ""
-        url = result.url or ""
-        snippet = result.text or ""
-        results.append((title, url, snippet))
+    # ExaSearch is queried with the original question, so it doesn't need the rewritten query
+
+    # A rephrasing of a searched query reuses its results
+    results = find_previous_results(query, search_history)
+    if results is None:
+        # Search with ExaSearch
+        try:
+            results = engine_search("exa", query, num_results)
+        except Exception as e:
+            logger.error(f"ExaSearch search failed for the query '{query}': {e}\n")
+            return []
     
     # Add the original query to search history to prevent future duplicates
-    search_history.append(query)
+    search_history.record(query, results=results)
+    return results
+
+def normalize_url(url):
+    """
+    Normalizes an URL to detect the same page returned by several engines.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The URL without scheme, "www.", fragment, trailing slash and tracking parameters, with sorted query parameters.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query_parameters = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                              if not key.lower().startswith(TRACKING_PARAMETERS_PREFIXES))
+    normalized_url = host + parts.path.rstrip("/")
+    return f"{normalized_url}?{urlencode(query_parameters)}" if query_parameters else normalized_url
+
+def merge_results(results_lists, num_results=None):
+    """
+    Merges the results of several engines, removing the results pointing to the same page.
+
+    Args:
+        results_lists (list): The lists of (title, url, snippet) tuples, in order of priority.
+        num_results (int, optional): The maximum number of merged results.
+
+    Returns:
+        list: The merged list of (title, url, snippet) tuples.
+    """
+    merged_results = []
+    seen_urls = set()
+    for results in results_lists:
+        for result in results:
+            normalized_url = normalize_url(result[1])
+            if not result[1] or normalized_url in seen_urls:
+                continue
+            seen_urls.add(normalized_url)
+            merged_results.append(result)
+    return merged_results if num_results is None else merged_results[:num_results]
+
+def is_good_result(result):
+    """Returns True if the snippet of a result is long enough to be added to the knowledge (see read.process_results)."""
+    return bool(result[2]) and len(result[2]) >= 30
+
+def count_good_results(results):
+    """Counts the results with a snippet long enough to be added to the knowledge."""
+    return sum(1 for result in results if is_good_result(result))
+
+def select_results(results, num_results):
+    """
+    Keeps the best merged results.
+
+    Args:
+        results (list): The merged (title, url, snippet) tuples, in order of priority.
+        num_results (int): The maximum number of results kept.
+
+    Returns:
+        list: The good results first (see is_good_result), then the others, each group in its priority order.
+    """
+    return sorted(results, key=lambda result: not is_good_result(result))[:num_results]
+
+def multi_search_web(query, search_history, num_results, rewritten_query=None, hedged=False):
+    """
+    Perform a web search for the given query (if not searched before) with several engines at the same time.
+
+    Args:
+        query (str): The search query string.
+        search_history (QueryHistory): The queries that have been searched already (to avoid duplicates).
+        num_results (int): The number of results of the web search.
+        rewritten_query (str, optional): The web query of the question if it has already been rewritten.
+        hedged (bool, optional): If True, the primary engine (SEARCH_HEDGE_PRIMARY) is queried first and the others
+                                 only if it didn't answer after SEARCH_HEDGE_DELAY seconds. Otherwise all the engines
+                                 are queried at once.
+
+    Returns:
+        list: A list of search result entries. Each entry is a tuple (title, url, snippet).
+              Returns an empty list if the query was already searched.
+
+    Role:
+        The results are merged (same page from several engines counted once) and returned as soon as
+        `num_results` good results are available, without waiting for the slower engines. The searches still
+        running complete in the background and fill the search cache.
+    """
+    # Check if query has already been searched to avoid duplicate searches
+    if query in search_history:
+        logger.debug(f"Query '{query}' already searched. Skipping duplicate search.\n")
+        return []
+
+    # A rephrasing of a searched query reuses its results, before and after the query rewrite
+    results = find_previous_results(query, search_history)
+    if results is None:
+        # Query rewrite to maximize the effectivenes of the web search
+        if not rewritten_query:
+            rewritten_query = rewrite_query(query)
+        results = find_previous_results(rewritten_query, search_history)
+    if results is not None:
+        search_history.record(query, rewritten_query, results)
+        return results
+    engine_queries = {"ddg": rewritten_query, "exa": query} # ExaSearch is queried with the original question
+
+    primary_engine = global_config.search_hedge_primary if hedged else None
+    if hedged and primary_engine not in SEARCH_ENGINES:
+        logger.error(f"SEARCH_HEDGE_PRIMARY value is not valid: {primary_engine}. Using ddg.\n")
+        primary_engine = "ddg"
+    engines = sorted(SEARCH_ENGINES, key=lambda engine: engine != primary_engine) # Priority order used for the merge
+    futures = {}
+    fanout_executor = get_fanout_executor()
+    if hedged:
+        futures[primary_engine] = fanout_executor.submit(contextvars.copy_context().run, engine_search, primary_engine,
+                                                          engine_queries[primary_engine], num_results) # Keeps the trace of the session
+        wait([futures[primary_engine]], timeout=global_config.search_hedge_delay)
+        if futures[primary_engine].done() and futures[primary_engine].exception() is None \
+                and count_good_results(futures[primary_engine].result()) >= num_results:
+            results = select_results(merge_results([futures[primary_engine].result()]), num_results)
+            search_history.record(query, rewritten_query, results)
+            return results
+        logger.debug(f"Sending the hedged search requests for the query: {query}\n")
+    for engine in engines:
+        if engine not in futures:
+            futures[engine] = fanout_executor.submit(contextvars.copy_context().run, engine_search, engine, engine_queries[engine], num_results)
+
+    pending = set(futures.values())
+    completed_results = []
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for engine in engines:
+            if futures[engine] in done and futures[engine].exception() is not None: # Logged once, when the search ends
+                logger.error(f"{engine} search failed for the query '{engine_queries[engine]}': {futures[engine].exception()}\n")
+        # Rebuilt in the priority order of the engines, whatever the order they answered in
+        completed_results = [futures[engine].result() for engine in engines
+                             if futures[engine].done() and futures[engine].exception() is None]
+        if count_good_results(merge_results(completed_results)) >= num_results:
+            break
+
+    if not completed_results:
+        # Nothing is recorded, so a later rephrasing of the query searches again
+        logger.error(f"Every search engine failed for the query '{query}'.\n")
+        return []
+
+    # Add the original query to search history to prevent future duplicates
+    results = select_results(merge_results(completed_results), num_results)
+    search_history.record(query, rewritten_query, results)
     return results
+
+def search_web(query, search_history, num_results, rewritten_query=None):
+    """
+    Perform a web search for the given query with the engine selected in the configuration.
+
+    Args:
+        query (str): The search query string.
+        search_history (QueryHistory): The queries that have been searched already (to avoid duplicates).
+        num_results (int): The number of results of the web search.
+        rewritten_query (str, optional): The web query of the question if it has already been rewritten.
+
+    Returns:
+        list: A list of search result entries. Each entry is a tuple (title, url, snippet).
+              Returns an empty list if the query was already searched or if the engine is not valid.
+    """
+    if global_config.web_search_engine == "ddg": # Use DuckDuckGo engine for web search
+        return ddgs_search_web(query, search_history=search_history, num_results=num_results, rewritten_query=rewritten_query)
+    elif global_config.web_search_engine == "exa":
+        return exa_search_web(query, search_history=search_history, num_results=num_results, rewritten_query=rewritten_query)
+    elif global_config.web_search_engine == "all": # Query every engine at the same time
+        return multi_search_web(query, search_history=search_history, num_results=num_results, rewritten_query=rewritten_query)
+    elif global_config.web_search_engine == "hedged": # Query the other engines only if the primary one is slow
+        return multi_search_web(query, search_history=search_history, num_results=num_results, rewritten_query=rewritten_query, hedged=True)
+    else:
+        logger.error(f"WEB_SEARCH_ENGINE value is not valid: {global_config.web_search_engine}")
+        return []
@@ -0,0 +1,258 @@
+"""
+Long-lived web search backend clients with rate limiting, retries and deadlines.
+
+The engines are created by the factories of a registry, and their client libraries are only imported
+when the first backend using them is created.
+"""
+from abc import ABC, abstractmethod
+import random
+import re
+import threading
+import time
+
+import requests
+
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+class SearchDeadlineExceeded(TimeoutError):
+    """Raised when a web search couldn't be completed before its deadline."""
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: allows `rate` calls per second on average, with bursts of up to `capacity` calls.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Creates a full bucket.
+
+        Args:
+            rate (float): Number of tokens added to the bucket per second.
+            capacity (int): Maximum number of tokens of the bucket.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float = None):
+        """
+        Takes a token from the bucket, waiting for one if the bucket is empty.
+
+        Args:
+            deadline (float, optional): time.monotonic() value after which to stop waiting.
+
+        Returns:
+            None
+
+        Raises:
+            SearchDeadlineExceeded: If no token is available before the deadline.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait_time > deadline:
+                raise SearchDeadlineExceeded("Rate limit wait would exceed the search deadline.")
+            time.sleep(wait_time)
+
+class SearchBackend(ABC):
+    """
+    Base class of the web search backends.
+
+    Subclasses implement `_search_once` (a single call to the engine) and `is_retryable`. The `search` method
+    adds the rate limiting, the retries with jittered exponential backoff and the per-call deadline.
+    """
+    name = None
+
+    def __init__(self, rate_limiter: TokenBucket, max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 16.0,
+                 deadline: float = 30.0):
+        """
+        Args:
+            rate_limiter (TokenBucket): The rate limiter of the engine.
+            max_retries (int): Maximum number of retries after a failed call.
+            backoff_base (float): Base delay (in seconds) of the exponential backoff.
+            backoff_max (float): Maximum delay (in seconds) between two attempts.
+            deadline (float): Default maximum duration (in seconds) of a search, retries included.
+        """
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+
+    @abstractmethod
+    def _search_once(self, query: str, num_results: int) -> list:
+        """Makes a single call to the engine and returns its (title, url, snippet) results."""
+
+    @abstractmethod
+    def is_retryable(self, exception: Exception) -> bool:
+        """Tells whether a failed call is worth retrying (rate limit or transient error)."""
+
+    def search(self, query: str, num_results: int, deadline: float = None) -> list:
+        """
+        Searches the web with the engine.
+
+        Args:
+            query (str): The query sent to the engine.
+            num_results (int): The number of results of the web search.
+            deadline (float, optional): Maximum duration (in seconds) of the search. Defaults to the backend deadline.
+
+        Returns:
+            list: A list of search result entries. Each entry is a tuple (title, url, snippet).
+
+        Raises:
+            SearchDeadlineExceeded: If the search couldn't be completed before the deadline.
+            Exception: The error of the last attempt if it isn't retryable or if there are no retries left.
+        """
+        end_time = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(deadline=end_time)
+            try:
+                return self._search_once(query, num_results)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                # Full jitter: random delay between 0 and the exponential backoff.
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if time.monotonic() + delay > end_time:
+                    raise SearchDeadlineExceeded(f"{self.name} search deadline exceeded after {attempt + 1} attempts: {e}") from e
+                logger.debug(f"{self.name} search failed ({e}), retrying in {delay:.2f} seconds.\n")
+                time.sleep(delay)
+                attempt += 1
+
+class DDGSBackend(SearchBackend):
+    """DuckDuckGo backend. Each worker thread keeps its own long-lived DDGS client."""
+    name = "ddg"
+
+    def __init__(self, rate_limiter: TokenBucket, timeout: int = 10, **kwargs):
+        """
+        Args:
+            rate_limiter (TokenBucket): The rate limiter of the engine.
+            timeout (int): Timeout (in seconds) of each HTTP request.
+            **kwargs: The retry and deadline parameters of SearchBackend.
+        """
+        super().__init__(rate_limiter, **kwargs)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _client(self):
+        if getattr(self._local, "client", None) is None:
+            from duckduckgo_search import DDGS
+            self._local.client = DDGS(timeout=self.timeout)
+        return self._local.client
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        results = []
+        for result in self._client().text(keywords=query, max_results=num_results):
+            # Each result is a dictionary with keys like 'title', 'href', 'body'
+            title = result.get("title") or ""
+            url = result.get("href") or result.get("url") or ""
+            snippet = result.get("body") or result.get("snippet") or ""
+            results.append((title, url, snippet))
+        return results
+
+    def is_retryable(self, exception: Exception) -> bool:
+        from duckduckgo_search.exceptions import DuckDuckGoSearchException
+        # RatelimitException and TimeoutException are subclasses of DuckDuckGoSearchException.
+        return isinstance(exception, DuckDuckGoSearchException)
+
+class ExaBackend(SearchBackend):
+    """ExaSearch backend sharing a single Exa client."""
+    name = "exa"
+
+    RETRYABLE_STATUS_PATTERN = re.compile(r"status code (429|5\d\d)")
+
+    def __init__(self, rate_limiter: TokenBucket, api_key: str, **kwargs):
+        """
+        Args:
+            rate_limiter (TokenBucket): The rate limiter of the engine.
+            api_key (str): The ExaSearch API key.
+            **kwargs: The retry and deadline parameters of SearchBackend.
+        """
+        super().__init__(rate_limiter, **kwargs)
+        from exa_py import Exa
+        self.client = Exa(api_key=api_key)
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        results = []
+        for result in self.client.search_and_contents(query, num_results = num_results, text = True).results:
+            title = result.title or ""
+            url = result.url or ""
+            snippet = result.text or ""
+            results.append((title, url, snippet))
+        return results
+
+    def is_retryable(self, exception: Exception) -> bool:
+        # exa_py raises a ValueError with the HTTP status code when the request fails.
+        if isinstance(exception, requests.RequestException):
+            return True
+        return isinstance(exception, ValueError) and bool(self.RETRYABLE_STATUS_PATTERN.search(str(exception)))
+
+def _retry_params() -> dict:
+    """Returns the retry and deadline parameters of the backends, read from the configuration."""
+    return {
+        "max_retries": global_config.search_max_retries,
+        "backoff_base": global_config.search_backoff_base,
+        "backoff_max": global_config.search_backoff_max,
+        "deadline": global_config.search_deadline,
+    }
+
+def _create_ddg_backend() -> SearchBackend:
+    return DDGSBackend(TokenBucket(global_config.ddg_rate_limit, global_config.ddg_rate_burst),
+                       timeout=global_config.search_timeout, **_retry_params())
+
+def _create_exa_backend() -> SearchBackend:
+    return ExaBackend(TokenBucket(global_config.exa_rate_limit, global_config.exa_rate_burst),
+                      api_key=global_config.exa_search_api_key.get_secret_value(), **_retry_params())
+
+_backend_factories = {
+    "ddg": _create_ddg_backend,
+    "exa": _create_exa_backend,
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+def register_search_backend(engine: str, factory):
+    """
+    Registers a web search engine. The backend is created by the factory on first use.
+
+    Args:
+        engine (str): The name of the engine (the value of WEB_SEARCH_ENGINE selecting it).
+        factory (callable): Function without parameters returning the SearchBackend of the engine.
+                            The client library of the engine should be imported inside it, or inside the backend.
+
+    Returns:
+        None
+    """
+    with _backends_lock:
+        _backend_factories[engine] = factory
+        _backends.pop(engine, None)
+
+def get_search_backend(engine: str) -> SearchBackend:
+    """
+    Returns the long-lived backend of a web search engine, creating it on first use.
+
+    Args:
+        engine (str): The web search engine ("ddg", "exa" or a registered engine).
+
+    Returns:
+        SearchBackend: The backend of the engine.
+
+    Raises:
+        ValueError: If the engine is not registered.
+    """
+    with _backends_lock:
+        if engine not in _backends:
+            if engine not in _backend_factories:
+                raise ValueError(f"{engine} isn't a valid web search engine. Please use one of: {', '.join(_backend_factories)}.")
+            _backends[engine] = _backend_factories[engine]()
+        return _backends[engine]
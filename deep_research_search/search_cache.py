@@ -0,0 +1,174 @@
+"""Persistent cache of the web search results, stored in a SQLite database."""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+CLEANUP_INTERVAL = 100 # Number of stored searches between two removals of the expired and least recently used entries
+
+class SearchCache:
+    """
+    On-disk cache of web search results keyed by engine, rewritten query and number of results.
+
+    Each engine has its own time to live (in seconds). When the cache holds more than `max_entries`
+    results, the least recently used entries are evicted. Both cleanups run every `CLEANUP_INTERVAL`
+    stored searches, so the cache may briefly hold up to `CLEANUP_INTERVAL` extra entries.
+    """
+
+    def __init__(self, path: str, ttls: dict, max_entries: int = 5000):
+        """
+        Opens (and creates if needed) the cache database.
+
+        Args:
+            path (str): The path of the SQLite database file.
+            ttls (dict): Time to live in seconds of the cached results for each engine (e.g. {"ddg": 86400}).
+            max_entries (int): Maximum number of cached searches kept on disk.
+        """
+        self.path = path
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._sets_since_cleanup = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The cache is shared by the gap pipelines which run in worker threads.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS search_results ("
+            "engine TEXT NOT NULL, query TEXT NOT NULL, num_results INTEGER NOT NULL, "
+            "results TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL, "
+            "PRIMARY KEY (engine, query, num_results))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON search_results (last_access)")
+        self._connection.commit()
+        with self._lock:
+            self._cleanup(time.time()) # Entries left over by the previous runs
+
+    def get(self, engine: str, query: str, num_results: int):
+        """
+        Returns the cached results of a search if they exist and are not expired.
+
+        Args:
+            engine (str): The web search engine ("ddg" or "exa").
+            query (str): The rewritten query sent to the engine.
+            num_results (int): The number of results requested.
+
+        Returns:
+            list: The cached list of (title, url, snippet) tuples, or None on a cache miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT results, created_at FROM search_results WHERE engine = ? AND query = ? AND num_results = ?",
+                (engine, query, num_results),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttls.get(engine, 0):
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE search_results SET last_access = ? WHERE engine = ? AND query = ? AND num_results = ?",
+                (now, engine, query, num_results),
+            )
+            self._connection.commit()
+            self.hits += 1
+        logger.debug(f"Search cache hit for the {engine} query: {query}\n")
+        return [tuple(result) for result in json.loads(row[0])]
+
+    def set(self, engine: str, query: str, num_results: int, results: list):
+        """
+        Stores the results of a search, and every `CLEANUP_INTERVAL` searches evicts the expired and least recently used entries.
+
+        Args:
+            engine (str): The web search engine ("ddg" or "exa").
+            query (str): The rewritten query sent to the engine.
+            num_results (int): The number of results requested.
+            results (list): The list of (title, url, snippet) tuples returned by the engine.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?, ?)",
+                (engine, query, num_results, json.dumps(results), now, now),
+            )
+            self._sets_since_cleanup += 1
+            if self._sets_since_cleanup >= CLEANUP_INTERVAL:
+                self._cleanup(now)
+            self._connection.commit()
+
+    def _cleanup(self, now: float):
+        """Removes the expired entries, then the least recently used ones beyond `max_entries` (called with the lock held)."""
+        self._sets_since_cleanup = 0
+        for cached_engine, ttl in self.ttls.items():
+            self._connection.execute(
+                "DELETE FROM search_results WHERE engine = ? AND created_at < ?", (cached_engine, now - ttl)
+            )
+        entries = self._connection.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+        if entries > self.max_entries:
+            # Only the excess is deleted, walking the last access index from the oldest entry.
+            self._connection.execute(
+                "DELETE FROM search_results WHERE rowid IN "
+                "(SELECT rowid FROM search_results ORDER BY last_access LIMIT ?)",
+                (entries - self.max_entries,),
+            )
+        self._connection.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns the hit and miss counters of the cache.
+
+        Returns:
+            dict: A dictionary with the keys "hits", "misses", "hit_rate" and "entries".
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        """
+        Removes every cached search result.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM search_results")
+            self._connection.commit()
+
+_search_cache = None
+_search_cache_created = False
+_search_cache_lock = threading.Lock()
+
+def get_search_cache() -> SearchCache:
+    """
+    Returns the long-lived search cache, opening it on first use.
+
+    Returns:
+        SearchCache: The cache, or None if SEARCH_CACHE_ENABLED is false.
+    """
+    global _search_cache, _search_cache_created
+    with _search_cache_lock:
+        if not _search_cache_created:
+            _search_cache = SearchCache(
+                path=global_config.search_cache_path,
+                ttls={"ddg": global_config.ddg_cache_ttl, "exa": global_config.exa_cache_ttl},
+                max_entries=global_config.search_cache_max_entries,
+            ) if global_config.search_cache_enabled else None
+            _search_cache_created = True
+        return _search_cache
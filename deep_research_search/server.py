@@ -0,0 +1,284 @@
+"""Long-running HTTP/JSON service running many DeepSearch sessions concurrently."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+import uuid
+
+from deep_research_search.deepsearch import async_deep_search
+from deep_research_search.llm_scheduler import PRIORITIES, current_llm_session
+from deep_research_search.llm_providers import get_llm_provider
+from deep_research_search.search import close_fanout_executor
+from deep_research_search.token_usage import TokenUsage
+from deep_research_search.tracing import tracer
+from deep_research_search.streaming import BroadcastSink
+
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+HTTP_STATUSES = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class ResearchServer:
+    """
+    Local HTTP/JSON API accepting research sessions.
+
+    Endpoints:
+        POST /sessions        {"query": str, "priority": "interactive" | "background", "token_budget": int}
+                              Starts a session and returns its id.
+        GET  /sessions/<id>   Returns the status of a session, and its answer and token usage once done.
+        GET  /sessions/<id>/stream
+                              Streams the final answer of a session as it is generated (chunked text response).
+        GET  /stats           Returns the state of the shared LLM scheduler and the number of sessions by status.
+        GET  /metrics         Returns the metrics of the stages in the Prometheus text format.
+        GET  /health          Returns {"status": "ok"}.
+
+    Every LLM call of every session goes through the shared LLM scheduler. The id of a session is also the id of its trace.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_body_bytes: int = 65536):
+        """
+        Args:
+            max_sessions (int): Maximum number of sessions kept in memory (the oldest finished ones are removed).
+            max_body_bytes (int): Maximum size of the body of a request (larger requests are rejected unread).
+        """
+        self.max_sessions = max_sessions
+        self.max_body_bytes = max_body_bytes
+        self.sessions = {}
+        self.answer_sinks = {} # session id -> BroadcastSink of the final answer
+        self._tasks = set()
+
+    async def run_session(self, session_id: str, query: str, priority: int, token_budget: int):
+        """
+        Runs a DeepSearch session and stores its result.
+
+        Args:
+            session_id (str): The id of the session.
+            query (str): The query of the user.
+            priority (int): The priority of the LLM calls of the session.
+            token_budget (int): Maximum allowed tokens for the session.
+
+        Returns:
+            None
+        """
+        session = self.sessions[session_id]
+        session["status"] = "running"
+        current_llm_session.set((session_id, priority)) # Only affects this task and the worker threads it starts
+        token_usage = TokenUsage(token_budget)
+        sink = self.answer_sinks[session_id]
+        try:
+            session["answer"] = await async_deep_search(query, token_budget=token_budget, token_usage=token_usage, trace_id=session_id,
+                                                        sink=sink)
+            session["status"] = "done"
+        except Exception as e:
+            logger.error(f"Session {session_id} failed: {e}\n")
+            session["status"] = "failed"
+            session["error"] = str(e)
+        finally:
+            sink.close()
+        if sink.first_token_at is not None: # Latency perceived by the user
+            session["time_to_first_token"] = sink.first_token_at - session["created_at"]
+        session["token_usage"] = token_usage.breakdown()
+        session["finished_at"] = time.time()
+
+    def start_session(self, payload: dict) -> dict:
+        """
+        Validates a session request and starts the session in the background.
+
+        Args:
+            payload (dict): The JSON body of the request.
+
+        Returns:
+            dict: The session record.
+
+        Raises:
+            ValueError: If the request is not valid.
+        """
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("The 'query' field must be a non empty string.")
+        priority_name = payload.get("priority", "interactive")
+        if priority_name not in PRIORITIES:
+            raise ValueError(f"{priority_name} isn't a valid priority. Please use 'interactive' or 'background'.")
+        token_budget = payload.get("token_budget", 10000)
+        if isinstance(token_budget, bool) or not isinstance(token_budget, int) or token_budget <= 0: # JSON true is an int in Python
+            raise ValueError("The 'token_budget' field must be a positive integer.")
+
+        self._remove_old_sessions()
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = {
+            "session_id": session_id,
+            "query": query,
+            "priority": priority_name,
+            "status": "queued",
+            "answer": None,
+            "error": None,
+            "token_usage": None,
+            "time_to_first_token": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        self.answer_sinks[session_id] = BroadcastSink()
+        task = asyncio.create_task(self.run_session(session_id, query, PRIORITIES[priority_name], token_budget))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return self.sessions[session_id]
+
+    def _remove_old_sessions(self):
+        """Removes the oldest finished sessions when the server keeps too many sessions."""
+        finished_sessions = sorted((session for session in self.sessions.values() if session["finished_at"] is not None),
+                                   key=lambda session: session["finished_at"])
+        for session in finished_sessions[:max(0, len(self.sessions) - self.max_sessions + 1)]:
+            del self.sessions[session["session_id"]]
+            del self.answer_sinks[session["session_id"]]
+
+    def route(self, method: str, path: str, body: bytes):
+        """
+        Handles an API request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path of the request.
+            body (bytes): The body of the request.
+
+        Returns:
+            tuple: The HTTP status code and the JSON-serializable response (or the text of the response for /metrics,
+                   or an async iterator of the chunks of the response for /sessions/<id>/stream).
+        """
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, tracer.prometheus_metrics()
+        if path == "/stats":
+            statuses = {}
+            for session in self.sessions.values():
+                statuses[session["status"]] = statuses.get(session["status"], 0) + 1
+            return 200, {"llm_scheduler": get_llm_provider().scheduler.stats(), "sessions": statuses}
+        if path == "/sessions":
+            if method != "POST":
+                return 405, {"error": "Use POST to start a session."}
+            try:
+                session = self.start_session(json.loads(body or b"{}"))
+            except (ValueError, AttributeError) as e:
+                return 400, {"error": str(e)}
+            return 202, session
+        if path.startswith("/sessions/") and path.endswith("/stream"):
+            sink = self.answer_sinks.get(path[len("/sessions/"):-len("/stream")])
+            if sink is None:
+                return 404, {"error": "Unknown session."}
+            return 200, sink.subscribe()
+        if path.startswith("/sessions/"):
+            session = self.sessions.get(path[len("/sessions/"):])
+            if session is None:
+                return 404, {"error": "Unknown session."}
+            return 200, session
+        return 404, {"error": f"Unknown path {path}."}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Reads an HTTP request from a connection and writes the JSON response. A request whose Content-Length
+        exceeds `max_body_bytes` is answered with a 413 status without reading its body.
+
+        Args:
+            reader (asyncio.StreamReader): The reader of the connection.
+            writer (asyncio.StreamWriter): The writer of the connection.
+
+        Returns:
+            None
+        """
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            content_length = int(headers.get("content-length", 0))
+            if content_length > self.max_body_bytes: # Checked before reading: the body would be buffered in memory
+                status, response = 413, {"error": f"The request body exceeds {self.max_body_bytes} bytes."}
+            else:
+                body = await reader.readexactly(content_length)
+                method, path, _ = request_line.split(" ", 2)
+                status, response = self.route(method.upper(), path.split("?", 1)[0], body)
+        except Exception as e:
+            logger.error(f"Error handling a request: {e}\n")
+            status, response = 400 if isinstance(e, ValueError) else 500, {"error": str(e)}
+
+        if hasattr(response, "__aiter__"): # Streamed answer
+            await self.write_chunked(writer, response)
+            return
+        if isinstance(response, str):
+            content, content_type = response.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            content, content_type = json.dumps(response).encode("utf-8"), "application/json"
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_STATUSES[status]}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(content)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + content
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def write_chunked(self, writer: asyncio.StreamWriter, chunks):
+        """
+        Writes a text response with the chunked transfer encoding, each chunk being sent as soon as it is available.
+
+        Args:
+            writer (asyncio.StreamWriter): The writer of the connection.
+            chunks (async iterator): The chunks of text of the response.
+
+        Returns:
+            None
+        """
+        writer.write(
+            "HTTP/1.1 200 OK\r\nContent-Type: text/plain; charset=utf-8\r\n"
+            "Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode("latin-1")
+        )
+        try:
+            async for chunk in chunks:
+                data = chunk.encode("utf-8")
+                writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError: # The client stopped reading
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        """
+        Serves the API until the process is stopped.
+
+        Args:
+            host (str): The host to bind.
+            port (int): The port to bind.
+
+        Returns:
+            None
+        """
+        # The sessions run their blocking LLM and network calls in the default executor.
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=global_config.server_max_workers))
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info(f"----- DEEPSEARCH SERVER LISTENING ON http://{host}:{port} -----\n")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            close_fanout_executor()
+
+def main():
+    """
+    Starts the research server on SERVER_HOST:SERVER_PORT.
+
+    Returns:
+        None
+    """
+    research_server = ResearchServer(max_sessions=global_config.server_max_sessions, max_body_bytes=global_config.server_max_body_bytes)
+    asyncio.run(research_server.serve(global_config.server_host, global_config.server_port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Serializable state of a DeepSearch session, checkpointed on disk to resume an interrupted session."""
+import gzip
+import json
+import os
+
+from deep_research_search.diary import Diary
+from deep_research_search.knowledge import KnowledgeStore
+from deep_research_search.query_history import QueryHistory
+from deep_research_search.config import global_config
+
+CHECKPOINT_VERSION = 5
+
+def new_memory(initial_query: str) -> dict:
+    """
+    Creates the empty in-memory state of a session.
+
+    Args:
+        initial_query (str): The initial query or question provided by the user.
+
+    Returns:
+        dict: The memory with the keys "knowledge", "diaryContext", "actionsHistory", "visited_urls",
+              "processed_queries" and "initial_query".
+    """
+    return {
+        "knowledge": KnowledgeStore(max_tokens=global_config.knowledge_max_tokens, relevance_query=initial_query),  # Store of gathered knowledge items.
+        "diaryContext": Diary(global_config.diary_max_entries),    # Diary of the actions and evaluations (older entries compacted).
+        "actionsHistory": [],   # Optionally, history of actions taken.
+        "visited_urls": set(),     # Set of URLs that have been fully crawled/processed.
+        "processed_queries": QueryHistory(global_config.query_similarity_threshold),  # Queries that have been processed, with their results
+        "initial_query": initial_query
+    }
+
+class SessionState:
+    """
+    Everything needed to continue a DeepSearch session: the memory, the gap questions, the progress of the
+    current step (outcomes of the gap pipelines not read into the memory yet) and the tokens already consumed.
+    """
+
+    def __init__(self, initial_query: str, token_budget: int = 10000, trace_id: str = None):
+        """
+        Creates the state of a new session.
+
+        Args:
+            initial_query (str): The initial query or question provided by the user.
+            token_budget (int): Maximum allowed tokens for the session.
+            trace_id (str, optional): The id of the trace of the session.
+        """
+        self.initial_query = initial_query
+        self.token_budget = token_budget
+        self.trace_id = trace_id
+        self.memory = new_memory(initial_query)
+        self.gaps = [initial_query]      # Queue of gap questions that need further investigation (the investigated ones are removed).
+        self.gaps_detected = False
+        self.step = 0
+        self.bad_attempts = 0
+        self.outcomes = None     # Outcome of the pipeline of each gap question of the current step, the first ones of
+                                 # the queue (None until it finishes).
+                                 # The list itself is None between the steps.
+        self.answer_mode = None  # Set once the search is over: "normal_generation" or "beast_mode".
+        self.final_answer = None
+        self.token_stages = {}   # Token usage by stage (see TokenUsage.breakdown)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the state as JSON-serializable data.
+
+        Returns:
+            dict: The state. The knowledge items are stored as (source, text, start, end) lists, their indexes are rebuilt when loading.
+        """
+        memory = self.memory
+        return {
+            "version": CHECKPOINT_VERSION,
+            "initial_query": self.initial_query,
+            "token_budget": self.token_budget,
+            "trace_id": self.trace_id,
+            "memory": {
+                "knowledge": [[item.source, item.text, item.start, item.end] for item in memory["knowledge"]],
+                "diaryContext": memory["diaryContext"].to_dict(),
+                "actionsHistory": list(memory["actionsHistory"]),
+                "visited_urls": sorted(memory["visited_urls"]),
+                "processed_queries": memory["processed_queries"].to_list(),
+            },
+            "gaps": self.gaps,
+            "gaps_detected": self.gaps_detected,
+            "step": self.step,
+            "bad_attempts": self.bad_attempts,
+            "outcomes": list(self.outcomes) if self.outcomes is not None else None,
+            "answer_mode": self.answer_mode,
+            "final_answer": self.final_answer,
+            "token_stages": self.token_stages,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionState":
+        """
+        Rebuilds a state from the data returned by to_dict.
+
+        Args:
+            data (dict): The serialized state.
+
+        Returns:
+            SessionState: The state.
+
+        Raises:
+            ValueError: If the data was written by an incompatible version.
+        """
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {data.get('version')}.")
+        state = cls(data["initial_query"], data["token_budget"], data["trace_id"])
+        memory = state.memory
+        for source, text, start, end in data["memory"]["knowledge"]:
+            memory["knowledge"].add(text, source, start, end)
+        memory["diaryContext"] = Diary.from_dict(data["memory"]["diaryContext"])
+        memory["actionsHistory"].extend(data["memory"]["actionsHistory"])
+        memory["visited_urls"].update(data["memory"]["visited_urls"])
+        memory["processed_queries"] = QueryHistory.from_list(data["memory"]["processed_queries"], global_config.query_similarity_threshold)
+        state.gaps = data["gaps"]
+        state.gaps_detected = data["gaps_detected"]
+        state.step = data["step"]
+        state.bad_attempts = data["bad_attempts"]
+        state.outcomes = data["outcomes"]
+        if state.outcomes is not None:
+            for outcome in state.outcomes:
+                if outcome is not None: # JSON turned the (title, url, snippet) tuples into lists
+                    outcome["results"] = [tuple(result) for result in outcome["results"]]
+        state.answer_mode = data["answer_mode"]
+        state.final_answer = data["final_answer"]
+        state.token_stages = data["token_stages"]
+        return state
+
+    def save(self, path: str):
+        """
+        Writes the state as gzip compressed JSON. The previous checkpoint is replaced atomically, so an
+        interruption during the write can't corrupt it.
+
+        Args:
+            path (str): The path of the checkpoint file.
+
+        Returns:
+            None
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with gzip.open(temporary_path, "wt", encoding="utf-8", compresslevel=6) as checkpoint_file:
+            json.dump(self.to_dict(), checkpoint_file, separators=(",", ":"))
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SessionState":
+        """
+        Reads a state written by save.
+
+        Args:
+            path (str): The path of the checkpoint file.
+
+        Returns:
+            SessionState: The state.
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as checkpoint_file:
+            return cls.from_dict(json.load(checkpoint_file))
@@ -0,0 +1,160 @@
+"""Destinations (sinks) of the streamed final answer: standard output, file, callback, and asynchronous subscribers."""
+import asyncio
+import sys
+import threading
+import time
+
+class AnswerSink:
+    """
+    Base class of the sinks receiving the tokens of the final answer as they are generated.
+
+    Subclasses implement `_write` (and `close` if they hold a resource). The base class discards the tokens
+    and only records when the first one was received and how many were received.
+    """
+
+    def __init__(self):
+        self.first_token_at = None # time.time() of the first token
+        self.tokens = 0
+        self.cancelled = False # Checked by the worker thread generating the answer after each token
+
+    def write(self, token: str):
+        """
+        Sends a token of the answer to the sink.
+
+        Args:
+            token (str): The token (may be several characters or a whole text).
+
+        Returns:
+            None
+        """
+        if self.first_token_at is None:
+            self.first_token_at = time.time()
+        self.tokens += 1
+        self._write(token)
+
+    def _write(self, token: str):
+        pass
+
+    def close(self):
+        """Signals the end of the answer (called once the session is over, even if it failed)."""
+
+    def cancel(self):
+        """
+        Asks the worker thread generating the answer to stop: the generation ends at the next token and
+        its request is closed, so it frees its LLM scheduler slot.
+
+        Returns:
+            None
+        """
+        self.cancelled = True
+
+class StdoutSink(AnswerSink):
+    """Writes the answer to the standard output in real time (the CLI behavior)."""
+
+    def _write(self, token: str):
+        sys.stdout.write(token)
+        sys.stdout.flush()
+
+    def close(self):
+        sys.stdout.flush()
+
+class FileSink(AnswerSink):
+    """Writes the answer to a text file, flushed after each token so it can be followed while it is generated."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The path of the file (overwritten).
+        """
+        super().__init__()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def _write(self, token: str):
+        self._file.write(token)
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+class CallbackSink(AnswerSink):
+    """Calls a function with each token (from the worker thread generating the answer)."""
+
+    def __init__(self, callback, on_close=None):
+        """
+        Args:
+            callback (callable): The function called with each token.
+            on_close (callable, optional): The function called without argument at the end of the answer.
+        """
+        super().__init__()
+        self.callback = callback
+        self.on_close = on_close
+
+    def _write(self, token: str):
+        self.callback(token)
+
+    def close(self):
+        if self.on_close is not None:
+            self.on_close()
+
+class BroadcastSink(AnswerSink):
+    """
+    Keeps the tokens of the answer and replays them to any number of asynchronous subscribers (async iterators,
+    HTTP chunked responses), including the ones subscribing after the generation started.
+
+    The tokens can be written from any thread; the subscribers run in the event loop the sink was created in.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        """
+        Args:
+            loop (asyncio.AbstractEventLoop, optional): The event loop of the subscribers. Defaults to the running loop.
+        """
+        super().__init__()
+        self.loop = loop or asyncio.get_running_loop()
+        self.chunks = []
+        self.closed = False
+        self._events = set() # One event per subscriber, set when a token is written or the sink is closed
+        self._lock = threading.Lock()
+
+    def _notify(self):
+        for event in self._events:
+            event.set()
+
+    def _write(self, token: str):
+        with self._lock:
+            self.chunks.append(token)
+        self.loop.call_soon_threadsafe(self._notify)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        try:
+            self.loop.call_soon_threadsafe(self._notify)
+        except RuntimeError: # The event loop is already closed: no subscriber left
+            pass
+
+    async def subscribe(self):
+        """
+        Yields the tokens of the answer from the first one, waiting for the next ones until the sink is closed.
+
+        Yields:
+            str: The tokens, in order.
+        """
+        event = asyncio.Event()
+        self._events.add(event)
+        index = 0
+        try:
+            while True:
+                event.clear()
+                with self._lock:
+                    closed = self.closed # Read before the tokens: every token is written before the sink is closed
+                    chunks = self.chunks[index:]
+                for chunk in chunks:
+                    yield chunk
+                index += len(chunks)
+                if closed:
+                    return
+                await event.wait()
+        finally:
+            self._events.discard(event)
@@ -0,0 +1,135 @@
+"""Token accounting and token budget enforcement of a DeepSearch session."""
+from contextvars import ContextVar
+import math
+import threading
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a LLM call would exceed the token budget of the session."""
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text before sending it to the LLM.
+
+    Args:
+        text (str): The text to estimate.
+
+    Returns:
+        int: The estimated number of tokens (about 4 characters per token).
+    """
+    return math.ceil(len(text) / 4)
+
+def max_completion_tokens(options: dict = None) -> int:
+    """
+    Returns the maximum number of tokens the LLM may generate for a call.
+
+    Args:
+        options (dict, optional): The generation options of the call.
+
+    Returns:
+        int: The num_predict option if it is a positive limit, otherwise 0 (the completion size is unknown).
+    """
+    num_predict = (options or {}).get("num_predict")
+    if isinstance(num_predict, bool) or not isinstance(num_predict, int) or num_predict <= 0: # -1: no limit
+        return 0
+    return num_predict
+
+class TokenUsage:
+    """
+    Real token usage of a DeepSearch session, built from the prompt_eval_count and eval_count of the Ollama responses.
+    """
+
+    def __init__(self, token_budget: int = None):
+        """
+        Creates an empty usage tracker.
+
+        Args:
+            token_budget (int, optional): Maximum allowed tokens for the session. No limit if None.
+        """
+        self.token_budget = token_budget
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, prompt_tokens: int, completion_tokens: int, cached: bool = False):
+        """
+        Records the tokens consumed by a LLM call.
+
+        Args:
+            stage (str): The stage of the algorithm that made the call (e.g. "reason", "rewrite").
+            prompt_tokens (int): The number of tokens of the prompt evaluated by the LLM.
+            completion_tokens (int): The number of generated tokens.
+            cached (bool, optional): True if the response came from the LLM cache (no token consumed).
+
+        Returns:
+            None
+        """
+        with self._lock:
+            usage = self.stages.setdefault(stage, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0, "cached_calls": 0})
+            usage["prompt_tokens"] += prompt_tokens or 0
+            usage["completion_tokens"] += completion_tokens or 0
+            usage["calls"] += 1
+            if cached:
+                usage["cached_calls"] += 1
+
+    def restore(self, stages: dict):
+        """
+        Adds the usage of a previous run of the session (e.g. before a checkpoint).
+
+        Args:
+            stages (dict): The usage of each stage, as returned in breakdown()["stages"].
+
+        Returns:
+            None
+        """
+        with self._lock:
+            for stage, previous_usage in stages.items():
+                usage = self.stages.setdefault(stage, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0, "cached_calls": 0})
+                for key, value in previous_usage.items():
+                    usage[key] = usage.get(key, 0) + value
+
+    @property
+    def total(self) -> int:
+        """Total number of tokens (prompt and completion) consumed by the session."""
+        with self._lock:
+            return sum(usage["prompt_tokens"] + usage["completion_tokens"] for usage in self.stages.values())
+
+    def remaining(self) -> int:
+        """
+        Returns the number of tokens left in the budget.
+
+        Returns:
+            int: The remaining tokens, or None if there is no budget.
+        """
+        if self.token_budget is None:
+            return None
+        return max(0, self.token_budget - self.total)
+
+    def would_exceed(self, estimated_tokens: int) -> bool:
+        """
+        Checks if a call of an estimated size would exceed the budget.
+
+        Args:
+            estimated_tokens (int): The estimated number of tokens of the call.
+
+        Returns:
+            bool: True if the budget would be exceeded.
+        """
+        remaining = self.remaining()
+        return remaining is not None and estimated_tokens > remaining
+
+    def breakdown(self) -> dict:
+        """
+        Returns the usage of the session by stage.
+
+        Returns:
+            dict: A dictionary with the keys "total", "token_budget" and "stages" (usage of each stage).
+        """
+        with self._lock:
+            stages = {stage: dict(usage) for stage, usage in self.stages.items()}
+        return {
+            "total": sum(usage["prompt_tokens"] + usage["completion_tokens"] for usage in stages.values()),
+            "token_budget": self.token_budget,
+            "stages": stages,
+        }
+
+# Usage tracker of the running session. The context is copied to the worker threads used by the async engine.
+current_token_usage: ContextVar = ContextVar("current_token_usage", default=None)
@@ -0,0 +1,284 @@
+"""Structured tracing of the DeepSearch stages, exported as JSON lines and Prometheus metrics."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import threading
+import time
+import uuid
+
+from deep_research_search.logger import logger
+from deep_research_search.config import global_config
+
+# Upper bounds (in seconds) of the buckets of the span duration histograms
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Numeric span attributes summed into Prometheus counters: attribute -> (metric name, help)
+SPAN_COUNTERS = {
+    "llm_calls": ("deepsearch_llm_calls_total", "Number of LLM calls, cached ones included."),
+    "prompt_tokens": ("deepsearch_llm_prompt_tokens_total", "Number of prompt tokens evaluated by the LLM."),
+    "completion_tokens": ("deepsearch_llm_completion_tokens_total", "Number of tokens generated by the LLM."),
+    "llm_cache_hits": ("deepsearch_llm_cache_hits_total", "Number of LLM calls answered by the LLM cache."),
+    "search_cache_hits": ("deepsearch_search_cache_hits_total", "Number of web searches answered by the search cache."),
+    "results": ("deepsearch_results_total", "Number of search results or knowledge items produced."),
+}
+
+# Numeric span attributes aggregated into Prometheus histograms: attribute -> (metric name, help, bucket upper bounds)
+SPAN_HISTOGRAMS = {
+    "time_to_first_token": ("deepsearch_time_to_first_token_seconds",
+                            "Time between the request of a streamed LLM response and its first token.", DURATION_BUCKETS),
+    "tokens_per_second": ("deepsearch_generation_tokens_per_second",
+                          "Generation speed of the streamed LLM responses.", (1, 2, 5, 10, 20, 50, 100, 200, 500)),
+}
+
+# Trace of the running session and innermost open span. The context is copied to the worker threads.
+current_trace_id: ContextVar = ContextVar("current_trace_id", default=None)
+current_span: ContextVar = ContextVar("current_span", default=None)
+
+class Span:
+    """A timed operation of a stage of the algorithm, with its attributes (token counts, results, cache hits...)."""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "duration", "attributes", "_lock")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self.duration = None
+        self.attributes = dict(attributes or {})
+        self._lock = threading.Lock()
+
+    def set(self, **attributes):
+        """Sets attributes of the span."""
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def add(self, **counts):
+        """Adds values to numeric attributes of the span (missing attributes start at 0)."""
+        with self._lock:
+            for name, value in counts.items():
+                self.attributes[name] = self.attributes.get(name, 0) + (value or 0)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "start_time": self.start_time,
+                "duration": self.duration,
+                "attributes": dict(self.attributes),
+            }
+
+class Tracer:
+    """
+    Creates the spans, writes the finished ones as JSON lines and aggregates them into Prometheus metrics.
+
+    The counters of a span only include what happened directly in it (the LLM calls are counted in the
+    innermost open span), so the metrics of nested spans are never counted twice.
+    """
+
+    def __init__(self, export_path: str = None, enabled: bool = None):
+        """
+        Args:
+            export_path (str, optional): JSON lines file the finished spans are appended to. No export if empty.
+                Defaults to TRACE_PATH, read on first use.
+            enabled (bool, optional): If False, the spans are neither recorded nor exported (the blocks still run).
+                Defaults to TRACING_ENABLED, read on first use.
+        """
+        self._export_path = export_path
+        self._enabled = enabled
+        self._durations = {} # span name -> (bucket counts, sum, count)
+        self._counters = {} # (attribute, span name) -> value
+        self._histograms = {} # (attribute, span name) -> (bucket counts, sum, count)
+        self._errors = {} # span name -> number of failed spans
+        self._export_file = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            self._enabled = global_config.tracing_enabled
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled: bool):
+        self._enabled = enabled
+
+    @property
+    def export_path(self) -> str:
+        if self._export_path is None:
+            self._export_path = global_config.trace_path
+        return self._export_path
+
+    def add_listener(self, listener):
+        """
+        Registers a function called with each finished span (from the thread that finished it).
+
+        Args:
+            listener (callable): The function, taking the Span as argument.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a function registered with add_listener."""
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def start_trace(self, trace_id: str = None) -> str:
+        """
+        Starts the trace of a session in the current context.
+
+        Args:
+            trace_id (str, optional): The id of the trace. A random one is generated if None.
+
+        Returns:
+            str: The id of the trace.
+        """
+        trace_id = trace_id or uuid.uuid4().hex
+        current_trace_id.set(trace_id)
+        current_span.set(None)
+        return trace_id
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Times the block as a span, child of the current span.
+
+        Args:
+            name (str): The name of the span (the stage of the algorithm, e.g. "reason").
+            **attributes: Initial attributes of the span.
+
+        Yields:
+            Span: The span, to set its attributes. It is neither recorded nor exported if the tracing is disabled.
+        """
+        if not self.enabled:
+            yield Span(name, None, attributes=attributes)
+            return
+        parent = current_span.get()
+        span = Span(name, current_trace_id.get() or "untraced", parent.span_id if parent else None, attributes)
+        token = current_span.set(span)
+        start_time = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start_time
+            current_span.reset(token)
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        """Adds a finished span to the metrics and exports it."""
+        record = span.to_dict()
+        with self._lock:
+            buckets, total, count = self._durations.get(span.name, ([0] * len(DURATION_BUCKETS), 0.0, 0))
+            for i, upper_bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= upper_bound:
+                    buckets[i] += 1
+            self._durations[span.name] = (buckets, total + span.duration, count + 1)
+            for attribute in SPAN_COUNTERS:
+                if attribute in record["attributes"]:
+                    key = (attribute, span.name)
+                    self._counters[key] = self._counters.get(key, 0) + record["attributes"][attribute]
+            for attribute, (_, _, upper_bounds) in SPAN_HISTOGRAMS.items():
+                value = record["attributes"].get(attribute)
+                if value is not None:
+                    key = (attribute, span.name)
+                    buckets, total, count = self._histograms.get(key, ([0] * len(upper_bounds), 0.0, 0))
+                    for i, upper_bound in enumerate(upper_bounds):
+                        if value <= upper_bound:
+                            buckets[i] += 1
+                    self._histograms[key] = (buckets, total + value, count + 1)
+            if "error" in record["attributes"]:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+
+            if self.export_path:
+                try:
+                    if self._export_file is None:
+                        self._export_file = open(self.export_path, "a", encoding="utf-8")
+                    self._export_file.write(json.dumps(record) + "\n")
+                    self._export_file.flush()
+                except OSError as e:
+                    logger.error(f"Error while exporting the span {span.name}: {e}\n")
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener(span)
+
+    def prometheus_metrics(self) -> str:
+        """
+        Returns the metrics of the finished spans in the Prometheus text exposition format.
+
+        Returns:
+            str: The duration histogram, the counters and the attribute histograms of every span name.
+        """
+        with self._lock:
+            lines = [
+                "# HELP deepsearch_span_duration_seconds Duration of the stages of the DeepSearch algorithm.",
+                "# TYPE deepsearch_span_duration_seconds histogram",
+            ]
+            for name, (buckets, total, count) in sorted(self._durations.items()):
+                for upper_bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f'deepsearch_span_duration_seconds_bucket{{stage="{name}",le="{upper_bound}"}} {bucket_count}')
+                lines.append(f'deepsearch_span_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+                lines.append(f'deepsearch_span_duration_seconds_sum{{stage="{name}"}} {total}')
+                lines.append(f'deepsearch_span_duration_seconds_count{{stage="{name}"}} {count}')
+            for attribute, (metric, help_text) in SPAN_COUNTERS.items():
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_attribute, name), value in sorted(self._counters.items()):
+                    if counter_attribute == attribute:
+                        lines.append(f'{metric}{{stage="{name}"}} {value}')
+            for attribute, (metric, help_text, upper_bounds) in SPAN_HISTOGRAMS.items():
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (histogram_attribute, name), (buckets, total, count) in sorted(self._histograms.items()):
+                    if histogram_attribute == attribute:
+                        for upper_bound, bucket_count in zip(upper_bounds, buckets):
+                            lines.append(f'{metric}_bucket{{stage="{name}",le="{upper_bound}"}} {bucket_count}')
+                        lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {count}')
+                        lines.append(f'{metric}_sum{{stage="{name}"}} {total}')
+                        lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+            lines.append("# HELP deepsearch_span_errors_total Number of stages that failed with an exception.")
+            lines.append("# TYPE deepsearch_span_errors_total counter")
+            for name, value in sorted(self._errors.items()):
+                lines.append(f'deepsearch_span_errors_total{{stage="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+def annotate(**counts):
+    """
+    Adds values to numeric attributes of the current span (no effect outside a span).
+
+    Args:
+        **counts: The values to add (e.g. llm_calls=1, prompt_tokens=120).
+
+    Returns:
+        None
+    """
+    span = current_span.get()
+    if span is not None:
+        span.add(**counts)
+
+def set_attributes(**attributes):
+    """
+    Sets attributes of the current span (no effect outside a span).
+
+    Args:
+        **attributes: The attributes (e.g. time_to_first_token=0.8).
+
+    Returns:
+        None
+    """
+    span = current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+tracer = Tracer() # Configured from TRACE_PATH and TRACING_ENABLED on first use
@@ -1,34 +1,54 @@
-"""Module used to query a LLM with OLlama or others solutions."""
+"""Module used to query a LLM with OLlama or others solutions (see llm_providers)."""
 from typing import Dict, Generator
 import re
-import sys
 import json
+import time
 from pydantic import BaseModel
 
-import ollama
-
 from deep_research_search.logger import logger
 from deep_research_search.config import global_config
+from deep_research_search.llm_cache import get_llm_cache, make_cache_key
+from deep_research_search.token_usage import TokenBudgetExceeded, current_token_usage, estimate_tokens, max_completion_tokens
+from deep_research_search.llm_providers import get_llm_provider
+from deep_research_search.tracing import annotate, set_attributes
+from deep_research_search.streaming import AnswerSink, StdoutSink
 
-def query_ollama(prompt: str, model_name: str = global_config.llm_model_name, output_format: BaseModel = None, stream: bool = False) -> Dict:
+def query_ollama(prompt: str, model_name: str = None, output_format: BaseModel = None, stream: bool = False,
+                 options: Dict = None, use_cache: bool = True, refresh_cache: bool = False, stage: str = "other",
+                 enforce_budget: bool = True, sink: AnswerSink = None) -> Dict:
     """
-    Sends the prompt to the local OLlama server and retrieves the LLM's decision.
+    Sends the prompt to the LLM provider (LLM_PROVIDER) and retrieves the LLM's decision.
 
     Args:
         prompt (str): The prompt to be sent to the LLM.
-        model_name (str): The name of the OLlama model to use.
+        model_name (str, optional): The name of the model to use. Defaults to LLM_MODEL_NAME.
         output_format (BaseModel, optional): The required format of the output.
         stream (bool, optional): If True, enables streaming output.
+        options (dict, optional): The generation options of the model (temperature, seed...).
+        use_cache (bool, optional): If False, the LLM cache is neither read nor written for this call.
+                                    Streamed responses are never cached.
+        refresh_cache (bool, optional): If True, the LLM is queried even if a cached response exists
+                                        and the cached response is replaced (used to retry a bad response).
+        stage (str, optional): The stage of the algorithm making the call, used for the token accounting.
+        enforce_budget (bool, optional): If True, the call is refused when the estimated size of the prompt, plus the
+                                         maximum completion size (num_predict option) if set, exceeds the remaining
+                                         token budget of the session.
+        sink (AnswerSink, optional): The destination of the streamed tokens. Defaults to the standard output.
 
     Returns:
         dict: A dictionary representing the LLM's response in required JSON format (if not streaming).
-              If streaming, the response is logged token by token in real time.
+              If streaming, the tokens are sent to the sink in real time and the whole response is returned.
+
+    Raises:
+        TokenBudgetExceeded: If the prompt and its completion wouldn't fit in the remaining token budget of the session.
 
     Role:
-        This function interfaces with the OLlama server. It sends the prompt, receives the LLM output, 
-        and either returns it as JSON or streams it in real time.
+        This function interfaces with the LLM server (Ollama or OpenAI-compatible). It sends the prompt, receives the LLM output, 
+        and either returns it as JSON or streams it in real time. The requests go through the scheduler of the
+        provider, which bounds the number of requests in flight across all the sessions. The time to
+        first token and the generation speed of the streamed responses are recorded in the current span.
     """
-    
+    model_name = model_name or global_config.llm_model_name
     request_params = {
         "model": model_name,
         "prompt": prompt,
@@ -37,45 +57,95 @@ def query_ollama(prompt: str, model_name: str = global_config.llm_model_name, ou
     
     if output_format is not None:
         request_params["format"] = output_format.model_json_schema()
+    if options is not None:
+        request_params["options"] = options
+
+    token_usage = current_token_usage.get()
+    cache_key = None
+    llm_cache = get_llm_cache()
+    if not stream and llm_cache is not None and use_cache:
+        cache_key = make_cache_key(model_name, prompt, request_params.get("format"), options)
+        if not refresh_cache:
+            cached_response = llm_cache.get(cache_key)
+            if cached_response is not None:
+                logger.debug("LLM cache hit\n")
+                if token_usage is not None:
+                    token_usage.record(stage, 0, 0, cached=True)
+                annotate(llm_calls=1, llm_cache_hits=1)
+                return cached_response
+
+    # Refuse the call up front if the prompt and the longest allowed completion would blow the token budget
+    if token_usage is not None and enforce_budget:
+        estimated_tokens = estimate_tokens(prompt) + max_completion_tokens(options)
+        if token_usage.would_exceed(estimated_tokens):
+            raise TokenBudgetExceeded(f"The {stage} call (~{estimated_tokens} tokens with the completion) exceeds the remaining token budget ({token_usage.remaining()} tokens).")
+
+    provider = get_llm_provider()
 
     # Gestion du streaming
     if stream:
-        response_generator: Generator = ollama.generate(**request_params)
-        
-        logger.info("Generation of the response\n")
+        if sink is None:
+            sink = StdoutSink()
+        request_time = time.perf_counter() # The time to first token includes the wait for a scheduler slot
+        first_token_time = None
+        completion_tokens = None
+        with provider.scheduler.slot(): # The slot is kept until the end of the stream
+            response_generator: Generator = provider.generate(**request_params)
+            
+            logger.info("Generation of the response\n")
+
+            tokens = [] # Joined at the end: building the response by concatenation would copy it at each token
+            for chunk in response_generator:
+                if sink.cancelled: # Nobody reads the answer anymore: closing the stream stops the generation
+                    logger.info("Generation cancelled\n")
+                    response_generator.close() # Before the slot is released
+                    break
+                token = chunk.get("response", "")
+                if token:
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                    sink.write(token)
+                    tokens.append(token)
+                if chunk.get("done"): # The token counts are sent with the last chunk
+                    completion_tokens = chunk.get("eval_count")
+                    if token_usage is not None:
+                        token_usage.record(stage, chunk.get("prompt_eval_count"), completion_tokens)
+                    annotate(llm_calls=1, prompt_tokens=chunk.get("prompt_eval_count"), completion_tokens=completion_tokens)
+        full_response = "".join(tokens)
 
-        full_response = ""
-        sys.stdout.flush()
-        for chunk in response_generator:
-            token = chunk.get("response", "")
-            sys.stdout.write(token)  
-            sys.stdout.flush()  
-            full_response += token
-        sys.stdout.flush()
+        if first_token_time is not None:
+            generation_time = time.perf_counter() - first_token_time
+            tokens_per_second = (completion_tokens or len(tokens)) / generation_time if generation_time > 0 else None
+            set_attributes(time_to_first_token=first_token_time - request_time, tokens_per_second=tokens_per_second)
+            logger.debug(f"Time to first token: {first_token_time - request_time:.2f} seconds, "
+                         f"{tokens_per_second or 0:.1f} tokens per second\n")
         
         logger.info("Generation done ✅\n")
         return full_response  
 
     else:
-        response = ollama.generate(**request_params)
+        with provider.scheduler.slot():
+            response = provider.generate(**request_params)
+        if token_usage is not None:
+            token_usage.record(stage, response.get("prompt_eval_count"), response.get("eval_count"))
+        annotate(llm_calls=1, prompt_tokens=response.get("prompt_eval_count"), completion_tokens=response.get("eval_count"))
+        if cache_key is not None:
+            llm_cache.set(cache_key, response['response'])
         return response['response']
     
-def add_to_diary(diary_context, step, action, question, result):
+def add_to_diary(diary_context, step, action, question, result, **counts):
     """
     Adds an entry to the diary context.
 
     Args:
-        diary_context (list): The current diary context list.
+        diary_context (Diary): The diary of the session.
         step (int): The current step number.
         action (str): The action taken at this step.
         question (str): The question associated with the action.
         result (str): Details of what was done and the obtained results.
+        **counts: Numeric outcomes of the action (e.g. results=3), kept when the entry is compacted.
 
     Returns:
-        None: The diary context is updated in place.
+        None: The diary context is updated in place (the oldest entries are compacted into a summary).
     """
-    entry = (
-        f"At step {step}, you took **{action}** action for question: \"{question}\"\n"
-        f"Details: {result}\n"
-    )
-    diary_context.append(entry)
\ No newline at end of file
+    diary_context.add(step, action, question, result, **counts)
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""Test configuration: the required settings are given defaults and nothing is written to the on-disk caches."""
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "ollama")
+os.environ.setdefault("LLM_MODEL_NAME", "test-model")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("WEB_SEARCH_ENGINE", "ddg")
+os.environ.setdefault("EXA_SEARCH_API_KEY", "test-key")
+os.environ["SEARCH_CACHE_ENABLED"] = "false"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["KNOWLEDGE_INDEX_ENABLED"] = "false"
+os.environ["TRACE_PATH"] = ""
+os.environ["CHECKPOINT_DIR"] = ""
@@ -0,0 +1,61 @@
+"""Tests of the batch mode with the fake LLM and search backends."""
+import asyncio
+import json
+
+from deep_research_search.batch import main, read_done_ids, read_queries, run_batch
+from deep_research_search.fakes import FakeOllama, FakeSearchBackend, offline_backends
+
+class FailingAnswerOllama(FakeOllama):
+    """Fake LLM failing to stream the answers of the queries containing "fail"."""
+
+    def generate(self, model: str = None, prompt: str = "", stream: bool = False, **kwargs):
+        if stream and "fail" in prompt:
+            raise ConnectionError("The LLM server is gone")
+        return super().generate(model=model, prompt=prompt, stream=stream, **kwargs)
+
+def run(queries, output_path, fake_ollama):
+    backends = {engine: FakeSearchBackend(engine, latency=0) for engine in ("ddg", "exa")}
+    with offline_backends(fake_ollama, backends):
+        return asyncio.run(run_batch(queries, str(output_path), workers=2, token_budget=4000))
+
+def read_results(output_path):
+    return [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+
+def test_failed_answers_are_recorded_as_errors_and_retried(tmp_path):
+    input_path, output_path = tmp_path / "queries.jsonl", tmp_path / "results.jsonl"
+    input_path.write_text('{"query": "What is solar power?"}\n\n{"id": "b", "query": "Why does this fail?"}\n', encoding="utf-8")
+    queries = read_queries(str(input_path))
+    assert [query["id"] for query in queries] == [1, "b"]
+
+    fake_ollama = FailingAnswerOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9, answer_tokens=5, action="generate_answer")
+    assert run(queries, output_path, fake_ollama) == 1
+    results = {result["id"]: result for result in read_results(output_path)}
+    assert results[1]["error"] is None and results[1]["answer"]
+    assert results["b"]["answer"] is None and "The LLM server is gone" in results["b"]["error"]
+
+    # A restart only runs the failed query.
+    assert read_done_ids(str(output_path)) == {1}
+    pending_queries = [query for query in queries if query["id"] not in read_done_ids(str(output_path))]
+    fake_ollama = FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9, answer_tokens=5, action="generate_answer")
+    assert run(pending_queries, output_path, fake_ollama) == 0
+    assert read_done_ids(str(output_path)) == {1, "b"}
+
+def test_truncated_lines_are_ignored_on_restart(tmp_path):
+    output_path = tmp_path / "results.jsonl"
+    output_path.write_text('{"id": 1, "error": null}\n{"id": 2, "error": "boom"}\n{"id": 3, "err', encoding="utf-8")
+    assert read_done_ids(str(output_path)) == {1}
+
+def test_a_restart_skips_the_answered_queries(tmp_path, monkeypatch):
+    input_path, output_path = tmp_path / "queries.jsonl", tmp_path / "results.jsonl"
+    input_path.write_text('{"id": "a", "query": "What is solar power?"}\n{"id": "b", "query": "What is wind power?"}\n', encoding="utf-8")
+    output_path.write_text('{"id": "a", "answer": "Sunlight.", "error": null}\n', encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["batch", str(input_path), str(output_path), "--workers", "1"])
+    fake_ollama = FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9, answer_tokens=5, action="generate_answer")
+    backends = {engine: FakeSearchBackend(engine, latency=0) for engine in ("ddg", "exa")}
+    with offline_backends(fake_ollama, backends):
+        main()
+        assert [result["id"] for result in read_results(output_path)] == ["a", "b"]
+        calls = fake_ollama.calls
+        main() # Everything is answered: nothing runs
+    assert fake_ollama.calls == calls
+    assert [result["id"] for result in read_results(output_path)] == ["a", "b"]
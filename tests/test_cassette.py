@@ -0,0 +1,51 @@
+"""Tests of the record and replay of DeepSearch sessions, with the fake LLM and search backends."""
+import pytest
+
+import deep_research_search.deepsearch as deepsearch
+import deep_research_search.llm_providers as llm_providers
+import deep_research_search.search_backends as search_backends
+from deep_research_search.cassette import Cassette, RecordingProvider, RecordingSearchBackend, recording, replaying
+from deep_research_search.fakes import FakeOllama, FakeSearchBackend
+from deep_research_search.fetch import PageFetcher
+from deep_research_search.streaming import AnswerSink
+from deep_research_search.config import global_config
+
+QUERY = "What is solar power?"
+
+@pytest.fixture
+def live(monkeypatch):
+    """Replaces the LLM provider, the search engines and the page downloads the recording wraps by fakes."""
+    fake_ollama = FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9, answer_tokens=20)
+    monkeypatch.setitem(llm_providers._providers, global_config.llm_provider, fake_ollama)
+    for engine in ("ddg", "exa"):
+        monkeypatch.setitem(search_backends._backend_factories, engine, lambda engine=engine: FakeSearchBackend(engine, latency=0))
+    monkeypatch.setattr(PageFetcher, "fetch_text", lambda self, url: f"Page of {url} about the efficiency of solar panels.")
+    monkeypatch.setattr(global_config, "max_concurrent_gaps", 1) # The requests are sent in the same order on replay
+    return fake_ollama
+
+def test_the_recording_wrappers_delegate_to_the_wrapped_objects(live):
+    cassette = Cassette([(QUERY, 4000)])
+    provider = RecordingProvider(live, cassette)
+    assert provider.scheduler is live.scheduler
+    assert provider.name == live.name
+    response = provider.generate(model="test-model", prompt="Hello")
+    assert response["response"] == "Fake response."
+    backend = RecordingSearchBackend("exa", cassette)
+    assert len(backend.search("solar power", 3)) == 3
+    assert cassette.stats()["interactions"] == {"llm": 1, "search": 1}
+
+def test_a_replayed_session_gives_the_recorded_answer(live, tmp_path):
+    cassette = Cassette([(QUERY, 4000)])
+    with recording(cassette):
+        recorded_answer = deepsearch.deep_search(QUERY, token_budget=4000, sink=AnswerSink())
+    llm_calls = live.calls
+    assert recorded_answer
+    assert {"llm", "llm_stream", "search", "fetch"} <= set(cassette.stats()["interactions"])
+    cassette.save(tmp_path / "session.json.gz")
+
+    replayed_cassette = Cassette.load(tmp_path / "session.json.gz")
+    with replaying(replayed_cassette):
+        replayed_answer = deepsearch.deep_search(QUERY, token_budget=4000, sink=AnswerSink())
+    assert replayed_answer == recorded_answer
+    assert replayed_cassette.misses == 0
+    assert live.calls == llm_calls # Served from the cassette only
@@ -0,0 +1,38 @@
+"""Tests of the splitting of long contents into passages."""
+from deep_research_search.chunking import select_passages, split_passages
+
+def test_a_short_text_is_one_passage():
+    assert split_passages("  Solar panels convert sunlight.  ", max_chars=100) == [(2, 32, "Solar panels convert sunlight.")]
+
+def test_the_passages_are_cut_at_paragraphs_then_sentences_then_spaces():
+    paragraphs = "First paragraph about solar panels.\nSecond paragraph about wind turbines."
+    assert [passage for _, _, passage in split_passages(paragraphs, max_chars=50)] == [
+        "First paragraph about solar panels.", "Second paragraph about wind turbines."]
+    sentences = "Solar panels are efficient. Wind turbines are tall. Dams store water."
+    assert [passage for _, _, passage in split_passages(sentences, max_chars=40)] == [
+        "Solar panels are efficient.", "Wind turbines are tall.", "Dams store water."]
+    words = "word " * 30
+    assert all(set(passage.split(" ")) == {"word"} for _, _, passage in split_passages(words, max_chars=22))
+
+def test_the_passages_point_into_the_text():
+    text = "Solar panels are efficient. " * 50
+    passages = split_passages(text, max_chars=120)
+    assert all(len(passage) <= 120 and text[start:end] == passage for start, end, passage in passages)
+    assert "".join(text[start:end] for start, end, _ in passages).replace(" ", "") == text.replace(" ", "")
+
+def test_the_most_relevant_passages_are_kept_in_the_order_of_the_text():
+    text = "\n".join([
+        "Introduction to the renewable energies of the world.",
+        "Hydroelectric dams store water in large reservoirs.",
+        "Solar panels convert sunlight with photovoltaic cells.",
+        "Wind turbines turn with the wind on the hills.",
+        "The efficiency of solar panels is about twenty percent.",
+    ])
+    passages = select_passages(text, "What is the efficiency of solar panels?", max_chars=60, max_passages=2)
+    assert [passage for _, _, passage in passages] == [
+        "Solar panels convert sunlight with photovoltaic cells.", "The efficiency of solar panels is about twenty percent."]
+
+def test_the_beginning_of_the_text_is_kept_without_relevant_passage():
+    text = "\n".join(f"Paragraph {i} about hydroelectric dams." for i in range(5))
+    passages = select_passages(text, "solar panels", max_chars=40, max_passages=2)
+    assert [passage for _, _, passage in passages] == ["Paragraph 0 about hydroelectric dams.", "Paragraph 1 about hydroelectric dams."]
@@ -0,0 +1,41 @@
+"""Tests of the DeepSearch session loop with the fake LLM and search backends."""
+import asyncio
+
+import pytest
+
+import deep_research_search.deepsearch as deepsearch
+from deep_research_search.fakes import FakeOllama, FakeSearchBackend, offline_backends
+from deep_research_search.session_state import SessionState
+from deep_research_search.streaming import AnswerSink
+from deep_research_search.config import global_config
+
+@pytest.fixture
+def fake_ollama():
+    return FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9, answer_tokens=5)
+
+@pytest.fixture
+def offline(fake_ollama):
+    with offline_backends(fake_ollama, {engine: FakeSearchBackend(engine, latency=0) for engine in ("ddg", "exa")}):
+        yield
+
+def test_a_failed_gap_pipeline_does_not_abort_the_session(offline, monkeypatch):
+    run_gap_pipeline = deepsearch.run_gap_pipeline
+    failed_questions = []
+
+    async def failing_run_gap_pipeline(current_question, *args, **kwargs):
+        if current_question != "What is solar power?" and not failed_questions: # The first gap question fails
+            failed_questions.append(current_question)
+            raise RuntimeError("rewrite failed")
+        return await run_gap_pipeline(current_question, *args, **kwargs)
+
+    monkeypatch.setattr(deepsearch, "run_gap_pipeline", failing_run_gap_pipeline)
+    monkeypatch.setattr(global_config, "diary_max_entries", 1000) # Every entry is kept verbatim
+    state = SessionState("What is solar power?", token_budget=20000)
+    answer = asyncio.run(deepsearch.async_deep_search(state.initial_query, state=state, sink=AnswerSink()))
+    assert answer
+    assert failed_questions
+    diary = state.memory["diaryContext"]
+    investigated = {entry.question for entry in diary if entry.action == "search"}
+    assert failed_questions[0] not in investigated
+    assert len(investigated) > 1 # The sibling pipelines were merged
+    assert any(entry.action == "error" and entry.question == failed_questions[0] for entry in diary)
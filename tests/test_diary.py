@@ -0,0 +1,39 @@
+"""Tests of the bounded diary of the sessions."""
+import json
+
+from deep_research_search.diary import Diary
+
+def test_the_older_entries_are_compacted_into_a_summary():
+    diary = Diary(max_entries=2)
+    diary.add(1, "search", "What is solar power?", "3 results found.", results=3)
+    diary.add(1, "read", "What is solar power?", "2 items added.", knowledge_items=2)
+    diary.add(2, "search", "How efficient are solar panels?", "4 results found.", results=4)
+    diary.add(3, "search", "How tall are wind turbines?", "1 result found.", results=1)
+    assert [entry.question for entry in diary] == ["How efficient are solar panels?", "How tall are wind turbines?"]
+    assert diary.summary() == "Summary of the step 1: search done 1 time (results: 3); read done 1 time (knowledge_items: 2).\n"
+    diary.add(4, "read", "How tall are wind turbines?", "1 item added.", knowledge_items=1)
+    assert diary.summary() == "Summary of the steps 1 to 2: search done 2 times (results: 7); read done 1 time (knowledge_items: 2).\n"
+
+def test_the_rendered_size_is_bounded():
+    diary = Diary(max_entries=3)
+    sizes = []
+    for step in range(50):
+        diary.add(step, "search", f"Question {step}?", "3 results found.", results=3)
+        sizes.append(len(diary.render()))
+    assert len(diary) == 3
+    assert max(sizes[10:]) - min(sizes[10:]) <= 10 # Only the step numbers grow
+    assert diary.render().startswith("Summary of the steps 0 to 46: search done 47 times (results: 141).\n")
+
+def test_an_empty_diary():
+    diary = Diary()
+    assert not diary
+    assert diary.render() == ""
+
+def test_the_diary_survives_a_round_trip():
+    diary = Diary(max_entries=1)
+    diary.add(1, "search", "What is solar power?", "3 results found.", results=3)
+    diary.add(2, "read", "What is solar power?", "2 items added.", knowledge_items=2)
+    restored = Diary.from_dict(json.loads(json.dumps(diary.to_dict())))
+    assert restored.render() == diary.render()
+    restored.add(3, "search", "How efficient are solar panels?", "4 results found.", results=4)
+    assert restored.summary() == "Summary of the steps 1 to 2: search done 1 time (results: 3); read done 1 time (knowledge_items: 2).\n"
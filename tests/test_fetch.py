@@ -0,0 +1,92 @@
+"""Tests of the page fetcher against a local HTTP server."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import pytest
+
+from deep_research_search.fetch import PageFetcher
+
+HTML_PAGE = """<html><head><title>Ignored title</title><style>body { color: red; }</style></head>
+<body><script>var ignored = 1;</script><h1>Main   title</h1><p>First paragraph with <b>bold</b> text.</p>
+<div>Second&nbsp;block &amp; more</div></body></html>"""
+
+class PageServer:
+    """Local HTTP server serving test pages and recording the highest number of concurrent requests by host."""
+
+    def __init__(self):
+        self.active = {}
+        self.max_active = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/page.html":
+                    self._send(200, "text/html; charset=utf-8", HTML_PAGE.encode("utf-8"))
+                elif self.path == "/big.txt":
+                    self._send(200, "text/plain", b"word " * 100000)
+                elif self.path == "/image.png":
+                    self._send(200, "image/png", b"\x89PNG\r\n")
+                elif self.path.startswith("/slow/"):
+                    host = self.headers["Host"].split(":")[0]
+                    with server._lock:
+                        server.active[host] = server.active.get(host, 0) + 1
+                        server.max_active[host] = max(server.max_active.get(host, 0), server.active[host])
+                    time.sleep(0.2)
+                    with server._lock:
+                        server.active[host] -= 1
+                    self._send(200, "text/plain", f"Slow page {self.path}".encode("utf-8"))
+                else:
+                    self._send(404, "text/plain", b"Not found")
+
+            def _send(self, status, content_type, content):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def url(self, path: str, host: str = "127.0.0.1") -> str:
+        return f"http://{host}:{self.port}{path}"
+
+@pytest.fixture
+def page_server():
+    server = PageServer()
+    threading.Thread(target=server.server.serve_forever, daemon=True).start()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+def test_html_text_is_extracted(page_server):
+    fetcher = PageFetcher(max_workers=2)
+    pages = fetcher.fetch_pages([page_server.url("/page.html")])
+    assert pages[page_server.url("/page.html")] == "Main title\nFirst paragraph with bold text.\nSecond block & more"
+
+def test_download_is_capped_at_max_bytes(page_server):
+    fetcher = PageFetcher(max_workers=2, max_bytes=1000)
+    text = fetcher.fetch_pages([page_server.url("/big.txt")])[page_server.url("/big.txt")]
+    assert 0 < len(text) <= 1000
+    assert text.startswith("word word")
+
+def test_unfetchable_pages_are_left_out(page_server):
+    fetcher = PageFetcher(max_workers=2)
+    urls = [page_server.url("/image.png"), page_server.url("/missing"), "http://127.0.0.1:1/unreachable", page_server.url("/page.html")]
+    assert list(fetcher.fetch_pages(urls)) == [page_server.url("/page.html")]
+
+def test_concurrent_requests_are_limited_per_host(page_server):
+    fetcher = PageFetcher(max_workers=8, max_per_host=2)
+    urls = [page_server.url(f"/slow/{i}", host) for host in ("127.0.0.1", "localhost") for i in range(4)]
+    pages = fetcher.fetch_pages(urls)
+    assert len(pages) == 8
+    # Two hosts, each with at most two requests at the same time, but both hosts fetched in parallel.
+    assert page_server.max_active == {"127.0.0.1": 2, "localhost": 2}
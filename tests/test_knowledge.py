@@ -0,0 +1,64 @@
+"""Tests of the knowledge store: duplicate detection and memory-bounded eviction."""
+from itertools import permutations
+
+from deep_research_search.knowledge import KnowledgeStore
+from deep_research_search.token_usage import estimate_tokens
+
+QUERY = "What is the efficiency of solar panels?"
+# The same number of terms, each with every query term once: equally relevant to the query.
+RELEVANT_TEXTS = [
+    "Solar panels efficiency depends on the cell temperature and the irradiance level.",
+    "The efficiency of solar panels drops when temperature rises above 25 degrees.",
+    "Monocrystalline solar panels reach an efficiency close to 22 percent for homes.",
+]
+LESS_RELEVANT_TEXT = "Solar energy is the radiant light and heat from the sun harnessed by many technologies."
+
+def test_equally_relevant_items_have_the_same_relevance_whatever_the_order():
+    for texts in permutations(RELEVANT_TEXTS):
+        store = KnowledgeStore(max_tokens=10000, relevance_query=QUERY)
+        for text in texts:
+            store.add(text, "https://example.com")
+        assert len({round(item.relevance, 9) for item in store}) == 1
+
+def test_the_least_relevant_item_is_evicted_whatever_the_order():
+    texts = RELEVANT_TEXTS + [LESS_RELEVANT_TEXT]
+    max_tokens = sum(estimate_tokens(text) for text in texts) - 1 # One item too many
+    for ordered_texts in permutations(texts):
+        store = KnowledgeStore(max_tokens=max_tokens, relevance_query=QUERY)
+        for text in ordered_texts:
+            store.add(text, "https://example.com")
+        assert store.evicted == 1
+        assert sorted(item.text for item in store) == sorted(RELEVANT_TEXTS)
+
+def test_exact_duplicates_are_ignored():
+    store = KnowledgeStore()
+    assert store.add("Solar panels convert sunlight into electricity.", "https://a.example.com")
+    assert not store.add("  solar PANELS convert   sunlight into electricity.", "https://b.example.com") # Case and spaces ignored
+    assert len(store) == 1
+
+def test_near_duplicates_are_ignored():
+    store = KnowledgeStore()
+    text = "Solar panels convert sunlight into electricity using photovoltaic cells made of silicon wafers arranged in a grid."
+    assert store.add(text, "https://a.example.com")
+    assert not store.add(text.replace("grid.", "grid!") + " Source", "https://mirror.example.com")
+    assert store.add("Wind turbines convert the kinetic energy of the wind into electricity with a generator.", "https://b.example.com")
+    assert len(store) == 2
+
+def test_an_item_evicted_right_away_is_reported_and_can_be_added_again():
+    texts = RELEVANT_TEXTS + [LESS_RELEVANT_TEXT]
+    store = KnowledgeStore(max_tokens=sum(estimate_tokens(text) for text in RELEVANT_TEXTS), relevance_query=QUERY)
+    assert all(store.add(text, "https://example.com") for text in RELEVANT_TEXTS)
+    assert not store.add(LESS_RELEVANT_TEXT, "https://example.com") # Evicted by its own addition
+    assert store.evicted == 1
+
+    store.max_tokens = 0 # No cap anymore: the evicted content is not a duplicate
+    assert store.add(LESS_RELEVANT_TEXT, "https://example.com")
+    assert sorted(item.text for item in store) == sorted(texts)
+
+def test_added_since_skips_the_evicted_items():
+    store = KnowledgeStore(max_tokens=sum(estimate_tokens(text) for text in RELEVANT_TEXTS), relevance_query=QUERY)
+    store.add(RELEVANT_TEXTS[0], "https://example.com")
+    added = store.added
+    for text in RELEVANT_TEXTS[1:] + [LESS_RELEVANT_TEXT]:
+        store.add(text, "https://example.com")
+    assert [item.text for item in store.added_since(added)] == RELEVANT_TEXTS[1:]
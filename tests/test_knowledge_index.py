@@ -0,0 +1,58 @@
+"""Tests of the persistent knowledge index."""
+import sqlite3
+import time
+
+from deep_research_search.knowledge_index import CLEANUP_INTERVAL, KnowledgeIndex
+
+def test_items_are_found_by_full_text_search(tmp_path):
+    index = KnowledgeIndex(str(tmp_path / "index.sqlite3"))
+    index.add_items([
+        ("https://a.example.com", "Solar panels convert sunlight into electricity with photovoltaic cells."),
+        ("https://b.example.com", "Wind turbines convert the kinetic energy of the wind into electricity."),
+    ])
+    assert index.search("How do solar panels produce electricity?") == [
+        ("https://a.example.com", "Solar panels convert sunlight into electricity with photovoltaic cells.")]
+    assert index.search("recipe of the apple pie") == []
+    assert index.stats() == {"entries": 2, "uses": 1}
+
+def test_known_contents_are_stored_once(tmp_path):
+    index = KnowledgeIndex(str(tmp_path / "index.sqlite3"))
+    index.add_items([("https://a.example.com", "Solar panels convert sunlight into electricity.")])
+    index.add_items([("https://mirror.example.com", "solar panels  convert sunlight into electricity.")])
+    assert index.stats()["entries"] == 1
+
+def test_the_index_is_capped_to_its_most_recently_used_items(tmp_path):
+    index = KnowledgeIndex(str(tmp_path / "index.sqlite3"), max_entries=10)
+    index.add_items([(f"https://example.com/{i}", f"Fact number {i} about solar panels.") for i in range(CLEANUP_INTERVAL - 1)])
+    assert index.stats()["entries"] == CLEANUP_INTERVAL - 1 # The cleanup is amortized
+    index.add_items([("https://example.com/last", "The last fact about solar panels.")])
+    assert index.stats()["entries"] == 10
+    assert ("https://example.com/last", "The last fact about solar panels.") in index.search("last fact solar panels")
+    # The full text index follows the deletions.
+    connection = sqlite3.connect(str(tmp_path / "index.sqlite3"))
+    assert connection.execute("SELECT COUNT(*) FROM knowledge_fts WHERE knowledge_fts MATCH 'solar'").fetchone()[0] == 10
+
+def test_expired_items_are_not_returned_and_removed_on_open(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = KnowledgeIndex(path, ttl=3600)
+    index.add_items([("https://a.example.com", "Solar panels convert sunlight into electricity.")])
+    index._connection.execute("UPDATE knowledge_items SET created_at = ?", (time.time() - 7200,))
+    index._connection.commit()
+    assert index.search("solar panels electricity") == []
+    assert KnowledgeIndex(path, ttl=3600).stats()["entries"] == 0
+
+def test_an_index_of_a_previous_version_is_migrated(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE knowledge_items ("
+        "id INTEGER PRIMARY KEY, content_hash TEXT NOT NULL UNIQUE, url TEXT NOT NULL, text TEXT NOT NULL, "
+        "created_at REAL NOT NULL, last_used REAL NOT NULL, uses INTEGER NOT NULL DEFAULT 0)"
+    )
+    connection.execute("CREATE VIRTUAL TABLE knowledge_fts USING fts5(text)")
+    connection.execute("INSERT INTO knowledge_items VALUES (1, 'hash', 'https://a.example.com', 'Solar panels convert sunlight.', ?, ?, 0)",
+                       (time.time(), time.time()))
+    connection.execute("INSERT INTO knowledge_fts (rowid, text) VALUES (1, 'Solar panels convert sunlight.')")
+    connection.commit()
+    index = KnowledgeIndex(path)
+    assert index.search("solar panels sunlight") == [("https://a.example.com", "Solar panels convert sunlight.")]
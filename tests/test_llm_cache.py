@@ -0,0 +1,41 @@
+"""Tests of the cache of the LLM responses."""
+from deep_research_search.llm_cache import EVICTION_INTERVAL, LLMCache, make_cache_key
+
+def test_the_key_depends_on_every_part_of_the_request():
+    key = make_cache_key("model", "prompt", {"type": "object"}, {"temperature": 0})
+    assert key == make_cache_key("model", "prompt", {"type": "object"}, {"temperature": 0})
+    assert key != make_cache_key("other-model", "prompt", {"type": "object"}, {"temperature": 0})
+    assert key != make_cache_key("model", "other prompt", {"type": "object"}, {"temperature": 0})
+    assert key != make_cache_key("model", "prompt", None, {"temperature": 0})
+    assert key != make_cache_key("model", "prompt", {"type": "object"}, {"temperature": 1})
+
+def test_the_memory_tier_keeps_the_most_recently_used_responses():
+    cache = LLMCache(max_entries=2)
+    cache.set("a", "response a")
+    cache.set("b", "response b")
+    assert cache.get("a") == "response a"
+    cache.set("c", "response c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "response a"
+    assert cache.stats()["memory_hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_the_disk_tier_outlives_the_process(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    LLMCache(disk_path=path).set("a", "response a")
+    cache = LLMCache(disk_path=path)
+    assert cache.get("a") == "response a"
+    assert cache.get("a") == "response a"
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["memory_hits"] == 1
+
+def test_the_disk_tier_is_capped_to_its_most_recently_used_responses(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = LLMCache(max_entries=1, disk_path=path, disk_max_entries=10)
+    cache.set("first", "first response")
+    for i in range(EVICTION_INTERVAL - 2):
+        cache.set(f"key {i}", f"response {i}")
+    cache._connection.execute("UPDATE llm_responses SET last_access = last_access - 10 WHERE key != 'first'")
+    cache.set("last", "last response")
+    assert cache._connection.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0] == 10
+    reopened_cache = LLMCache(disk_path=path)
+    assert reopened_cache.get("first") == "first response"
+    assert reopened_cache.get("last") == "last response"
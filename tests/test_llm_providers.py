@@ -0,0 +1,58 @@
+"""Tests of the OpenAI-compatible LLM provider against the stub server."""
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+import pytest
+
+from deep_research_search.fakes import FakeOllama, StubOpenAIServer
+from deep_research_search.llm_providers import OpenAICompatibleProvider
+from deep_research_search.output_formats import ReasoningOutputFormat
+
+@pytest.fixture
+def fake_ollama():
+    return FakeOllama(latency=0, prefill_tokens_per_second=1e9, tokens_per_second=1e6, answer_tokens=5, action="generate_answer")
+
+@pytest.fixture
+def stub_server(fake_ollama):
+    with StubOpenAIServer(fake_ollama) as server:
+        yield server
+
+def test_json_response(stub_server):
+    provider = OpenAICompatibleProvider(stub_server.base_url, max_in_flight=2)
+    response = provider.generate("test-model", "Which action?", format=ReasoningOutputFormat.model_json_schema())
+    assert json.loads(response["response"]) == {"action": "generate_answer"}
+    assert response["done"] is True
+    assert response["prompt_eval_count"] > 0
+    assert response["eval_count"] == 20
+
+def test_streamed_response(stub_server):
+    provider = OpenAICompatibleProvider(stub_server.base_url, max_in_flight=2)
+    chunks = list(provider.generate("test-model", "Write the answer.", stream=True))
+    assert "".join(chunk["response"] for chunk in chunks) == "token0 token1 token2 token3 token4 "
+    assert [chunk["done"] for chunk in chunks] == [False] * 5 + [True]
+    assert chunks[-1]["eval_count"] == 5 # The token counts are sent with the last chunk
+    assert chunks[-1]["prompt_eval_count"] > 0
+
+def test_connections_are_reused(stub_server):
+    provider = OpenAICompatibleProvider(stub_server.base_url, max_in_flight=4)
+    for i in range(3): # Streamed responses must leave their connection reusable too
+        list(provider.generate("test-model", f"Streamed request {i}.", stream=True))
+        provider.generate("test-model", f"Sequential request {i}.")
+    assert stub_server.requests == 6
+    assert stub_server.connections == 1
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda i: provider.generate("test-model", f"Concurrent request {i}."), range(20)))
+    assert stub_server.requests == 26
+    assert stub_server.connections <= 4 # At most one connection per request in flight
+
+def test_request_body_maps_the_options():
+    provider = OpenAICompatibleProvider("http://127.0.0.1:1/v1", api_key="secret")
+    body = provider._request_body("test-model", "Prompt", True, {"title": "Output", "type": "object"},
+                                  {"temperature": 0.2, "num_predict": 64, "num_ctx": 8192})
+    assert body["messages"] == [{"role": "user", "content": "Prompt"}]
+    assert body["stream_options"] == {"include_usage": True}
+    assert body["response_format"]["json_schema"]["name"] == "Output"
+    assert (body["temperature"], body["max_tokens"]) == (0.2, 64)
+    assert "num_ctx" not in body # No OpenAI equivalent
+    assert provider.session.headers["Authorization"] == "Bearer secret"
@@ -0,0 +1,63 @@
+"""Tests of the scheduler of the LLM calls shared by the sessions."""
+import threading
+import time
+
+from deep_research_search.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler
+
+def wait_until(condition, timeout: float = 5.0):
+    """Waits until a condition is true."""
+    end_time = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end_time, "Timeout"
+        time.sleep(0.001)
+
+def queue_requests(scheduler: LLMScheduler, requests: list, served: list) -> list:
+    """Queues the (session id, priority) requests one after the other, each recording its session when it is served."""
+    def request(session_id, priority):
+        with scheduler.slot(session_id, priority):
+            served.append(session_id)
+
+    threads = []
+    for session_id, priority in requests:
+        queued = sum(scheduler.stats()["queued"].values())
+        thread = threading.Thread(target=request, args=(session_id, priority))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: sum(scheduler.stats()["queued"].values()) == queued + 1) # Keeps the arrival order
+    return threads
+
+def test_interactive_sessions_go_first_and_sessions_are_served_in_turn():
+    scheduler = LLMScheduler(max_in_flight=1)
+    served = []
+    with scheduler.slot("holder", PRIORITY_INTERACTIVE): # Every following request has to wait
+        threads = queue_requests(scheduler, [
+            ("background", PRIORITY_BACKGROUND),
+            ("busy", PRIORITY_INTERACTIVE), ("busy", PRIORITY_INTERACTIVE), ("busy", PRIORITY_INTERACTIVE),
+            ("quiet", PRIORITY_INTERACTIVE), ("quiet", PRIORITY_INTERACTIVE),
+        ], served)
+        assert scheduler.stats()["queued"] == {"interactive": 5, "background": 1}
+    for thread in threads:
+        thread.join()
+    assert served == ["busy", "quiet", "busy", "quiet", "busy", "background"]
+    assert scheduler.stats()["granted"] == 7 and scheduler.stats()["in_flight"] == 0
+
+def test_the_requests_in_flight_are_bounded():
+    scheduler = LLMScheduler(max_in_flight=2)
+    in_flight, max_in_flight = [0], [0]
+    lock = threading.Lock()
+
+    def request(session_id):
+        with scheduler.slot(session_id, PRIORITY_INTERACTIVE):
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+    threads = [threading.Thread(target=request, args=(f"session {i % 3}",)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max_in_flight[0] == 2
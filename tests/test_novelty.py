@@ -0,0 +1,57 @@
+"""Tests of the novelty tracker used for the early stopping."""
+from deep_research_search.knowledge import KnowledgeStore
+from deep_research_search.novelty import NoveltyTracker
+from deep_research_search.token_usage import estimate_tokens
+
+def read_step(store, tracker, texts):
+    added = store.added
+    for text in texts:
+        store.add(text, "https://example.com")
+    return tracker.observe(len(texts), store.added_since(added))
+
+def test_the_search_stops_once_a_round_brings_few_new_terms():
+    store = KnowledgeStore()
+    tracker = NoveltyTracker(store, threshold=0.5)
+    read_step(store, tracker, ["Solar panels convert sunlight into electricity with photovoltaic cells."])
+    assert tracker.end_round() == 1.0
+    assert not tracker.saturated()
+
+    read_step(store, tracker, ["Photovoltaic cells in solar panels convert the sunlight into electricity, reliably."])
+    assert tracker.end_round() < 0.5
+    assert tracker.saturated()
+
+def test_a_round_without_results_is_not_measured():
+    tracker = NoveltyTracker(KnowledgeStore(), threshold=0.5)
+    assert tracker.end_round() is None
+    assert not tracker.saturated()
+
+def test_disabled_by_default():
+    store = KnowledgeStore()
+    tracker = NoveltyTracker(store)
+    assert tracker.threshold == 0
+    read_step(store, tracker, ["Solar panels convert sunlight into electricity."])
+    read_step(store, tracker, ["Solar panels convert sunlight into electricity, again."])
+    tracker.end_round()
+    assert not tracker.saturated()
+    assert tracker.prioritize(["Known solar panels?", "Unknown wind turbines?"]) == (["Unknown wind turbines?", "Known solar panels?"], [])
+
+def test_the_gap_questions_about_known_terms_are_dropped():
+    store = KnowledgeStore()
+    tracker = NoveltyTracker(store, threshold=0.5)
+    read_step(store, tracker, ["Solar panels convert sunlight into electricity."])
+    kept, dropped = tracker.prioritize(["How efficient are solar panels?", "How do wind turbines work?"])
+    assert kept == ["How do wind turbines work?"]
+    assert dropped == ["How efficient are solar panels?"]
+
+def test_the_terms_of_evicted_items_stay_known():
+    first_text = "Geothermal heat pumps exchange heat with the ground through buried loops."
+    store = KnowledgeStore(max_tokens=estimate_tokens(first_text) + 1, relevance_query="solar panels")
+    tracker = NoveltyTracker(store, threshold=0.5)
+    read_step(store, tracker, [first_text])
+    tracker.end_round()
+    read_step(store, tracker, ["Solar panels convert sunlight into electricity."]) # Evicts the first item
+    tracker.end_round()
+    assert [item.text for item in store] == ["Solar panels convert sunlight into electricity."]
+    store.max_tokens = 0 # Nothing evicted anymore
+    assert read_step(store, tracker, ["Geothermal heat pumps exchange heat with the ground via buried loops, solar panels."]) == 1 # "via"
+    assert tracker.expected_gain("geothermal heat pumps") == 0.0
@@ -0,0 +1,46 @@
+"""Tests of the history of the searched queries."""
+import json
+
+from deep_research_search.query_history import QueryHistory
+
+RESULTS = [("Solar power", "https://a.example.com", "Solar panels convert sunlight into electricity.")]
+
+def test_exact_duplicates_are_found():
+    history = QueryHistory()
+    history.record("solar panel efficiency", "solar panel efficiency 2024", RESULTS)
+    assert "solar panel efficiency" in history
+    assert "wind turbines" not in history
+    assert history.get("solar panel efficiency").results == RESULTS
+    history.record("solar panel efficiency", "other rewrite", [])
+    assert len(history) == 1 and history.get("solar panel efficiency").results == RESULTS # The first record is kept
+
+def test_rephrased_queries_are_found_by_similarity():
+    history = QueryHistory(similarity_threshold=0.8)
+    history.record("What is the efficiency of solar panels?", "solar panel efficiency", RESULTS)
+    history.record("How tall are wind turbines?", "wind turbine height")
+    assert history.find_similar("what is the efficiency of the solar panels").query == "What is the efficiency of solar panels?"
+    assert history.find_similar("Solar panel efficiency").query == "What is the efficiency of solar panels?" # Rewritten form
+    assert history.find_similar("How are hydroelectric dams built?") is None
+
+def test_only_exact_duplicates_above_a_threshold_of_one():
+    history = QueryHistory(similarity_threshold=1.01)
+    history.record("What is the efficiency of solar panels?")
+    assert history.find_similar("what is the efficiency of the solar panels") is None
+
+def test_a_copy_is_independent():
+    history = QueryHistory()
+    history.record("solar panel efficiency", None, RESULTS)
+    copy = history.copy()
+    copy.record("wind turbine height")
+    assert "wind turbine height" not in history
+    assert copy.find_similar("solar panels efficiency").results == RESULTS
+
+def test_the_history_survives_a_round_trip():
+    history = QueryHistory(similarity_threshold=0.7)
+    history.record("solar panel efficiency", "solar efficiency", RESULTS)
+    history.append("wind turbine height")
+    restored = QueryHistory.from_list(json.loads(json.dumps(history.to_list())), similarity_threshold=0.7)
+    assert list(restored) == ["solar panel efficiency", "wind turbine height"]
+    assert restored.get("solar panel efficiency").results == RESULTS # Tuples again
+    assert restored.get("wind turbine height").results is None
+    assert restored.find_similar("solar efficiency").query == "solar panel efficiency"
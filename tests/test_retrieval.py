@@ -0,0 +1,43 @@
+"""Tests of the BM25 retrieval over the knowledge items."""
+from deep_research_search.retrieval import BM25Index, query_relevance, tokenize
+
+def test_tokenize():
+    assert tokenize("Solar panels' efficiency: 22%!") == ["solar", "panels", "efficiency", "22"]
+
+def test_the_documents_are_ranked_by_relevance():
+    index = BM25Index()
+    index.add("solar", "Solar panels convert sunlight into electricity.")
+    index.add("wind", "Wind turbines convert the wind into electricity.")
+    index.add("pie", "The apple pie is baked for forty minutes.")
+    scores = index.scores("How do solar panels make electricity?")
+    assert set(scores) == {"solar", "wind"}
+    assert scores["solar"] > scores["wind"] > 0
+
+def test_the_rare_terms_weigh_more():
+    index = BM25Index()
+    for i in range(5):
+        index.add(i, f"Electricity fact {i}.")
+    index.add("solar", "Solar electricity.")
+    scores = index.scores("solar electricity")
+    assert scores["solar"] > 2 * scores[0]
+
+def test_a_removed_document_is_forgotten():
+    index = BM25Index()
+    index.add("solar", "Solar panels convert sunlight into electricity.")
+    index.add("wind", "Wind turbines convert the wind into electricity.")
+    index.remove("solar", "Solar panels convert sunlight into electricity.")
+    assert len(index) == 1
+    assert "solar" not in index.postings and "sunlight" not in index.postings
+    assert index.total_length == len(tokenize("Wind turbines convert the wind into electricity."))
+    assert set(index.scores("solar panels electricity")) == {"wind"}
+
+def test_an_empty_index_scores_nothing():
+    assert BM25Index().scores("solar panels") == {}
+
+def test_query_relevance_ignores_the_stopwords_and_the_other_texts():
+    assert query_relevance("What is the wind?", "The wind is what it is.") == query_relevance("wind", "The wind is what it is.")
+    assert query_relevance("solar panels", "Wind turbines.") == 0.0
+    assert query_relevance("solar panels", "Solar panels, solar panels.") > query_relevance("solar panels", "Solar panels.")
+
+def test_query_relevance_saturates():
+    assert query_relevance("solar", " ".join(["solar"] * 1000)) < 1.5 + 1 # k1 + 1
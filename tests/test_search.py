@@ -0,0 +1,65 @@
+"""Tests of the multi-engine web search with fake search backends."""
+import pytest
+
+import deep_research_search.search as search
+from deep_research_search.fakes import FakeOllama, FakeSearchBackend, offline_backends
+from deep_research_search.query_history import QueryHistory
+
+class FailingSearchBackend(FakeSearchBackend):
+    """Search backend whose every search fails."""
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        self.calls += 1
+        raise ConnectionError("engine unavailable")
+
+class ShortSnippetsBackend(FakeSearchBackend):
+    """Search backend whose results are too short to be added to the knowledge."""
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        self.calls += 1
+        return [(f"Short {i}", f"https://{self.name}.example.com/short/{i}", "short") for i in range(num_results)]
+
+@pytest.fixture
+def fake_ollama():
+    return FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9)
+
+@pytest.fixture
+def close_executor():
+    yield
+    search.close_fanout_executor()
+
+def test_nothing_is_recorded_when_every_engine_fails(fake_ollama, close_executor):
+    backends = {engine: FailingSearchBackend(engine, latency=0) for engine in ("ddg", "exa")}
+    history = QueryHistory()
+    with offline_backends(fake_ollama, backends):
+        assert search.multi_search_web("solar panel efficiency", history, 3) == []
+    assert "solar panel efficiency" not in history
+    assert all(backend.calls == 1 for backend in backends.values())
+
+def test_the_results_of_a_failed_engine_are_left_out(fake_ollama, close_executor):
+    backends = {"ddg": FailingSearchBackend("ddg", latency=0), "exa": FakeSearchBackend("exa", latency=0)}
+    history = QueryHistory()
+    with offline_backends(fake_ollama, backends):
+        results = search.multi_search_web("solar panel efficiency", history, 3)
+    assert len(results) == 3
+    assert all("exa.example.com" in url for _, url, _ in results)
+    assert history.get("solar panel efficiency").results == results
+
+def test_the_good_results_come_first(fake_ollama, close_executor):
+    backends = {"ddg": ShortSnippetsBackend("ddg", latency=0), "exa": FakeSearchBackend("exa", latency=0)}
+    with offline_backends(fake_ollama, backends):
+        results = search.multi_search_web("solar panel efficiency", QueryHistory(), 4)
+    assert [search.is_good_result(result) for result in results] == [True] * 4
+
+def test_the_fanout_executor_is_created_on_first_use_and_recreated_after_close(fake_ollama, close_executor):
+    search.close_fanout_executor()
+    assert search._fanout_executor is None
+    backends = {engine: FakeSearchBackend(engine, latency=0) for engine in ("ddg", "exa")}
+    with offline_backends(fake_ollama, backends):
+        search.multi_search_web("solar panel efficiency", QueryHistory(), 3)
+        executor = search._fanout_executor
+        assert executor is not None
+        search.close_fanout_executor()
+        assert search._fanout_executor is None
+        assert search.multi_search_web("wind turbine output", QueryHistory(), 3)
+    assert search._fanout_executor is not None and search._fanout_executor is not executor
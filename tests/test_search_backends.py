@@ -0,0 +1,63 @@
+"""Tests of the rate limiting and retries of the web search backends."""
+import time
+
+import pytest
+
+from deep_research_search.search_backends import SearchBackend, SearchDeadlineExceeded, TokenBucket
+
+class FlakyBackend(SearchBackend):
+    """Search backend failing with a transient error a given number of times before answering."""
+    name = "flaky"
+
+    def __init__(self, failures: int, error: Exception, **kwargs):
+        super().__init__(TokenBucket(rate=1e9, capacity=1000000), **kwargs)
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def _search_once(self, query: str, num_results: int) -> list:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return [("Title", "https://example.com", query)]
+
+    def is_retryable(self, exception: Exception) -> bool:
+        return isinstance(exception, ConnectionError)
+
+def test_the_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start_time = time.monotonic()
+    for _ in range(2):
+        bucket.acquire()
+    assert time.monotonic() - start_time < 0.05 # The burst
+    for _ in range(4):
+        bucket.acquire()
+    assert 0.18 <= time.monotonic() - start_time < 1.0 # 4 tokens at 20 per second
+
+def test_the_bucket_gives_up_at_the_deadline():
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.acquire()
+    with pytest.raises(SearchDeadlineExceeded):
+        bucket.acquire(deadline=time.monotonic() + 0.1)
+
+def test_transient_errors_are_retried():
+    backend = FlakyBackend(2, ConnectionError("reset"), backoff_base=0.001)
+    assert backend.search("solar power", 1) == [("Title", "https://example.com", "solar power")]
+    assert backend.calls == 3
+
+def test_other_errors_and_the_last_retry_are_raised():
+    backend = FlakyBackend(1, ValueError("bad query"), backoff_base=0.001)
+    with pytest.raises(ValueError):
+        backend.search("solar power", 1)
+    assert backend.calls == 1
+    backend = FlakyBackend(5, ConnectionError("reset"), max_retries=2, backoff_base=0.001)
+    with pytest.raises(ConnectionError):
+        backend.search("solar power", 1)
+    assert backend.calls == 3
+
+def test_the_retries_stop_at_the_deadline():
+    backend = FlakyBackend(100, ConnectionError("reset"), max_retries=100, backoff_base=0.05, backoff_max=0.05)
+    start_time = time.monotonic()
+    with pytest.raises(SearchDeadlineExceeded):
+        backend.search("solar power", 1, deadline=0.2)
+    assert time.monotonic() - start_time < 0.5
@@ -0,0 +1,38 @@
+"""Tests of the persistent cache of the web search results."""
+import time
+
+from deep_research_search.search_cache import CLEANUP_INTERVAL, SearchCache
+
+RESULTS = [("Solar power", "https://a.example.com", "Solar panels convert sunlight into electricity.")]
+
+def test_cached_results_are_returned_until_they_expire(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttls={"ddg": 3600, "exa": 60})
+    cache.set("ddg", "solar power", 3, RESULTS)
+    cache.set("exa", "solar power", 3, RESULTS)
+    assert cache.get("ddg", "solar power", 3) == RESULTS
+    assert cache.get("ddg", "solar power", 5) is None # Another number of results is another search
+    cache._connection.execute("UPDATE search_results SET created_at = ?", (time.time() - 600,))
+    assert cache.get("ddg", "solar power", 3) == RESULTS
+    assert cache.get("exa", "solar power", 3) is None # Each engine has its own time to live
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+def test_expired_results_are_removed_on_open(tmp_path):
+    path = str(tmp_path / "search.sqlite3")
+    cache = SearchCache(path, ttls={"ddg": 3600})
+    cache.set("ddg", "solar power", 3, RESULTS)
+    cache.set("ddg", "wind power", 3, RESULTS)
+    cache._connection.execute("UPDATE search_results SET created_at = ? WHERE query = 'solar power'", (time.time() - 7200,))
+    cache._connection.commit()
+    assert SearchCache(path, ttls={"ddg": 3600}).stats()["entries"] == 1
+
+def test_the_cache_is_capped_to_its_most_recently_used_searches(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttls={"ddg": 3600}, max_entries=10)
+    cache.set("ddg", "first query", 3, RESULTS)
+    for i in range(CLEANUP_INTERVAL - 2):
+        cache.set("ddg", f"query {i}", 3, RESULTS)
+    cache._connection.execute("UPDATE search_results SET last_access = last_access - 10 WHERE query != 'first query'")
+    assert cache.stats()["entries"] == CLEANUP_INTERVAL - 1 # The cleanup is amortized
+    cache.set("ddg", "last query", 3, RESULTS)
+    assert cache.stats()["entries"] == 10
+    assert cache.get("ddg", "first query", 3) == RESULTS
+    assert cache.get("ddg", "last query", 3) == RESULTS
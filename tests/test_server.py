@@ -0,0 +1,99 @@
+"""Tests of the research server over HTTP, with the fake LLM and search backends."""
+import asyncio
+import json
+
+import pytest
+
+from deep_research_search.fakes import FakeOllama, FakeSearchBackend, offline_backends
+from deep_research_search.server import ResearchServer
+
+@pytest.fixture
+def offline():
+    fake_ollama = FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9, answer_tokens=5, action="answer")
+    with offline_backends(fake_ollama, {engine: FakeSearchBackend(engine, latency=0) for engine in ("ddg", "exa")}):
+        yield
+
+async def request(port: int, method: str, path: str, body: bytes = b"", headers: dict = None) -> tuple:
+    """Sends a HTTP request to the server and returns the status code and the body of the response."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = {"Content-Length": str(len(body)), **(headers or {})}
+    writer.write(f"{method} {path} HTTP/1.1\r\n".encode("latin-1")
+                 + "".join(f"{name}: {value}\r\n" for name, value in headers.items()).encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    if b"Transfer-Encoding: chunked" in head:
+        chunks = []
+        while True:
+            size, _, content = content.partition(b"\r\n")
+            if int(size, 16) == 0:
+                break
+            chunks.append(content[:int(size, 16)])
+            content = content[int(size, 16) + 2:]
+        content = b"".join(chunks)
+    return int(head.split(b" ", 2)[1]), content
+
+def with_server(scenario, **server_options):
+    """Runs an async scenario against a research server listening on a free port."""
+    async def run():
+        research_server = ResearchServer(**server_options)
+        server = await asyncio.start_server(research_server.handle_connection, "127.0.0.1", 0)
+        async with server:
+            return await scenario(research_server, server.sockets[0].getsockname()[1])
+    return asyncio.run(run())
+
+def test_a_session_is_started_and_its_answer_returned(offline):
+    async def scenario(research_server, port):
+        status, body = await request(port, "POST", "/sessions", json.dumps({"query": "What is solar power?"}).encode("utf-8"))
+        assert status == 202
+        session_id = json.loads(body)["session_id"]
+        status, streamed_answer = await request(port, "GET", f"/sessions/{session_id}/stream")
+        assert status == 200
+        await asyncio.gather(*research_server._tasks)
+        status, body = await request(port, "GET", f"/sessions/{session_id}")
+        return status, json.loads(body), streamed_answer.decode("utf-8")
+
+    status, session, streamed_answer = with_server(scenario)
+    assert status == 200
+    assert session["status"] == "done"
+    assert session["answer"] and session["answer"] in streamed_answer
+    assert session["token_usage"]["total"] > 0
+
+def test_invalid_requests_are_rejected(offline):
+    async def scenario(research_server, port):
+        return [
+            await request(port, "POST", "/sessions", b'{"query": ""}'),
+            await request(port, "POST", "/sessions", b"not json"),
+            await request(port, "GET", "/sessions"),
+            await request(port, "GET", "/sessions/unknown"),
+            await request(port, "GET", "/sessions/unknown/stream"),
+        ]
+
+    assert [status for status, _ in with_server(scenario)] == [400, 400, 405, 404, 404]
+
+def test_a_body_above_the_maximum_is_rejected_unread(offline):
+    async def scenario(research_server, port):
+        # The announced body is never sent: the server must answer without waiting for it
+        oversized = await asyncio.wait_for(request(port, "POST", "/sessions", headers={"Content-Length": "1025"}), timeout=5)
+        accepted = await request(port, "POST", "/sessions", json.dumps({"query": "What is solar power?"}).encode("utf-8"))
+        await asyncio.gather(*research_server._tasks)
+        return oversized, accepted, research_server.sessions
+
+    (status, body), (accepted_status, _), sessions = with_server(scenario, max_body_bytes=1024)
+    assert status == 413
+    assert "1024" in json.loads(body)["error"]
+    assert accepted_status == 202
+    assert len(sessions) == 1
+
+def test_the_metrics_of_the_sessions_are_exported_in_the_prometheus_format(offline):
+    async def scenario(research_server, port):
+        await request(port, "POST", "/sessions", json.dumps({"query": "What is solar power?"}).encode("utf-8"))
+        await asyncio.gather(*research_server._tasks)
+        return await request(port, "GET", "/metrics")
+
+    status, body = with_server(scenario)
+    metrics = body.decode("utf-8")
+    assert status == 200
+    assert 'deepsearch_span_duration_seconds_count{stage="answer"}' in metrics
+    assert all(line.startswith("#") or line.rsplit(" ", 1)[1].replace(".", "", 1).isdigit() for line in metrics.splitlines())
@@ -0,0 +1,70 @@
+"""Tests of the checkpoint and resume of the DeepSearch sessions."""
+import asyncio
+
+import pytest
+
+import deep_research_search.deepsearch as deepsearch
+import deep_research_search.generate_answer as generate_answer
+from deep_research_search.fakes import FakeOllama, FakeSearchBackend, offline_backends
+from deep_research_search.session_state import SessionState
+from deep_research_search.streaming import AnswerSink
+from deep_research_search.token_usage import TokenUsage
+
+@pytest.fixture
+def search_backends():
+    return {engine: FakeSearchBackend(engine, latency=0) for engine in ("ddg", "exa")}
+
+@pytest.fixture
+def offline(search_backends):
+    fake_ollama = FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9, answer_tokens=5)
+    with offline_backends(fake_ollama, search_backends):
+        yield
+
+def test_the_state_survives_a_round_trip(tmp_path):
+    state = SessionState("What is solar power?", token_budget=5000, trace_id="trace")
+    memory = state.memory
+    memory["knowledge"].add("Solar panels convert sunlight into electricity.", "https://a.example.com", 0, 48)
+    memory["diaryContext"].add(1, "search", "What is solar power?", "3 results found.", results=3)
+    memory["visited_urls"].add("https://a.example.com")
+    memory["processed_queries"].record("What is solar power?", "solar power", [("Solar", "https://a.example.com", "Solar panels.")])
+    state.gaps = ["How efficient are solar panels?"]
+    state.gaps_detected = True
+    state.step = 1
+    state.outcomes = [None]
+    state.token_stages = {"reason": {"prompt_tokens": 100, "completion_tokens": 20, "calls": 1, "cached_calls": 0}}
+    state.save(str(tmp_path / "session.json.gz"))
+
+    restored = SessionState.load(str(tmp_path / "session.json.gz"))
+    assert restored.to_dict() == state.to_dict()
+    assert [item.text for item in restored.memory["knowledge"]] == ["Solar panels convert sunlight into electricity."]
+    assert restored.memory["processed_queries"].get("What is solar power?").results == [("Solar", "https://a.example.com", "Solar panels.")]
+    assert restored.memory["diaryContext"].render() == memory["diaryContext"].render()
+
+def test_a_checkpoint_of_another_version_is_refused():
+    data = SessionState("What is solar power?").to_dict()
+    data["version"] -= 1
+    with pytest.raises(ValueError):
+        SessionState.from_dict(data)
+
+def test_an_interrupted_session_is_resumed_without_searching_again(offline, search_backends, tmp_path, monkeypatch):
+    checkpoint_path = str(tmp_path / "session.json.gz")
+
+    def interrupted_generate_answer(*args, **kwargs):
+        raise RuntimeError("interrupted")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(generate_answer, "generate_answer", interrupted_generate_answer)
+        with pytest.raises(RuntimeError):
+            asyncio.run(deepsearch.async_deep_search("What is solar power?", token_budget=20000, checkpoint_path=checkpoint_path,
+                                                     sink=AnswerSink()))
+    searches = sum(backend.calls for backend in search_backends.values())
+    state = SessionState.load(checkpoint_path)
+    assert state.answer_mode is not None and state.final_answer is None
+    tokens_before = sum(usage["prompt_tokens"] + usage["completion_tokens"] for usage in state.token_stages.values())
+
+    token_usage = TokenUsage()
+    answer = deepsearch.resume_deep_search(checkpoint_path, token_usage=token_usage)
+    assert answer
+    assert sum(backend.calls for backend in search_backends.values()) == searches
+    assert token_usage.total > tokens_before # The tokens of the interrupted run are counted
+    assert SessionState.load(checkpoint_path).final_answer == answer
@@ -0,0 +1,72 @@
+"""Tests of the token accounting and of the token budget enforcement."""
+import json
+
+import pytest
+
+from deep_research_search.fakes import FakeOllama, offline_backends
+from deep_research_search.server import ResearchServer
+from deep_research_search.token_usage import TokenBudgetExceeded, TokenUsage, current_token_usage, max_completion_tokens
+from deep_research_search.utils import query_ollama
+
+@pytest.fixture
+def offline():
+    fake_ollama = FakeOllama(latency=0, tokens_per_second=1e6, prefill_tokens_per_second=1e9)
+    with offline_backends(fake_ollama, {}):
+        yield fake_ollama
+
+def test_usage_is_recorded_by_stage():
+    token_usage = TokenUsage(token_budget=100)
+    token_usage.record("reason", 30, 10)
+    token_usage.record("reason", 20, 5)
+    token_usage.record("rewrite", 0, 0, cached=True)
+    assert token_usage.total == 65
+    assert token_usage.remaining() == 35
+    assert token_usage.breakdown()["stages"]["reason"] == {"prompt_tokens": 50, "completion_tokens": 15, "calls": 2, "cached_calls": 0}
+    assert token_usage.breakdown()["stages"]["rewrite"]["cached_calls"] == 1
+
+def test_restored_usage_counts_against_the_budget():
+    token_usage = TokenUsage(token_budget=100)
+    token_usage.restore({"reason": {"prompt_tokens": 80, "completion_tokens": 10, "calls": 3, "cached_calls": 0}})
+    assert token_usage.remaining() == 10
+    assert token_usage.would_exceed(11)
+    assert not token_usage.would_exceed(10)
+
+def test_no_budget_is_never_exceeded():
+    token_usage = TokenUsage()
+    token_usage.record("reason", 10**9, 10**9)
+    assert token_usage.remaining() is None
+    assert not token_usage.would_exceed(10**9)
+
+def test_max_completion_tokens():
+    assert max_completion_tokens(None) == 0
+    assert max_completion_tokens({"num_predict": 256}) == 256
+    assert max_completion_tokens({"num_predict": -1}) == 0 # No limit
+    assert max_completion_tokens({"num_predict": True}) == 0
+
+def test_a_call_whose_completion_would_exceed_the_budget_is_refused(offline):
+    token_usage = TokenUsage(token_budget=100)
+    token = current_token_usage.set(token_usage)
+    try:
+        with pytest.raises(TokenBudgetExceeded):
+            query_ollama("x" * 200, stream=True, options={"num_predict": 60}, use_cache=False) # ~50 prompt tokens
+        assert offline.calls == 0
+        query_ollama("x" * 200, stream=True, options={"num_predict": 40}, use_cache=False)
+    finally:
+        current_token_usage.reset(token)
+    assert offline.calls == 1
+
+def test_a_call_is_not_refused_without_enforcement(offline):
+    token = current_token_usage.set(TokenUsage(token_budget=10))
+    try:
+        query_ollama("x" * 200, stream=True, use_cache=False, enforce_budget=False)
+    finally:
+        current_token_usage.reset(token)
+    assert offline.calls == 1
+
+@pytest.mark.parametrize("token_budget", [True, 0, -5, 1.5, "1000"])
+def test_a_session_with_an_invalid_budget_is_rejected(token_budget):
+    research_server = ResearchServer()
+    status, response = research_server.route("POST", "/sessions", json.dumps({"query": "What is solar power?", "token_budget": token_budget}).encode("utf-8"))
+    assert status == 400
+    assert "token_budget" in response["error"]
+    assert research_server.sessions == {}